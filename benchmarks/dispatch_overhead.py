@@ -0,0 +1,117 @@
+"""
+Overhead of encoding and decoding method calls, compiled codecs
+of the methods against models built on every call as before:
+
+    python benchmarks/dispatch_overhead.py --output dispatch.json
+
+Exits with an error when trusted path is slower than the legacy one.
+"""
+
+import dataclasses
+import datetime
+import json
+import logging
+import platform
+import timeit
+from pathlib import Path
+from typing import Optional
+
+import typer
+
+from camera360.lib.camera.controls import Integer
+from camera360.lib.rpc.codecs import CODECS
+from camera360.lib.supervisor.protocol import FrameData, SupervisorProtocol
+
+CASES = [
+    ("on_frame_received", dict(frame=FrameData(index=1)), None),
+    (
+        "controls",
+        dict(),
+        [Integer(name="Exposure", value=11), Integer(name="Framerate", value=2)],
+    ),
+]
+
+
+@dataclasses.dataclass
+class Result:
+    codec: str
+    method: str
+    legacy_us: float
+    compiled_us: float
+    trusted_us: float
+
+
+def legacy_call(method, codec, arguments, value):
+    """
+    Encoding path used before methods were compiled:
+    args and return models built and validated on every call.
+    """
+    payload = codec.encode(method.args_model(**arguments))
+    codec.decode(method.args_model, payload).model_dump()
+
+    response = codec.encode(method.return_model(value=value))
+    return codec.decode(method.return_model, response).value
+
+
+def compiled_call(method, codec, arguments, value, trusted):
+    method_codec = method.compile(codec, trusted=trusted)
+
+    payload = method_codec.encode_args(method.args_model(**arguments))
+    method_codec.decode_args(payload)
+
+    return method_codec.decode_return(method_codec.encode_return(value))
+
+
+def measure(codec, name: str, arguments: dict, value, calls: int) -> Result:
+    method = SupervisorProtocol.methods[name]
+
+    def per_call(call) -> float:
+        return min(timeit.repeat(call, number=calls, repeat=3)) / calls * 1e6
+
+    return Result(
+        codec=codec.name,
+        method=name,
+        legacy_us=per_call(lambda: legacy_call(method, codec, arguments, value)),
+        compiled_us=per_call(
+            lambda: compiled_call(method, codec, arguments, value, trusted=False)
+        ),
+        trusted_us=per_call(
+            lambda: compiled_call(method, codec, arguments, value, trusted=True)
+        ),
+    )
+
+
+def main(
+    output: Optional[Path] = typer.Option(None, help="JSON file for results"),
+    calls: int = 2000,
+    # trusted path may be that much slower before it's reported
+    margin: float = 1.2,
+):
+    results = [
+        measure(codec, name, arguments, value, calls)
+        for codec in CODECS.values()
+        for name, arguments, value in CASES
+    ]
+
+    report = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [dataclasses.asdict(result) for result in results],
+    }
+    if output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        output.write_text(json.dumps(report, indent=2))
+
+    slow = [
+        result for result in results if result.trusted_us > result.legacy_us * margin
+    ]
+    for result in slow:
+        logging.error("%s/%s is slower than legacy path", result.codec, result.method)
+    if slow:
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    typer.run(main)
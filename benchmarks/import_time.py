@@ -0,0 +1,114 @@
+"""
+Startup time of camera360 entry points, every sample
+is measured in a fresh interpreter:
+
+    python benchmarks/import_time.py --output import.json
+"""
+
+import dataclasses
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import typer
+
+ENTRY_POINTS = [
+    "camera360.apps.camera.cli",
+    "camera360.apps.camera.main",
+    "camera360.apps.supervisor.main",
+]
+
+# optional dependencies which must not be imported until they are used
+HEAVY_MODULES = ["nicegui", "v4l2py", "pyrkaiq"]
+
+# what client does on connect, see Channel.use_protocol
+FINGERPRINT = """
+from camera360.lib.camera.protocol import CameraProtocol
+from camera360.lib.rpc.decorators import fingerprint
+fingerprint(CameraProtocol.methods)
+"""
+
+
+@dataclasses.dataclass
+class Result:
+    name: str
+    wall_ms: float
+    import_ms: float
+    heavy_modules: list[str]
+
+
+def _run(code: str, env: Optional[dict] = None) -> tuple[float, float, list[str]]:
+    """Runs code in a new interpreter, returns wall time, import time and heavy modules."""
+    script = (
+        "import sys\n"
+        + code
+        + "\nprint(*[m for m in %r if m in sys.modules])" % HEAVY_MODULES
+    )
+
+    started = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, **(env or {})},
+    )
+    wall = time.perf_counter() - started
+
+    # cumulative microseconds of top level imports, nested ones are indented
+    imported = 0
+    for line in process.stderr.splitlines():
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            imported += int(cumulative)
+    return wall * 1000, imported / 1000, process.stdout.split()
+
+
+def measure(name: str, code: str, repeat: int, env: Optional[dict] = None) -> Result:
+    samples = [_run(code, env) for _ in range(repeat)]
+    return Result(
+        name=name,
+        wall_ms=statistics.median(wall for wall, _, _ in samples),
+        import_ms=statistics.median(imported for _, imported, _ in samples),
+        heavy_modules=samples[-1][2],
+    )
+
+
+def main(
+    output: Optional[Path] = typer.Option(None, help="JSON file for results"),
+    repeat: int = 5,
+):
+    results = [measure("python", "pass", repeat)]
+    results += [
+        measure(module, "import %s" % module, repeat) for module in ENTRY_POINTS
+    ]
+
+    results.append(measure("fingerprint", FINGERPRINT, repeat))
+    with tempfile.TemporaryDirectory() as directory:
+        # first run fills the cache, the rest use it
+        env = {"CAMERA360_SCHEMA_CACHE": os.path.join(directory, "schemas.json")}
+        _run(FINGERPRINT, env)
+        results.append(measure("fingerprint (cached)", FINGERPRINT, repeat, env))
+
+    report = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [dataclasses.asdict(result) for result in results],
+    }
+    if output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    typer.run(main)
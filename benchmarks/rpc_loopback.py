@@ -0,0 +1,244 @@
+"""
+Throughput and latency of camera360.lib.rpc over loopback.
+
+Server and clients share one process and event loop, so numbers are
+relative and meant for tracking regressions of the wire format:
+
+    python benchmarks/rpc_loopback.py --output rpc.json
+"""
+
+import asyncio
+import dataclasses
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import typer
+
+from camera360.lib.rpc.connection.channel import ChannelOptions
+from camera360.lib.rpc.connection.compression import COMPRESSORS
+from camera360.lib.rpc.connection.framing import BinaryFraming, JsonLineFraming
+from camera360.lib.rpc.protocol import Blob, RPCHandler
+from camera360.lib.rpc.server import Connection, start_server
+from camera360.lib.supervisor.protocol import FrameData, Status, SupervisorProtocol
+
+FRAMINGS = {"binary": BinaryFraming, "json": JsonLineFraming}
+MB = 1024 * 1024
+
+
+class BenchmarkHandler(RPCHandler, SupervisorProtocol):
+    """Supervisor answering with canned values, so only rpc is measured."""
+
+    def __init__(self, blob_sizes: list[int]):
+        super().__init__()
+        self.frames = 0
+        self.disconnected = asyncio.Event()
+        self.blobs = {
+            # previews are jpeg or mpeg-ts, which don't compress well
+            str(size): Blob(os.urandom(size))
+            for size in blob_sizes
+        }
+
+    async def status(self) -> Status:
+        return Status()
+
+    async def on_frame_received(self, *, frame: FrameData) -> None:
+        self.frames += 1
+
+    async def preview(self, *, filename: str) -> Blob:
+        return self.blobs[filename]
+
+    async def on_client_disconnected(self, client):
+        self.disconnected.set()
+
+
+@dataclasses.dataclass
+class Scenario:
+    name: str
+    calls: int
+    call: Callable[[SupervisorProtocol], Awaitable]
+    payload_size: int = 0
+    # calls repeated in background while scenario runs
+    load: Optional[Callable[[SupervisorProtocol], Awaitable]] = None
+
+
+@dataclasses.dataclass
+class Result:
+    scenario: str
+    payload_size: int
+    concurrency: int
+    calls: int
+    calls_per_sec: float
+    p50_ms: float
+    p99_ms: float
+    bytes_per_call: float
+    cpu_ms_per_call: float
+
+
+def scenarios(calls: int, blob_sizes: list[int]) -> list[Scenario]:
+    result = [
+        Scenario("status", calls, lambda remote: remote.status()),
+        Scenario(
+            "on_frame_received",
+            calls,
+            lambda remote: remote.on_frame_received(frame=FrameData(index=1)),
+        ),
+    ]
+    for size in blob_sizes:
+        result.append(
+            Scenario(
+                "preview",
+                # large payloads take a while, fewer calls are enough
+                max(calls * 64 * 1024 // size, 10),
+                lambda remote, size=size: remote.preview(filename=str(size)),
+                payload_size=size,
+            )
+        )
+    if blob_sizes:
+        # control calls must not wait behind bulk transfers
+        size = max(blob_sizes)
+        result.append(
+            Scenario(
+                "stop+preview",
+                calls // 10,
+                lambda remote: remote.stop(),
+                load=lambda remote, size=size: remote.preview(filename=str(size)),
+            )
+        )
+    return result
+
+
+def traffic(connection: Connection) -> int:
+    return connection.channel.bytes_sent + connection.channel.bytes_received
+
+
+async def run_scenario(
+    remote, scenario: Scenario, concurrency: int, bytes_per_call: float
+) -> Result:
+    latencies: list[float] = []
+    pending = iter(range(scenario.calls))
+
+    async def worker():
+        for _ in pending:
+            started = time.perf_counter()
+            await scenario.call(remote)
+            latencies.append(time.perf_counter() - started)
+
+    # wait_for of python < 3.12 may swallow the cancel
+    # when response comes at the same time, hence the flag
+    done = asyncio.Event()
+
+    async def load():
+        while not done.is_set():
+            await scenario.load(remote)
+
+    loaders = [asyncio.create_task(load()) for _ in range(4 if scenario.load else 0)]
+    cpu, started = time.process_time(), time.perf_counter()
+
+    try:
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+    finally:
+        done.set()
+        for task in loaders:
+            task.cancel()
+        await asyncio.gather(*loaders, return_exceptions=True)
+
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu
+
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return Result(
+        scenario=scenario.name,
+        payload_size=scenario.payload_size,
+        concurrency=concurrency,
+        calls=scenario.calls,
+        calls_per_sec=scenario.calls / elapsed,
+        p50_ms=quantiles[49] * 1000,
+        p99_ms=quantiles[98] * 1000,
+        bytes_per_call=bytes_per_call,
+        cpu_ms_per_call=cpu / scenario.calls * 1000,
+    )
+
+
+async def run(
+    options: ChannelOptions,
+    concurrency: list[int],
+    calls: int,
+    blob_sizes: list[int],
+) -> list[Result]:
+    handler = BenchmarkHandler(blob_sizes)
+    server = await start_server(handler, host="127.0.0.1", port=0, options=options)
+    host, port = server.sockets[0].getsockname()
+
+    connection = Connection(host, port, options=options)
+    remote = await connection.connect(protocol=SupervisorProtocol, handler=None)
+
+    results = []
+    try:
+        for scenario in scenarios(calls, blob_sizes):
+            # warm up caches of compiled methods and socket buffers,
+            # nothing else is sent meanwhile, so that's the traffic of the call
+            # itself, without background load the scenario may have
+            sent = traffic(connection)
+            await scenario.call(remote)
+            bytes_per_call = traffic(connection) - sent
+
+            for level in concurrency:
+                result = await run_scenario(remote, scenario, level, bytes_per_call)
+                logging.warning("%s", result)
+                results.append(result)
+    finally:
+        await connection.disconnect()
+        # server side of the channel is done before the loop is closed
+        await asyncio.wait_for(handler.disconnected.wait(), 5)
+        server.close()
+        await server.wait_closed()
+
+    return results
+
+
+def main(
+    output: Optional[Path] = typer.Option(None, help="JSON file for results"),
+    framing: str = typer.Option("binary", help="|".join(FRAMINGS)),
+    codec: str = "json",
+    compression: bool = True,
+    concurrency: list[int] = typer.Option([1, 8, 64]),
+    calls: int = 2000,
+    blob_mb: list[int] = typer.Option([1, 4]),
+):
+    # rpc logs a lot on INFO level, it would be benchmarked instead
+    logging.basicConfig(level=logging.WARNING, force=True)
+
+    options = ChannelOptions(
+        framing=FRAMINGS[framing](),
+        codecs=[codec],
+        compression=list(COMPRESSORS) if compression else [],
+    )
+
+    results = asyncio.run(
+        run(options, concurrency, calls, [size * MB for size in blob_mb])
+    )
+
+    report = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "framing": framing,
+        "codec": codec,
+        "compression": options.compression,
+        "results": [dataclasses.asdict(result) for result in results],
+    }
+    if output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -10,6 +10,8 @@ class Api:
     Device: type[device.VideoDevice]
     Encoder: type[device.Encoder]
     Preview: type[device.Encoder]
+    # records and makes preview in one process, see settings.combined_encoder
+    Combined: type[device.Encoder]
 
 
 def load_api(name: str) -> Api:
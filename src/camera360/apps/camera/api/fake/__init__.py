@@ -1,5 +1,4 @@
 from .device import FakeDevice as Device
 from .encoder import FakeEncoder as Encoder
 from .preview import PreviewEncoder as Preview
-
-
+from .combined import CombinedEncoder as Combined
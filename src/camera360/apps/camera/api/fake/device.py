@@ -1,7 +1,10 @@
+import asyncio
+import time
 import typing
 from pathlib import Path
 
 from camera360.lib.camera import device
+from camera360.lib.camera.buffers import BufferPool
 from camera360.lib.camera.controls import BaseControl, MenuItem, Integer
 from camera360.lib.camera.device import RawFrame
 from camera360.lib.camera.protocol import Metadata
@@ -14,11 +17,22 @@ class FakeDevice(device.VideoDevice):
     to run and debug system on regular linux machine
     rather than sticking to RockChip devices.
     """
-    def __init__(self):
+    def __init__(self, fps: float = 30, buffers: int = 4, max_buffers: int = 256):
         # usually vl4 devices count frames for you
         # but we will do that manually
         self._frame_index = 0
 
+        # frames are "captured" at fixed rate like sensor does
+        self._interval = 1 / fps
+        self._next_frame: typing.Optional[float] = None
+
+        with open(Path(__file__).parent.absolute() / "test.jpg", "rb") as f:
+            self._image = f.read()
+        # frames are filled into recycled buffers like driver does, there are
+        # as many of them as stages and encoder feeds hold at once, sensor
+        # drops frames only if sinks hold more than max_buffers
+        self._buffers = BufferPool(len(self._image), buffers, max_buffers)
+
     async def metadata(self) -> Metadata:
         return Metadata(devices=[])
 
@@ -35,7 +49,28 @@ class FakeDevice(device.VideoDevice):
         ]
 
     async def get_frame(self) -> RawFrame:
-        base_dir = Path(__file__).parent.absolute()
+        now = time.monotonic()
+        if self._next_frame is None:
+            self._next_frame = now
+
+        # frames nobody read in time are lost, like sensor drops them
+        while self._next_frame < now - self._interval:
+            self._next_frame += self._interval
+            self._frame_index += 1
+
+        while True:
+            await asyncio.sleep(self._next_frame - time.monotonic())
+            timestamp = self._next_frame
+            self._next_frame += self._interval
+            self._frame_index += 1
+
+            if buffer := self._buffers.get():
+                break
 
-        with open(base_dir / "test.jpg", "rb") as f:
-            return RawFrame(sequence=self._frame_index + 1, buffer=f.read())
+        buffer.data[:] = self._image
+        return RawFrame(
+            sequence=self._frame_index,
+            buffer=buffer.view,
+            timestamp=timestamp,
+            owner=buffer,
+        )
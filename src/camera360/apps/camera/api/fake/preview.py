@@ -1,51 +1,45 @@
-import asyncio
-import logging
 import os
-import shlex
 import typing
 
+from camera360.apps.camera.api.feed import EncoderFeed, framerate_caps
 from camera360.lib.camera import device
+from camera360.lib.camera.device import RawFrame
+from camera360.lib.camera.pipeline import Overflow
 
 
 class PreviewEncoder(device.Preview):
     def __init__(self, dirname: str):
-        self._preview_pipeline = None
         self._dirname = dirname
+        self._feed: typing.Optional[EncoderFeed] = None
 
-        self._preview_pipeline: typing.Optional[asyncio.subprocess.Process] = None
-
-    async def init(self):
+    async def init(self, framerate: float):
         os.makedirs(self._dirname, exist_ok=True)
 
-        self._preview_pipeline = await asyncio.create_subprocess_exec(
-            "gst-launch-1.0",
-            *shlex.split(
-                "fdsrc fd=0 "
-                "! image/jpeg, width=378, height=378 "
-                "! jpegdec "
-                "! video/x-raw, framerate=10/1 "
-                "! x264enc "
-                "! h264parse "
-                f"! hlssink2 "
-                f"max-files=5 "
-                f"target-duration=5 "
-                f"location={self._dirname}/segment%05d.ts "
-                f"playlist-location={self._dirname}/preview.m3u8"
-            ),
-            stdin=asyncio.subprocess.PIPE,
+        # preview only needs recent frames
+        self._feed = EncoderFeed(
+            "preview",
+            "fdsrc fd=0 "
+            "! image/jpeg, width=378, height=378 "
+            "! jpegdec "
+            f"! video/x-raw, framerate={framerate_caps(framerate)} "
+            "! x264enc "
+            "! h264parse "
+            f"! hlssink2 "
+            f"max-files=5 "
+            f"target-duration=5 "
+            f"location={self._dirname}/segment%05d.ts "
+            f"playlist-location={self._dirname}/preview.m3u8",
+            overflow=Overflow.drop_oldest,
         )
+        await self._feed.start()
 
     async def fini(self):
-        if self._preview_pipeline:
-            self._preview_pipeline.stdin.close()
-
-        logging.info('Waiting for the capture process to finish')
-        await self._preview_pipeline.wait()
-        self._preview_pipeline = None
+        if self._feed:
+            await self._feed.stop()
+        self._feed = None
 
-    async def encode(self, buffer: bytes):
-        logging.info("Encondign buffer len=%s", len(buffer))
-        self._preview_pipeline.stdin.write(buffer)
+    async def encode(self, frame: RawFrame):
+        await self._feed.write(frame)
 
     async def get_file(self, filename: str):
         with open(os.path.join(self._dirname, filename), "rb") as f:
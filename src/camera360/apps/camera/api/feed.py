@@ -0,0 +1,156 @@
+import asyncio
+import collections
+import fractions
+import logging
+import os
+import shlex
+import sys
+import time
+import typing
+
+from camera360.lib.camera.device import RawFrame
+from camera360.lib.camera.pipeline import Overflow, offer
+from camera360.lib.rpc.metrics import REGISTRY, FeedMetrics, MetricsRegistry
+
+
+def framerate_caps(fps: float) -> str:
+    """Frame rate as a fraction of gst caps, e.g. 15/2 for 7.5 fps."""
+    rate = fractions.Fraction(fps).limit_denominator(1001)
+    return f"{rate.numerator}/{rate.denominator}"
+
+
+class EncoderFeed:
+    """
+    Writes frames into stdin of the gst-launch process. Writer waits
+    until encoder reads every frame from the pipe, so frames don't pile up
+    in the transport buffer, at most `size` frames wait for their turn
+    and the overflow policy decides what happens to the next ones.
+    Frames are written straight from their buffers and released
+    once they are in the pipe.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        pipeline: str,
+        overflow: Overflow = Overflow.block,
+        size: int = 2,
+        registry: MetricsRegistry = REGISTRY,
+        program: str = "gst-launch-1.0",
+    ):
+        self.name = name
+        self.pipeline = pipeline
+        self.overflow = overflow
+        self.registry = registry
+        self.program = program
+        self.metrics = FeedMetrics()
+
+        self._frames: asyncio.Queue[typing.Optional[RawFrame]] = asyncio.Queue(size)
+        self._process: typing.Optional[asyncio.subprocess.Process] = None
+        self._writer: typing.Optional[asyncio.Task] = None
+        # recent writes for the rate of the feed
+        self._writes: collections.deque[tuple[float, int]] = collections.deque(
+            maxlen=32
+        )
+
+    def __repr__(self):
+        return f"EncoderFeed[{self.name}]"
+
+    async def start(self) -> None:
+        self.metrics = self.registry.feed(self.name)
+        self._process = await asyncio.create_subprocess_exec(
+            self.program,
+            *shlex.split(self.pipeline),
+            stdin=asyncio.subprocess.PIPE,
+        )
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def write(self, frame: RawFrame) -> None:
+        if self._writer.done():
+            raise BrokenPipeError("%s is not running" % self)
+
+        frame.retain()
+        try:
+            dropped = await offer(self._frames, frame, self.overflow)
+        except asyncio.CancelledError:
+            frame.release()
+            raise
+        if dropped is not None:
+            dropped.release()
+            self.metrics.dropped += 1
+        self.metrics.queued = queued = self._frames.qsize()
+        self.metrics.max_queued = max(self.metrics.max_queued, queued)
+
+    async def _write_loop(self) -> None:
+        try:
+            while (frame := await self._frames.get()) is not None:
+                self.metrics.queued = self._frames.qsize()
+
+                size, started = len(frame.buffer), time.perf_counter()
+                try:
+                    await self._write(frame.buffer)
+                finally:
+                    frame.release()
+                finished = time.perf_counter()
+                self._frames.task_done()
+
+                self.metrics.frames += 1
+                self.metrics.bytes += size
+                self.metrics.stall_time += finished - started
+
+                self._writes.append((finished, size))
+                first = self._writes[0][0]
+                if finished > first:
+                    written = sum(size for _, size in self._writes) - self._writes[0][1]
+                    self.metrics.bytes_per_second = written / (finished - first)
+        except ConnectionError:
+            logging.error("%s stopped reading frames", self)
+
+    async def _write(self, buffer: bytes | memoryview) -> None:
+        stdin = self._process.stdin
+        # there is no add_writer on windows
+        if sys.platform == "win32":
+            stdin.write(buffer)
+            await stdin.drain()
+            return
+
+        # pipe transport would copy whatever doesn't fit into the pipe
+        # right away, so frame is written by pieces as pipe takes them
+        fd = stdin.transport.get_extra_info("pipe").fileno()
+        view, offset = memoryview(buffer).cast("B"), 0
+        while offset < len(view):
+            try:
+                offset += os.write(fd, view[offset:])
+            except BlockingIOError:
+                await _writable(fd)
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Writes frames which are still queued and waits for encoder to finish."""
+        if not self._writer.done():
+            try:
+                await asyncio.wait_for(
+                    offer(self._frames, None, Overflow.block), timeout
+                )
+                await asyncio.wait_for(asyncio.shield(self._writer), timeout)
+            except asyncio.TimeoutError:
+                logging.warning("%s didn't take remaining frames in time", self)
+                self._writer.cancel()
+
+        while not self._frames.empty():
+            if frame := self._frames.get_nowait():
+                frame.release()
+
+        self._process.stdin.close()
+        logging.info("Waiting for %s to finish", self)
+        await self._process.wait()
+        self._process = None
+
+
+async def _writable(fd: int) -> None:
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    loop.add_writer(fd, lambda: ready.done() or ready.set_result(None))
+    try:
+        await ready
+    finally:
+        loop.remove_writer(fd)
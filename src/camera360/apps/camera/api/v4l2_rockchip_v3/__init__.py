@@ -1,3 +1,4 @@
 from .device import RockchipDevice as Device
 from .encoder import MppEncoder as Encoder
 from .preview import PreviewEncoder as Preview
+from .combined import CombinedEncoder as Combined
@@ -0,0 +1,67 @@
+import datetime
+import os
+import typing
+
+from camera360.apps.camera.api.feed import EncoderFeed, framerate_caps
+from camera360.lib.camera import device
+from camera360.lib.camera.device import RawFrame
+from camera360.lib.camera.pipeline import Overflow
+
+
+class CombinedEncoder(device.Encoder, device.Preview):
+    """
+    Records video and makes preview in one gst pipeline, every frame
+    is parsed once and tee splits it between hardware encoders, preview
+    branch drops frames when it falls behind, so recording is never
+    held back by it.
+    """
+
+    def __init__(self, dirname: str, preview_dirname: str):
+        self._dirname = dirname
+        self._preview_dirname = preview_dirname
+        self._feed: typing.Optional[EncoderFeed] = None
+
+    async def init(self, framerate: float):
+        os.makedirs(self._dirname, exist_ok=True)
+        os.makedirs(self._preview_dirname, exist_ok=True)
+
+        # recording never drops frames
+        self._feed = EncoderFeed(
+            "record",
+            "fdsrc fd=0 "
+            "! queue "
+            "! rawvideoparse width=4048 height=3040 format=nv12 "
+            f"framerate={framerate_caps(framerate)} "
+            "! tee name=frames "
+            "frames. "
+            "! queue "
+            "! mpph264enc "
+            "! h264parse "
+            "! mp4mux "
+            f"! filesink location={self._dirname}/{datetime.datetime.now().isoformat()}.mp4 "
+            "frames. "
+            "! queue leaky=downstream max-size-buffers=2 "
+            "! videoscale "
+            "! video/x-raw,width=640,height=480 "
+            "! mpph264enc "
+            "! h264parse "
+            "! hlssink2 "
+            "max-files=5 "
+            "target-duration=5 "
+            f"location={self._preview_dirname}/segment%05d.ts "
+            f"playlist-location={self._preview_dirname}/preview.m3u8",
+            overflow=Overflow.block,
+        )
+        await self._feed.start()
+
+    async def fini(self):
+        if self._feed:
+            await self._feed.stop()
+        self._feed = None
+
+    async def encode(self, frame: RawFrame):
+        await self._feed.write(frame)
+
+    async def get_file(self, filename: str):
+        with open(os.path.join(self._preview_dirname, filename), "rb") as f:
+            return f.read()
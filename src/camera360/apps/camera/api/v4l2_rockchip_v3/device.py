@@ -56,15 +56,16 @@ class RockchipDevice(device.VideoDevice):
 
     async def get_frame(self) -> RawFrame:
         frame: Frame = self._video_feed.buffer.read()
-        logging.info(f"Received frame "
-                     f"timestamp={frame.timestamp}, "
-                     f"frame_nb={frame.frame_nb}, "
-                     f"width={frame.width}, "
-                     f"height={frame.height}, "
-                     f"format={frame.pixel_format.name}")
+        logging.debug("Received frame timestamp=%s, frame_nb=%s, width=%s, height=%s, format=%s",
+                      frame.timestamp, frame.frame_nb, frame.width, frame.height,
+                      frame.pixel_format.name)
 
         if frame.frame_nb != self.frame_id + 1:
             logging.warning('Dropped frame number=%s', self.frame_id + 1)
 
         self.frame_id = frame.frame_nb
-        return RawFrame(sequence=self.frame_id, buffer=frame.data)
+        # v4l2py copies mmap buffer and queues it back right away,
+        # so data is ours and sinks share it without copying
+        return RawFrame(
+            sequence=self.frame_id, buffer=frame.data, timestamp=frame.timestamp
+        )
@@ -1,11 +1,11 @@
-import asyncio
 import datetime
-import logging
 import os
-import shlex
 import typing
 
+from camera360.apps.camera.api.feed import EncoderFeed, framerate_caps
 from camera360.lib.camera import device
+from camera360.lib.camera.device import RawFrame
+from camera360.lib.camera.pipeline import Overflow
 
 
 class MppEncoder(device.Encoder):
@@ -20,33 +20,30 @@ class MppEncoder(device.Encoder):
     """
     def __init__(self, dirname="video"):
         self._dirname = dirname
-        self._capture_pipeline: typing.Optional[asyncio.subprocess.Process] = None
+        self._feed: typing.Optional[EncoderFeed] = None
 
-    async def init(self):
+    async def init(self, framerate: float):
         os.makedirs(self._dirname, exist_ok=True)
 
-        self._capture_pipeline = await asyncio.create_subprocess_exec(
-            "gst-launch-1.0",
-            *shlex.split(
-                "fdsrc fd=0 "
-                '! queue '
-                '! rawvideoparse width=4048 height=3040 format=nv12 framerate=10/1 '
-                '! mpph264enc '
-                '! h264parse '
-                '! mp4mux '
-                f"! filesink location={self._dirname}/{datetime.datetime.now().isoformat()}.mp4"
-            ),
-            stdin=asyncio.subprocess.PIPE,
+        # recording never drops frames
+        self._feed = EncoderFeed(
+            "record",
+            "fdsrc fd=0 "
+            '! queue '
+            '! rawvideoparse width=4048 height=3040 format=nv12 '
+            f'framerate={framerate_caps(framerate)} '
+            '! mpph264enc '
+            '! h264parse '
+            '! mp4mux '
+            f"! filesink location={self._dirname}/{datetime.datetime.now().isoformat()}.mp4",
+            overflow=Overflow.block,
         )
+        await self._feed.start()
 
     async def fini(self):
-        if self._capture_pipeline:
-            self._capture_pipeline.stdin.close()
+        if self._feed:
+            await self._feed.stop()
+        self._feed = None
 
-        logging.info('Waiting for the capture process to finish')
-        await self._capture_pipeline.wait()
-        self._capture_pipeline = None
-
-    async def encode(self, buffer: bytes):
-        logging.info("Encondign buffer len=%s", len(buffer))
-        self._capture_pipeline.stdin.write(buffer)
+    async def encode(self, frame: RawFrame):
+        await self._feed.write(frame)
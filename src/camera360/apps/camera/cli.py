@@ -1,5 +1,6 @@
 import asyncio
 import functools
+import inspect
 import logging
 import types
 
@@ -14,14 +15,16 @@ class Application(CameraProtocol):
     def __init__(self):
         self.cli = typer.Typer()
         # register all known methods as cli commands
-        for name, method in self.methods.items():
+        for name in self.methods:
             self.cli.command()(self._create_command_callback(name, getattr(self, name)))
 
     async def run_command(self, name, *args, **kwargs):
         async with connect(host="127.0.0.1", port=8000, protocol=CameraProtocol) as executor:
 
-            async_method = getattr(executor, name)(*args, **kwargs)
-            method_result = await async_method
+            method_result = getattr(executor, name)(*args, **kwargs)
+            # streaming methods return async generators right away
+            if inspect.isawaitable(method_result):
+                method_result = await method_result
 
             if isinstance(method_result, types.AsyncGeneratorType):
                 while True:
@@ -1,16 +1,23 @@
 import asyncio
-import base64
 import datetime
 import logging
-import traceback
-from typing import Optional
+from typing import Any, Optional
 
 from camera360.apps.camera.api import load_api
 from camera360.apps.camera.settings import settings
-from camera360.lib.camera.protocol import CameraProtocol, CaptureStartData
-from camera360.lib.rpc.protocol import RPCHandler
+from camera360.lib.camera.device import RawFrame
+from camera360.lib.camera.pacing import Pacer
+from camera360.lib.camera.pipeline import Overflow, Pipeline, Stage
+from camera360.lib.camera.protocol import (
+    BULK_CHANNEL,
+    CameraProtocol,
+    CaptureStartData,
+)
+from camera360.lib.rpc.metrics import REGISTRY, Metrics
+from camera360.lib.rpc.protocol import Blob, RPCHandler
 from camera360.lib.supervisor.protocol import SupervisorProtocol, FrameData
 from camera360.lib.rpc.server import start_server
+from camera360.lib.rpc.tracing import TRACER, dump_on_signal
 
 
 class Handler(RPCHandler, CameraProtocol):
@@ -20,12 +27,18 @@ class Handler(RPCHandler, CameraProtocol):
         api = load_api(settings.device)
 
         self._camera_api = api.Device()
-        self._preview_encoder = api.Preview(
-            dirname=settings.get_preview_dir())
-        self._encoder = api.Encoder(
-            dirname=settings.get_video_dir())
-
-        self._capture_task: Optional[asyncio.Task] = None
+        if settings.combined_encoder:
+            self._encoder = self._preview_encoder = api.Combined(
+                dirname=settings.get_video_dir(),
+                preview_dirname=settings.get_preview_dir(),
+            )
+        else:
+            self._preview_encoder = api.Preview(dirname=settings.get_preview_dir())
+            self._encoder = api.Encoder(dirname=settings.get_video_dir())
+
+        self._pipeline: Optional[Pipeline] = None
+        # outlives pipelines, so frame rate set before start is kept
+        self._pacer = Pacer(fps=settings.framerate)
         super().__init__()
 
     async def metadata(self):
@@ -34,73 +47,113 @@ class Handler(RPCHandler, CameraProtocol):
     async def start(
         self, *, device_path: str, width: int, height: int
     ) -> CaptureStartData:
-        if self._capture_task:
+        if self._pipeline:
             raise RuntimeError("Already started.")
 
         await self._camera_api.start(path=device_path, width=width, height=height)
-
-        self._capture_task = asyncio.create_task(self._capture_loop())
-        self._capture_task.add_done_callback(self.on_task_done)
+        await self._start_pipeline()
 
         return CaptureStartData(
             capture_time=datetime.datetime.now(), index=1, meta=dict(test="test")
         )
 
-    def on_task_done(self, future: asyncio.Task):
-        if e := future.exception():
-            traceback.print_exception(e)
-
-    async def _capture_loop(self) -> None:
-        await self._encoder.init()
-        await self._preview_encoder.init()
-
-        while True:
-            frame = await self._camera_api.get_frame()
-            await self._encoder.encode(frame.buffer)
-            await self._preview_encoder.encode(frame.buffer)
-
-            logging.info("Sending frame callback")
-            try:
-                await asyncio.gather(
-                    *[
-                        item.on_frame_received(frame=FrameData(index=frame.sequence))
-                        for item in self.supervisors
-                    ]
-                )
-            except ConnectionResetError:
-                logging.warning("Unable to deliver callback")
-                pass
-            await asyncio.sleep(0.1)
+    async def _notify(self, frame: RawFrame) -> None:
+        try:
+            await asyncio.gather(
+                *[
+                    item.on_frame_received(frame=FrameData(index=frame.sequence))
+                    for item in self.supervisors
+                ]
+            )
+        except ConnectionResetError:
+            logging.warning("Unable to deliver callback")
 
     async def stop(self) -> None:
-        if self._capture_task is None:
+        if self._pipeline is None:
             logging.warning("Camera already stopped")
             return
 
+        await self._stop_pipeline()
         await self._camera_api.stop()
 
-        self._capture_task.cancel()
-        self._capture_task = None
+    async def _start_pipeline(self) -> None:
+        # encoded stream is stamped with the rate frames are paced at
+        framerate = self._pacer.fps
+        await self._encoder.init(framerate)
+
+        # recording never loses frames, the rest only need recent ones
+        stages = [
+            Stage(
+                "encode",
+                self._encoder.encode,
+                size=settings.record_buffer,
+                overflow=Overflow.block,
+            ),
+            Stage("notify", self._notify, size=2),
+        ]
+        # combined encoder makes preview from the frames it records
+        if self._preview_encoder is not self._encoder:
+            await self._preview_encoder.init(framerate)
+            stages.append(Stage("preview", self._preview_encoder.encode, size=2))
+
+        self._pipeline = Pipeline(self._camera_api.get_frame, stages, pacer=self._pacer)
+        self._pipeline.start()
+
+    async def _stop_pipeline(self) -> None:
+        # frames captured so far are still recorded
+        await self._pipeline.stop()
+        self._pipeline = None
 
         await self._encoder.fini()
-        await self._preview_encoder.fini()
+        if self._preview_encoder is not self._encoder:
+            await self._preview_encoder.fini()
+
+    async def set_controls(self, *, values: dict[str, Any]) -> None:
+        if "Framerate" not in values:
+            return
+
+        framerate = values["Framerate"] or settings.framerate
+        if framerate == self._pacer.fps:
+            return
+
+        # rate of the encoded stream can't change on the fly,
+        # so encoders start over with the new one
+        if self._pipeline is None:
+            self._pacer.fps = framerate
+        else:
+            await self._stop_pipeline()
+            self._pacer.fps = framerate
+            await self._start_pipeline()
 
     async def reset(self) -> None:
-        if self._capture_task:
+        if self._pipeline:
             await self.stop()
 
-    async def preview(self, filename: str) -> bytes:
+    async def preview(self, filename: str) -> Blob:
         while True:
             try:
-                return base64.encodebytes(await self._preview_encoder.get_file(filename))
+                return Blob(await self._preview_encoder.get_file(filename))
             except FileNotFoundError:
                 await asyncio.sleep(0.2)
 
+    async def metrics(self) -> Metrics:
+        return REGISTRY.snapshot()
+
+    async def trace(self) -> Blob:
+        return Blob(TRACER.dumps())
+
 
 async def run():
     handler = Handler()
-
-    server = await start_server(handler, host=settings.host, port=settings.port)
+    dump_on_signal()
+
+    server = await start_server(
+        handler,
+        host=settings.host,
+        port=settings.port,
+        url=settings.url,
+        channels={BULK_CHANNEL: handler},
+    )
 
     async with server:
         await server.serve_forever()
@@ -2,7 +2,7 @@ import enum
 import os.path
 from pathlib import Path
 from tempfile import gettempdir
-from typing import Literal
+from typing import Literal, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -30,10 +30,19 @@ class Settings(BaseSettings):
 
     host: str = "127.0.0.1"
     port: int = 8000
+    # e.g. unix:///run/camera.sock, replaces host and port when set
+    url: Optional[str] = None
 
     device: Literal['fake', 'v4l2_rockchip_v3'] = "fake"
 
     storage_path: str = ""
+    # one encoder process records and makes preview, frames are written once
+    combined_encoder: bool = False
+    # frames waiting to be recorded, capture stops when encoder falls that far behind
+    record_buffer: int = 32
+    # output frame rate, encoded stream is stamped with it,
+    # supervisor changes it with Framerate control
+    framerate: float = 10
 
     # Current environment
     environment: str = "dev"
@@ -4,7 +4,11 @@ from dataclasses import dataclass
 from typing import Optional
 
 from camera360.lib.rpc.server import Connection
-from camera360.lib.supervisor.protocol import SystemStatus, SupervisorProtocol
+from camera360.lib.supervisor.protocol import (
+    BULK_CHANNEL,
+    SystemStatus,
+    SupervisorProtocol,
+)
 
 
 @dataclass
@@ -16,6 +20,8 @@ class GlobalStatus:
 class Application:
     def __init__(self):
         self._supervisor: SupervisorProtocol | None = None
+        self._bulk: SupervisorProtocol | None = None
+        self._events: asyncio.Future | None = None
         self._status = GlobalStatus()
 
     async def status(self, refresh: bool = True) -> GlobalStatus:
@@ -25,6 +31,19 @@ class Application:
             self._status.pending_status = new_status.pending_status
         return self._status
 
+    async def load(self):
+        """
+        Fetches everything page needs in a single round trip.
+        """
+        batch = self._supervisor.batch()
+        batch.status()
+        batch.controls()
+        new_status, controls = await batch.send()
+
+        self._status.status = new_status.status
+        self._status.pending_status = new_status.pending_status
+        return self._status, controls
+
     async def start_capture(self):
         assert self._status.status == SystemStatus.idle, \
             "Unable to start already started capture"
@@ -42,7 +61,10 @@ class Application:
         await self.status(refresh=True)
 
     async def preview(self, filename):
-        return await self._supervisor.preview(filename=filename)
+        return await self._bulk.preview(filename=filename)
+
+    async def metrics(self):
+        return await self._supervisor.metrics()
 
     async def controls(self):
         return await self._supervisor.controls()
@@ -57,9 +79,19 @@ class Application:
 
         self._supervisor = await connection.connect(
             protocol=SupervisorProtocol, handler=None)
+        self._bulk = connection.open(SupervisorProtocol, BULK_CHANNEL)
 
+        self._events = asyncio.ensure_future(self._watch_events())
         asyncio.ensure_future(self._wait_for_disconnect(connection))
 
+    async def _watch_events(self):
+        try:
+            async for status in self._supervisor.events():
+                self._status.status = status.status
+                self._status.pending_status = status.pending_status
+        except ConnectionError:
+            logging.info('Events stream closed')
+
     async def disconnect(self):
         if self._supervisor:
             pass
@@ -68,10 +100,16 @@ class Application:
         logging.info('Client disconnected')
         await connection.wait_for_disconnect()
 
+        # session is resumed, so calls in flight and
+        # events stream continue on the new connection
         while True:
             try:
-                await self.connect()
-            except ConnectionRefusedError:
+                await connection.reconnect()
+            except OSError:
                 await asyncio.sleep(0.2)
             else:
                 break
+
+        if self._events.done():
+            self._events = asyncio.ensure_future(self._watch_events())
+        asyncio.ensure_future(self._wait_for_disconnect(connection))
@@ -1,4 +1,3 @@
-import base64
 from functools import partial
 from typing import Optional, Any
 
@@ -8,6 +7,7 @@ from fastapi import Response
 from camera360.apps.gui.app import Application
 from camera360.apps.gui.controls import create_control
 from camera360.lib.camera.controls import AnyControl
+from camera360.lib.rpc.metrics import to_prometheus
 from camera360.lib.supervisor.protocol import SystemStatus
 
 application: Optional[Application] = None
@@ -62,7 +62,7 @@ async def main():
           }
         }</script>""")
 
-    status = await application.status()
+    status, controls = await application.load()
 
     with ui.header().classes(replace="row items-center") as header, ui.tabs() as tabs:
         ui.tab("Main")
@@ -106,7 +106,7 @@ async def main():
 
             ui.label("Controls")
             with ui.row().classes('w-full'):
-                for item in await application.controls():
+                for item in controls:
                     create_control(control=item, on_change=partial(on_control_change, item))
 
         # for client in status.clients:
@@ -117,9 +117,17 @@ async def main():
 @app.get("/video/stream/{rest_of_path:path}")
 async def grab_video_frame(rest_of_path) -> Response:
     return Response(
-        content=base64.decodebytes(await application.preview(filename=rest_of_path)),
+        content=await application.preview(filename=rest_of_path),
         media_type="text/plain",
     )
 
 
+@app.get("/metrics")
+async def metrics() -> Response:
+    return Response(
+        content=to_prometheus(await application.metrics()),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
 ui.run()
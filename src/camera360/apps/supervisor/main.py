@@ -1,13 +1,15 @@
 import asyncio
 import logging
 from contextlib import contextmanager
-from typing import List, Any
+from typing import AsyncIterator, List, Any
 
 from camera360.apps.supervisor.settings import settings
 from camera360.lib.camera.controls import Integer, AnyControl
-from camera360.lib.camera.protocol import CameraProtocol
-from camera360.lib.rpc.protocol import RPCHandler
+from camera360.lib.camera.protocol import BULK_CHANNEL, CameraProtocol
+from camera360.lib.rpc.metrics import REGISTRY, Metrics
+from camera360.lib.rpc.protocol import Blob, RPCHandler
 from camera360.lib.rpc.server import connect, start_server, Connection
+from camera360.lib.rpc.tracing import TRACER, dump_on_signal
 from camera360.lib.supervisor.protocol import (
     SupervisorProtocol,
     FrameData,
@@ -16,18 +18,16 @@ from camera360.lib.supervisor.protocol import (
     SystemStatus,
 )
 
-CONNECTIONS = [
-    ("127.0.0.1", 8000),
-    # ("127.0.0.1", 8001)
-]
-
-
 class Handler(RPCHandler, SupervisorProtocol):
     def __init__(self):
         self.supervisors: list[SupervisorProtocol] = []
         self.cameras: list[CameraProtocol] = []
+        # same cameras, but bound to the bulk logical channel
+        self.previews: list[CameraProtocol] = []
 
         self._status = Status(status=SystemStatus.idle)
+        # queues of clients subscribed to status updates
+        self._subscribers: list[asyncio.Queue[Status]] = []
 
         self._controls = [
             Integer(name="Exposure", value=11, minimum=10, maximum=25, default=11),
@@ -40,6 +40,7 @@ class Handler(RPCHandler, SupervisorProtocol):
         assert self._status.pending_status is None, "Pending status is already set"
 
         self._status.pending_status = status
+        self._publish_status()
 
         try:
             yield
@@ -49,28 +50,52 @@ class Handler(RPCHandler, SupervisorProtocol):
         else:
             self._status.status = self._status.pending_status
             self._status.pending_status = None
+        finally:
+            self._publish_status()
+
+    def _publish_status(self):
+        TRACER.event("supervisor.publish", size=len(self._subscribers))
+        for queue in self._subscribers:
+            # slow subscriber only needs the latest status
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(self._status.model_copy(deep=True))
 
     async def on_frame_received(self, frame: FrameData) -> None:
-        print("on_frame_received", frame)
+        TRACER.event("supervisor.frame", frame.index)
 
-    async def get_clients(self) -> List[Client]:
+    def _clients(self) -> List[Client]:
         return [
-            Client(name="Camera %s" % index)
+            Client(
+                name="Camera %s" % index,
+                connected=client._channel.is_connected,
+                rtt=client._channel.rtt.mean,
+            )
             for index, client in enumerate(self.cameras)
         ]
 
+    async def get_clients(self) -> List[Client]:
+        return self._clients()
+
     async def start(self) -> None:
+        started = TRACER.now()
         with self._status_transition(SystemStatus.capture):
+            await self._send_controls(
+                {control.name: control.value for control in self._controls}
+            )
             await asyncio.gather(
                 *[
                     client.start(device_path="/dev/video0", width=1920, height=1080)
                     for client in self.cameras
                 ]
             )
+        TRACER.span("supervisor.start", started, size=len(self.cameras))
 
     async def stop(self) -> None:
+        started = TRACER.now()
         with self._status_transition(SystemStatus.idle):
             await asyncio.gather(*[client.stop() for client in self.cameras])
+        TRACER.span("supervisor.stop", started, size=len(self.cameras))
 
     async def controls(self) -> List[AnyControl]:
         return self._controls[:]
@@ -81,51 +106,95 @@ class Handler(RPCHandler, SupervisorProtocol):
                 continue
 
             control.value = values[control.name]
+        await self._send_controls(values)
+
+    async def _send_controls(self, values: dict[str, Any]) -> None:
+        await asyncio.gather(
+            *[client.set_controls(values=values) for client in self.cameras]
+        )
 
     async def status(self) -> Status:
-        self._status.clients = [
-            Client(name="Camera %s" % index)
-            for index, client in enumerate(self.cameras)
-        ]
+        self._status.clients = self._clients()
         return self._status
 
-    async def preview(self, *, filename: str) -> bytes:
-        return await self.cameras[0].preview(filename=filename)
+    async def events(self) -> AsyncIterator[Status]:
+        queue: asyncio.Queue[Status] = asyncio.Queue(maxsize=16)
+        self._subscribers.append(queue)
+
+        try:
+            yield await self.status()
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers.remove(queue)
+
+    async def preview(self, *, filename: str) -> Blob:
+        started = TRACER.now()
+        preview = await self.previews[0].preview(filename=filename)
+        TRACER.span("supervisor.preview", started, size=len(preview))
+        return preview
+
+    async def metrics(self) -> Metrics:
+        metrics = REGISTRY.snapshot()
+
+        # cameras which don't answer are just missing from the result
+        started = TRACER.now()
+        results = await asyncio.gather(
+            *[client.metrics() for client in self.cameras], return_exceptions=True
+        )
+        TRACER.span("supervisor.metrics", started, size=len(self.cameras))
+        for index, result in enumerate(results):
+            if isinstance(result, Exception):
+                logging.warning("Unable to get metrics of camera %s: %s", index, result)
+                continue
+            metrics.peers["Camera %s" % index] = result
+        return metrics
+
+    async def trace(self) -> Blob:
+        return Blob(TRACER.dumps())
 
 
 async def connect_hosts(connections, handler):
     pending_connections = connections[:]
-    executors = []
+    executors, previews = [], []
 
     while pending_connections:
-        for index, (host, port) in enumerate(pending_connections):
+        for index, url in enumerate(pending_connections):
             try:
-                connection = Connection(
-                    host=host, port=port)
+                connection = Connection(url=url)
                 remote = await connection.connect(
                     protocol=CameraProtocol, handler=handler)
 
                 await remote.reset()
                 executors.append(remote)
-            except ConnectionRefusedError:
-                logging.info("%s:%d is still unreachable", host, port)
+                previews.append(connection.open(CameraProtocol, BULK_CHANNEL))
+            except (ConnectionRefusedError, FileNotFoundError):
+                logging.info("%s is still unreachable", url)
                 continue
             else:
-                logging.info("Connection to %s:%d established", host, port)
-                pending_connections.remove((host, port))
+                logging.info("Connection to %s established", url)
+                pending_connections.remove(url)
                 logging.info("%s more hosts left", len(pending_connections))
     logging.info("All connections established")
 
-    return executors
+    return executors, previews
 
 
 async def run(connections):
     handler = Handler()
+    dump_on_signal()
 
-    executors = await connect_hosts(connections, handler=handler)
-    handler.cameras = executors
+    handler.cameras, handler.previews = await connect_hosts(
+        connections, handler=handler
+    )
 
-    server = await start_server(handler, host=settings.host, port=settings.port)
+    server = await start_server(
+        handler,
+        host=settings.host,
+        port=settings.port,
+        url=settings.url,
+        channels={BULK_CHANNEL: handler},
+    )
 
     async with server:
         await server.serve_forever()
@@ -134,7 +203,7 @@ async def run(connections):
 def main():
     logging.basicConfig(level=logging.DEBUG, force=True)
 
-    asyncio.run(run(connections=CONNECTIONS))
+    asyncio.run(run(connections=settings.cameras))
 
 
 if __name__ == "__main__":
@@ -2,7 +2,7 @@ import enum
 import os.path
 from pathlib import Path
 from tempfile import gettempdir
-from typing import Literal
+from typing import Literal, Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -30,6 +30,11 @@ class Settings(BaseSettings):
 
     host: str = "127.0.0.1"
     port: int = 8181
+    # e.g. unix:///run/supervisor.sock, replaces host and port when set
+    url: Optional[str] = None
+
+    # cameras to connect to, see camera360.lib.rpc.server.transports
+    cameras: list[str] = ["tcp://127.0.0.1:8000"]
 
     # Current environment
     environment: str = "dev"
@@ -0,0 +1,63 @@
+import logging
+from typing import Callable, Optional
+
+
+class FrameBuffer:
+    """
+    Memory of the frame shared by all its sinks, the last
+    one to release it gives the memory back to its owner,
+    e.g. pool of buffers or the driver which filled it.
+    """
+
+    def __init__(self, data, release: Optional[Callable[["FrameBuffer"], None]] = None):
+        self.data = data
+        self._release = release
+        self._refs = 1
+
+    def __repr__(self):
+        return f"FrameBuffer[{len(self.data)}] refs={self._refs}"
+
+    @property
+    def view(self) -> memoryview:
+        return memoryview(self.data)
+
+    def retain(self) -> "FrameBuffer":
+        if self._refs <= 0:
+            raise RuntimeError("%s is released already" % self)
+        self._refs += 1
+        return self
+
+    def release(self) -> None:
+        self._refs -= 1
+        if self._refs == 0 and self._release is not None:
+            self._release(self)
+        elif self._refs < 0:
+            logging.error("%s is released more than once", self)
+
+
+class BufferPool:
+    """
+    Recycled buffers, like the ones driver fills. Pool grows while sinks
+    hold all of its buffers, up to max_count, get() returns None after that.
+    """
+
+    def __init__(self, size: int, count: int, max_count: Optional[int] = None):
+        self.size = size
+        self.count = count
+        self.max_count = max(max_count or count, count)
+        self._free = [bytearray(size) for _ in range(count)]
+
+    @property
+    def available(self) -> int:
+        return len(self._free)
+
+    def get(self) -> Optional[FrameBuffer]:
+        if not self._free:
+            if self.count >= self.max_count:
+                return None
+            self._free.append(bytearray(self.size))
+            self.count += 1
+        return FrameBuffer(self._free.pop(), release=self._recycle)
+
+    def _recycle(self, buffer: FrameBuffer) -> None:
+        self._free.append(buffer.data)
@@ -4,6 +4,8 @@ import pydantic
 
 
 class BaseControl(pydantic.BaseModel):
+    model_config = pydantic.ConfigDict(defer_build=True)
+
     name: str
 
     value: typing.Any
@@ -34,6 +36,8 @@ AnyControl = typing.Union[MenuItem, Integer]
 
 
 class ControlsModel(pydantic.BaseModel):
+    model_config = pydantic.ConfigDict(defer_build=True)
+
     controls: typing.List[typing.Union[MenuItem, Integer]] = pydantic.Field(
         ..., discriminator="control_type"
     )
@@ -1,6 +1,7 @@
 import typing
 from dataclasses import dataclass
 
+from .buffers import FrameBuffer
 from .controls import BaseControl
 from .protocol import Metadata
 
@@ -8,7 +9,22 @@ from .protocol import Metadata
 @dataclass
 class RawFrame:
     sequence: int
-    buffer: bytes
+    # views are written to encoders as they are, without copying
+    buffer: bytes | memoryview
+    # seconds when sensor captured the frame, by the clock of the device
+    timestamp: float
+    # pooled memory behind the buffer, every sink holding
+    # the frame retains it and releases once it's done
+    owner: typing.Optional[FrameBuffer] = None
+
+    def retain(self) -> "RawFrame":
+        if self.owner is not None:
+            self.owner.retain()
+        return self
+
+    def release(self) -> None:
+        if self.owner is not None:
+            self.owner.release()
 
 
 class VideoDevice(typing.Protocol):
@@ -24,24 +40,25 @@ class VideoDevice(typing.Protocol):
 
 
 class Encoder(typing.Protocol):
-    async def init(self):
+    # frame rate the encoded stream is stamped with
+    async def init(self, framerate: float):
         ...
 
     async def fini(self):
         ...
 
-    async def encode(self, buffer: bytes):
+    async def encode(self, frame: RawFrame):
         ...
 
 
 class Preview(typing.Protocol):
-    async def init(self):
+    async def init(self, framerate: float):
         ...
 
     async def fini(self):
         ...
 
-    async def encode(self, buffer: bytes):
+    async def encode(self, frame: RawFrame):
         ...
 
     async def get_file(self, filename: str):
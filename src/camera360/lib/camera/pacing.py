@@ -0,0 +1,101 @@
+import collections
+import math
+from typing import Optional
+
+from camera360.lib.camera.device import RawFrame
+from camera360.lib.rpc.metrics import PacingMetrics
+
+# longer gaps between frames are not filled with duplicates,
+# e.g. when sensor was reconfigured, output starts over instead
+MAX_GAP = 1.0
+
+
+class Pacer:
+    """
+    Turns frames of the sensor into output of the target rate, output
+    slots follow each other exactly 1 / fps seconds apart by frame
+    timestamps, every frame fills slots up to its own timestamp::
+
+        for _ in range(pacer.pace(frame)):
+            await encoder.encode(frame.buffer)
+
+    Frames of faster sensor are skipped, missing ones are filled with
+    duplicates of the previous frame. Frames are passed as they are
+    while target rate is not set.
+    """
+
+    def __init__(self, fps: Optional[float] = None, metrics: PacingMetrics = None):
+        self.metrics = metrics or PacingMetrics()
+        self._next_slot: Optional[float] = None
+        self._last_timestamp: Optional[float] = None
+        # timestamps of the recent frames and slots they filled
+        self._window: collections.deque[tuple[float, int]] = collections.deque(
+            maxlen=64
+        )
+        self.fps = fps
+
+    @property
+    def fps(self) -> Optional[float]:
+        return self.metrics.target_fps
+
+    @fps.setter
+    def fps(self, value: Optional[float]) -> None:
+        if value is not None and value <= 0:
+            raise ValueError("Frame rate must be positive: %s" % value)
+
+        self.metrics.target_fps = value
+        # new rate starts from the next frame
+        self._next_slot = None
+
+    def pace(self, frame: RawFrame) -> int:
+        """Returns how many times frame goes to the output, 0 if it's skipped."""
+        timestamp = frame.timestamp
+        self._observe(timestamp)
+
+        if self.fps is None:
+            count = 1
+        else:
+            interval = 1 / self.fps
+            if self._next_slot is None or timestamp - self._next_slot > MAX_GAP:
+                self._next_slot = timestamp
+
+            # slot belongs to the frame closest to it, so jitter
+            # of the sensor doesn't skip frames of the same rate
+            tolerance = interval / 2
+            if self.metrics.sensor_fps:
+                tolerance = min(tolerance, 0.5 / self.metrics.sensor_fps)
+            count = max(
+                math.floor((timestamp + tolerance - self._next_slot) / interval) + 1, 0
+            )
+            self._next_slot += count * interval
+
+        if count == 0:
+            self.metrics.skipped += 1
+        else:
+            self.metrics.duplicated += count - 1
+
+        self._window.append((timestamp, count))
+        first, last = self._window[0][0], self._window[-1][0]
+        if last > first:
+            emitted = sum(slots for _, slots in self._window) - self._window[0][1]
+            self.metrics.output_fps = emitted / (last - first)
+        return count
+
+    def _observe(self, timestamp: float) -> None:
+        """
+        Sensor rate and jitter, smoothed like interarrival
+        jitter of RTP (RFC 3550) with 1/16 gain.
+        """
+        previous, self._last_timestamp = self._last_timestamp, timestamp
+        if previous is None or not 0 < timestamp - previous <= MAX_GAP:
+            return
+
+        interval = timestamp - previous
+        metrics = self.metrics
+        if metrics.sensor_fps is None:
+            metrics.sensor_fps, metrics.jitter = 1 / interval, 0.0
+            return
+
+        mean = 1 / metrics.sensor_fps
+        metrics.jitter += (abs(interval - mean) - metrics.jitter) / 16
+        metrics.sensor_fps = 1 / (mean + (interval - mean) / 16)
@@ -0,0 +1,200 @@
+import asyncio
+import enum
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from camera360.lib.camera.device import RawFrame
+from camera360.lib.camera.pacing import Pacer
+from camera360.lib.rpc.metrics import REGISTRY, MetricsRegistry, StageMetrics
+from camera360.lib.rpc.tracing import TRACER
+
+
+class Overflow(str, enum.Enum):
+    """What stage does with a new frame when its buffer is full."""
+
+    # capture waits for the stage, nothing is lost
+    block = "block"
+    # stage only needs recent frames
+    drop_oldest = "drop_oldest"
+    drop_newest = "drop_newest"
+
+
+async def offer(queue: asyncio.Queue, item, overflow: Overflow):
+    """Puts item into the bounded queue, returns item dropped to make room, if any."""
+    if queue.full():
+        if overflow == Overflow.drop_newest:
+            return item
+        if overflow == Overflow.drop_oldest:
+            dropped = queue.get_nowait()
+            queue.task_done()
+            queue.put_nowait(item)
+            return dropped
+
+    await queue.put(item)
+    return None
+
+
+class Stage:
+    """
+    Consumer of the captured frames, runs in its own task and
+    takes frames from the bounded buffer, so a slow stage only
+    affects itself unless it blocks the capture.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        process: Callable[[RawFrame], Awaitable[None]],
+        size: int = 4,
+        overflow: Overflow = Overflow.drop_oldest,
+    ):
+        self.name = name
+        self.process = process
+        self.overflow = overflow
+
+        # frames with time they were put into the buffer
+        self._frames: asyncio.Queue[tuple[RawFrame, float]] = asyncio.Queue(size)
+        self.metrics = StageMetrics()
+
+    def __repr__(self):
+        return f"Stage[{self.name}]"
+
+    async def put(self, frame: RawFrame) -> None:
+        item = (frame.retain(), time.perf_counter())
+        try:
+            dropped = await offer(self._frames, item, self.overflow)
+        except asyncio.CancelledError:
+            frame.release()
+            raise
+        if dropped is not None:
+            self._dropped(dropped[0])
+
+        self.metrics.depth = depth = self._frames.qsize()
+        self.metrics.max_depth = max(self.metrics.max_depth, depth)
+
+    def _dropped(self, frame: RawFrame) -> None:
+        frame.release()
+        self.metrics.dropped += 1
+        TRACER.event("capture.drop", frame.sequence)
+        logging.debug("%s dropped frame %s", self, frame.sequence)
+
+    async def run(self) -> None:
+        name = "capture.%s" % self.name
+        while True:
+            frame, queued_at = await self._frames.get()
+            self.metrics.depth = self._frames.qsize()
+
+            started, traced = time.perf_counter(), TRACER.now()
+            self.metrics.wait.observe(started - queued_at)
+            try:
+                await self.process(frame)
+            except Exception:
+                self.metrics.errors += 1
+                logging.exception("%s failed to process frame %s", self, frame.sequence)
+            else:
+                self.metrics.processed += 1
+            finally:
+                frame.release()
+                self._frames.task_done()
+
+            self.metrics.latency.observe(time.perf_counter() - started)
+            TRACER.span(name, traced, frame.sequence, len(frame.buffer))
+
+    async def drain(self) -> None:
+        await self._frames.join()
+
+    def clear(self) -> None:
+        """Releases frames which are not going to be processed."""
+        while not self._frames.empty():
+            frame, _ = self._frames.get_nowait()
+            frame.release()
+            self._frames.task_done()
+
+
+class Pipeline:
+    """
+    Captures frames and hands every one of them to all stages,
+    e.g. recording, preview and notifying supervisors, pacer
+    decides how many times each frame is handed over::
+
+        pipeline = Pipeline(device.get_frame, [
+            Stage("encode", encoder.encode, size=32, overflow=Overflow.block),
+            Stage("preview", preview.encode, size=2),
+        ])
+        pipeline.start()
+        ...
+        await pipeline.stop()
+    """
+
+    def __init__(
+        self,
+        source: Callable[[], Awaitable[RawFrame]],
+        stages: list[Stage],
+        registry: MetricsRegistry = REGISTRY,
+        pacer: Optional[Pacer] = None,
+    ):
+        self.source = source
+        self.stages = stages
+        self.registry = registry
+        self.pacer = pacer or Pacer()
+        self._tasks: list[asyncio.Task] = []
+        self._capture: Optional[asyncio.Task] = None
+        self._sequence: Optional[int] = None
+
+    def start(self) -> None:
+        self.registry.pacing = self.pacer.metrics
+        for stage in self.stages:
+            stage.metrics = self.registry.stage(stage.name)
+            self._tasks.append(asyncio.create_task(stage.run()))
+        self._capture = asyncio.create_task(self._capture_loop())
+        self._capture.add_done_callback(self._on_capture_done)
+
+    def _on_capture_done(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and (e := task.exception()):
+            logging.error("Capture failed", exc_info=e)
+
+    async def _capture_loop(self) -> None:
+        while True:
+            started = TRACER.now()
+            frame = await self.source()
+            TRACER.span("capture.get_frame", started, frame.sequence, len(frame.buffer))
+
+            # sensor counts frames it couldn't hand over as well
+            if self._sequence is not None and frame.sequence > self._sequence + 1:
+                lost = frame.sequence - self._sequence - 1
+                self.pacer.metrics.lost += lost
+                TRACER.event("capture.lost", frame.sequence, lost)
+            self._sequence = frame.sequence
+
+            count = self.pacer.pace(frame)
+            if count != 1:
+                TRACER.event("capture.pace", frame.sequence, count)
+            try:
+                for _ in range(count):
+                    for stage in self.stages:
+                        await stage.put(frame)
+            finally:
+                # stages hold their own references
+                frame.release()
+
+    async def stop(self, timeout: float = 5) -> None:
+        """
+        Stops capturing, frames which are already
+        captured are processed within the timeout.
+        """
+        tasks = [self._capture] + self._tasks
+        self._capture.cancel()
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*[stage.drain() for stage in self.stages]), timeout
+            )
+        except asyncio.TimeoutError:
+            logging.warning("Pipeline stages didn't finish in %s seconds", timeout)
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for stage in self.stages:
+            stage.clear()
+        self._tasks = []
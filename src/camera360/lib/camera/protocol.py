@@ -1,11 +1,19 @@
 import datetime
+from typing import Any
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
-from camera360.lib.rpc.protocol import RPCProtocol, method
+from camera360.lib.rpc.metrics import Metrics
+from camera360.lib.rpc.protocol import Blob, Priority, RPCProtocol, method
+
+# logical channel for previews, so transfer of large
+# files doesn't hold back control calls on the same connection
+BULK_CHANNEL = 1
 
 
 class CaptureStartData(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     capture_time: datetime.datetime
     index: int
 
@@ -13,6 +21,8 @@ class CaptureStartData(BaseModel):
 
 
 class Mode(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     width: int
     height: int
 
@@ -20,32 +30,48 @@ class Mode(BaseModel):
 
 
 class Camera(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     name: str
     path: str
     modes: list[Mode]
 
 
 class Metadata(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     devices: list[Camera]
 
 
 class CameraProtocol(RPCProtocol):
-    @method
+    @method(timeout=5, idempotent=True)
     async def metadata(self) -> Metadata: ...
 
-    @method
+    @method(timeout=10, priority=Priority.control)
     async def start(
         self, *, device_path: str, width: int, height: int
     ) -> CaptureStartData: ...
 
-    @method
+    @method(idempotent=True)
     async def controls(self): ...
 
-    @method
+    # Framerate sets output frame rate, recording goes on in a new file,
+    # None restores the default one
+    @method(timeout=10, priority=Priority.control, idempotent=True)
+    async def set_controls(self, *, values: dict[str, Any]) -> None: ...
+
+    @method(timeout=10, priority=Priority.control)
     async def stop(self) -> None: ...
 
-    @method
+    @method(timeout=10, priority=Priority.control)
     async def reset(self) -> None: ...
 
-    @method
-    async def preview(self, *, filename: str) -> bytes: ...
+    @method(timeout=5, priority=Priority.bulk, idempotent=True)
+    async def preview(self, *, filename: str) -> Blob: ...
+
+    @method(timeout=5, idempotent=True)
+    async def metrics(self) -> Metrics: ...
+
+    # recent spans of the hot paths in Chrome trace format, see tracing.Tracer
+    @method(timeout=10, priority=Priority.bulk, idempotent=True)
+    async def trace(self) -> Blob: ...
@@ -0,0 +1,27 @@
+import base64
+import typing
+
+import pydantic
+
+# Raw bytes returned from the rpc method. With binary framing they are
+# sent right after the frame header as-is, without being copied into
+# serialized payload, other framings fall back to JsonBlob.
+Blob = typing.NewType("Blob", bytes)
+
+
+def _from_base64(value):
+    if isinstance(value, str):
+        return base64.b64decode(value)
+    return value
+
+
+def _to_base64(value: bytes) -> str:
+    return base64.b64encode(value).decode()
+
+
+# base64 representation of the Blob inside json payloads
+JsonBlob = typing.Annotated[
+    bytes,
+    pydantic.BeforeValidator(_from_base64),
+    pydantic.PlainSerializer(_to_base64, when_used="json"),
+]
@@ -0,0 +1,90 @@
+import typing
+
+import pydantic
+import pydantic_core
+
+try:
+    import msgpack
+except ImportError:  # no cov
+    msgpack = None
+
+M = typing.TypeVar("M", bound=pydantic.BaseModel)
+
+Encoder = typing.Callable[[typing.Any], bytes]
+Decoder = typing.Callable[[bytes], typing.Any]
+
+
+class Codec(typing.Protocol):
+    name: str
+
+    def encoder(self, serializer: pydantic_core.SchemaSerializer) -> Encoder:
+        """
+        Returns function which encodes values described
+        by the given serializer, meant to be built once and cached.
+        """
+
+    def decoder(self, validator: pydantic_core.SchemaValidator) -> Decoder:
+        """
+        Returns function which decodes and validates
+        values described by the given validator.
+        """
+
+    def encode(self, model: pydantic.BaseModel) -> bytes:
+        return self.encoder(model.__pydantic_serializer__)(model)
+
+    def decode(self, model_type: type[M], data: bytes) -> M:
+        return self.decoder(model_type.__pydantic_validator__)(data)
+
+
+class JsonCodec(Codec):
+    name = "json"
+
+    def encoder(self, serializer: pydantic_core.SchemaSerializer) -> Encoder:
+        return serializer.to_json
+
+    def decoder(self, validator: pydantic_core.SchemaValidator) -> Decoder:
+        return validator.validate_json
+
+
+class MsgpackCodec(Codec):
+    """
+    Compact binary codec, bytes are kept as-is and values
+    msgpack doesn't know about (datetime, enums, etc.) are
+    converted to their json representation.
+    """
+
+    name = "msgpack"
+
+    def encoder(self, serializer: pydantic_core.SchemaSerializer) -> Encoder:
+        def encode(value) -> bytes:
+            return msgpack.packb(
+                serializer.to_python(value), default=pydantic_core.to_jsonable_python
+            )
+
+        return encode
+
+    def decoder(self, validator: pydantic_core.SchemaValidator) -> Decoder:
+        def decode(data: bytes):
+            return validator.validate_python(msgpack.unpackb(data))
+
+        return decode
+
+
+CODECS: dict[str, Codec] = {JsonCodec.name: JsonCodec()}
+
+if msgpack is not None:
+    CODECS[MsgpackCodec.name] = MsgpackCodec()
+
+
+def get_codec(name: str) -> Codec:
+    return CODECS[name]
+
+
+def available_codecs() -> list[str]:
+    """
+    Names of codecs supported by this process in order of preference.
+    Json goes first, pydantic encodes it natively and it costs less
+    CPU than msgpack (see tests/test_dispatch_benchmark.py), while
+    msgpack gives smaller payloads when bandwidth matters more.
+    """
+    return sorted(CODECS, key=lambda name: name != JsonCodec.name)
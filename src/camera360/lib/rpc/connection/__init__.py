@@ -1,8 +1,12 @@
+from typing import Optional
+
 import pydantic
 from pydantic import BaseModel
 
 
 class MethodCall(BaseModel):
+    model_config = pydantic.ConfigDict(defer_build=True)
+
     method: str
     arguments: bytes
 
@@ -10,5 +14,38 @@ class MethodCall(BaseModel):
 
 
 class MethodReturn(pydantic.BaseModel):
+    model_config = pydantic.ConfigDict(defer_build=True)
+
     value: object
     type: str = "return"
+
+
+class Message(BaseModel):
+    model_config = pydantic.ConfigDict(defer_build=True)
+
+    payload: bytes
+
+    request_id: Optional[int] = None
+    response_id: Optional[int] = None
+
+
+class Hello(BaseModel):
+    """
+    Sent by both peers when connection is established, client
+    lists options it supports and server replies with chosen ones.
+    """
+
+    model_config = pydantic.ConfigDict(defer_build=True)
+
+    codecs: list[str]
+    # older peers don't send it, which means no compression
+    compression: list[str] = []
+    # fingerprints of protocols peer serves on logical channels
+    schemas: dict[int, str] = {}
+    # peer answers pings
+    heartbeat: bool = False
+    # peer reassembles frames split into chunks
+    chunks: bool = False
+    # client sends id of the session to resume or empty string for a new one,
+    # server replies with id of the session it has, see Channel.resume
+    session: Optional[str] = None
@@ -0,0 +1,50 @@
+import enum
+import struct
+
+# method name size, arguments size
+_CALL = struct.Struct("!HI")
+# call status, result size
+_RESULT = struct.Struct("!BI")
+
+
+class CallStatus(enum.IntEnum):
+    ok = 0
+    blob = 1
+    exception = 2
+
+
+def encode_calls(calls: list[tuple[str, bytes]]) -> bytes:
+    buffers = []
+    for method, payload in calls:
+        method = method.encode()
+        buffers += [_CALL.pack(len(method), len(payload)), method, payload]
+    return b"".join(buffers)
+
+
+def decode_calls(data: bytes) -> list[tuple[str, bytes]]:
+    calls, offset = [], 0
+    while offset < len(data):
+        method_size, size = _CALL.unpack_from(data, offset)
+        offset += _CALL.size
+        method = data[offset : offset + method_size].decode()
+        offset += method_size
+        calls.append((method, data[offset : offset + size]))
+        offset += size
+    return calls
+
+
+def encode_results(results: list[tuple[CallStatus, bytes]]) -> bytes:
+    buffers = []
+    for status, payload in results:
+        buffers += [_RESULT.pack(status, len(payload)), payload]
+    return b"".join(buffers)
+
+
+def decode_results(data: bytes) -> list[tuple[CallStatus, bytes]]:
+    results, offset = [], 0
+    while offset < len(data):
+        status, size = _RESULT.unpack_from(data, offset)
+        offset += _RESULT.size
+        results.append((CallStatus(status), data[offset : offset + size]))
+        offset += size
+    return results
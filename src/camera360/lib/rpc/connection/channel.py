@@ -1,20 +1,135 @@
 import asyncio
+import collections
+import contextlib
+import dataclasses
+import functools
 import logging
+import time
 import traceback
-from typing import Optional
+from typing import AsyncIterator, Callable, Literal, Optional
 
-import pydantic
-from pydantic import BaseModel
 
-from camera360.lib.rpc.connection import MethodCall, MethodReturn
-from camera360.lib.rpc.protocol import RPCHandler
+from camera360.lib.rpc.codecs import Codec, JsonCodec, available_codecs, get_codec
+from camera360.lib.rpc.connection import Hello
+from camera360.lib.rpc.connection.batch import (
+    CallStatus,
+    decode_calls,
+    encode_results,
+)
+from camera360.lib.rpc.connection.compression import (
+    COMPRESSORS,
+    Compressor,
+    get_compressor,
+    is_compressible,
+)
+from camera360.lib.rpc.connection.framing import (
+    BinaryFraming,
+    Frame,
+    FrameFlags,
+    FrameKind,
+    Framing,
+    Priority,
+)
+from camera360.lib.rpc.connection.logical import LogicalChannel
+from camera360.lib.rpc.connection.session import Session, SessionStore
+from camera360.lib.rpc.connection.stream import CREDIT, RemoteStream
+from camera360.lib.rpc.deadline import deadline, remaining
+from camera360.lib.rpc.decorators import (
+    MethodCodec,
+    MethodType,
+    fingerprint,
+    method_names,
+)
+from camera360.lib.rpc.metrics import (
+    ChannelMetrics,
+    MethodMetrics,
+    MetricsRegistry,
+    RoundTrip,
+    default_registry,
+)
+from camera360.lib.rpc.protocol import RPCHandler, RPCProtocol
+from camera360.lib.rpc.tracing import TRACER
 
 
-class Message(BaseModel):
-    payload: bytes
+@dataclasses.dataclass
+class ChannelOptions:
+    # wire format, both peers must use the same one
+    framing: Framing = dataclasses.field(default_factory=BinaryFraming)
 
-    request_id: Optional[int] = None
-    response_id: Optional[int] = None
+    # codecs allowed for payloads in order of preference,
+    # the actual one is agreed with peer during handshake
+    codecs: list[str] = dataclasses.field(default_factory=available_codecs)
+
+    # compressors allowed for payloads in order of preference,
+    # only payloads of at least threshold bytes are compressed
+    compression: list[str] = dataclasses.field(
+        default_factory=lambda: list(COMPRESSORS)
+    )
+    compression_threshold: int = 16 * 1024
+
+    # outgoing frames are buffered up to high watermark (in bytes),
+    # after that senders wait until buffer drops below low watermark
+    high_watermark: int = 4 * 1024 * 1024
+    low_watermark: int = 1024 * 1024
+
+    # larger payloads are split, so frames of higher priority
+    # or other logical channels can be sent between the chunks
+    chunk_size: int = 64 * 1024
+
+    # number of stream items server may send ahead of consumer
+    stream_window: int = 16
+
+    # incoming requests processed at the same time, in total and per method
+    max_concurrency: int = 64
+    method_concurrency: dict[str, int] = dataclasses.field(default_factory=dict)
+    # requests above the limit wait for a free slot unless
+    # overflow is "reject" or there are already max_queued waiting
+    overflow: Literal["queue", "reject"] = "queue"
+    max_queued: int = 1024
+
+    # values returned by our own handlers are sent without validation
+    trusted: bool = False
+
+    # where per-method and per-channel metrics are collected
+    metrics: MetricsRegistry = dataclasses.field(default_factory=default_registry)
+
+    # peers which support it are pinged every interval (None disables it),
+    # connection is dropped when nothing is received from peer for timeout
+    heartbeat_interval: Optional[float] = 5
+    heartbeat_timeout: float = 15
+
+    # idempotent calls in flight wait that long for the connection
+    # to be resumed before they fail, see Channel.resume
+    resume_timeout: float = 10
+    # sessions of the server, shared by all its channels
+    sessions: SessionStore = dataclasses.field(default_factory=SessionStore)
+
+
+# writes are limited to that many bytes, unless single frame is bigger,
+# so frames queued for other logical channels don't wait for too long
+WRITE_BATCH_SIZE = 256 * 1024
+
+
+@dataclasses.dataclass(eq=False)
+class _Outbox:
+    """Outgoing frames of one logical channel and priority."""
+
+    priority: Priority
+    frames: collections.deque[list[bytes]] = dataclasses.field(
+        default_factory=collections.deque
+    )
+    size: int = 0
+    writable: asyncio.Event = dataclasses.field(default_factory=asyncio.Event)
+
+    def __post_init__(self):
+        self.writable.set()
+
+
+@dataclasses.dataclass
+class RequestCounters:
+    queued: int = 0
+    running: int = 0
+    rejected: int = 0
 
 
 class Channel:
@@ -23,20 +138,125 @@ class Channel:
         reader: asyncio.StreamReader,
         writer: asyncio.StreamWriter,
         handler: Optional[RPCHandler],
+        options: Optional[ChannelOptions] = None,
+        session: Optional[str] = None,
     ):
         self.reader = reader
         self.writer = writer
         self.handler = handler
+        # handlers of logical channels, see bind
+        self._handlers: dict[int, Optional[RPCHandler]] = {0: handler}
+
+        # protocols served by peer and ids of methods per logical channel,
+        # those are known only after handshake, see use_protocol
+        self._peer_schemas: dict[int, str] = {}
+        self._method_ids: dict[int, dict[str, int]] = {}
+        self._method_names: dict[int, list[str]] = {}
+
+        self.options = options or ChannelOptions()
+        self.framing = self.options.framing
+        self.registry = self.options.metrics
+        # peers without handshake support speak json only
+        self.codec: Codec = JsonCodec()
+        self.compressor: Optional[Compressor] = None
 
         # todo: rename to is_connected or somthing like that
         self._is_dead = False
 
         self._request_id = 0
         self._pending_requests: dict[int, asyncio.Future] = {}
+        self._streams: dict[int, RemoteStream] = {}
         self.on_disconnect_event = asyncio.Event()
 
+        # id of the session given by server, requests of idempotent
+        # methods are kept to be sent again after reconnecting
+        self.session = session
+        self._session: Optional[Session] = None
+        self._replayable: dict[int, Frame] = {}
+        # channel of the resumed session which took over those calls
+        self._successor: Optional["Channel"] = None
+
         self._loop: Optional[asyncio.Task] = None
 
+        # outgoing frames waiting for the writer task
+        # per priority and logical channel
+        self._outboxes: dict[tuple[Priority, int], _Outbox] = {}
+        # frames peer sends in chunks by kind, logical channel and id
+        self._peer_chunks = False
+        self._partial: dict[tuple[FrameKind, int, int], list[Frame]] = {}
+        self._outbox_ready = asyncio.Event()
+        self._writer_task: Optional[asyncio.Task] = None
+
+        # requests which started processing, until their tasks are done,
+        # and credits granted by clients of streaming methods
+        self._running: dict[int, asyncio.Task] = {}
+        self._credits: dict[int, asyncio.Semaphore] = {}
+
+        # traffic of the channel including framing overhead
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+        # liveness of the peer, see _heartbeat_loop
+        self._peer_heartbeat = False
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._last_received = time.monotonic()
+        self._pings: dict[int, float] = {}
+        self._ping_id = 0
+        self._lost_reason = "Channel connection lost"
+        self.rtt = RoundTrip()
+
+        # limits of concurrently processed requests
+        self.counters = RequestCounters()
+        # admitted requests by id, either queued or running
+        self._tasks: dict[int, asyncio.Task] = {}
+        self._concurrency = asyncio.Semaphore(self.options.max_concurrency)
+        self._method_concurrency = {
+            name: asyncio.Semaphore(limit)
+            for name, limit in self.options.method_concurrency.items()
+        }
+        # compiled codecs and handler methods, see _dispatcher
+        self._dispatchers: dict[
+            tuple[int, str], tuple[MethodType, MethodCodec, Callable]
+        ] = {}
+
+        # admitted requests per method, either queued or running
+        self._method_load: collections.Counter[str] = collections.Counter()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of frames waiting to be written into socket."""
+        return sum(len(outbox.frames) for outbox in self._outboxes.values())
+
+    @property
+    def queue_size(self) -> int:
+        """Number of bytes buffered but not yet flushed to the socket."""
+        return sum(outbox.size for outbox in self._outboxes.values())
+
+    @property
+    def is_connected(self) -> bool:
+        return not self._is_dead
+
+    @property
+    def peer(self) -> str:
+        peer = self.writer.get_extra_info("peername")
+        if isinstance(peer, tuple):
+            return "%s:%s" % peer[:2]
+        # unix sockets have no name on the accepting side
+        return peer or self.writer.get_extra_info("sockname") or ""
+
+    def metrics(self) -> ChannelMetrics:
+        return ChannelMetrics(
+            peer=self.peer,
+            pending=len(self._pending_requests) + len(self._streams),
+            queued=self.counters.queued,
+            running=self.counters.running,
+            rejected=self.counters.rejected,
+            bytes_sent=self.bytes_sent,
+            bytes_received=self.bytes_received,
+            rtt=self.rtt.mean,
+            rtt_max=self.rtt.max,
+        )
+
     def _on_receive_loop_done(self, future: asyncio.Task):
         self.on_disconnect_event.set()
 
@@ -45,19 +265,29 @@ class Channel:
 
     async def start(self, on_lost_connection_cb=None):
         if self._loop is None:
+            try:
+                await self.handshake()
+            except ConnectionError:
+                self.writer.close()
+                raise
+
+            self.registry.channel_opened(self, peer=self.peer)
             self._loop = asyncio.create_task(self._receive_messages_loop())
             self._loop.add_done_callback(self._on_receive_loop_done)
         return self
 
     async def close(self):
         logging.info("Shutting down channel")
+        # closed on purpose, nothing is going to be resumed
+        self._replayable.clear()
         self._loop.cancel()
 
         self.writer.close()
         self._is_dead = True
 
         for request in self._pending_requests.values():
-            request.set_exception(ConnectionResetError("Connection reset by peer"))
+            if not request.done():
+                request.set_exception(ConnectionResetError("Connection reset by peer"))
 
         try:
             await self._loop
@@ -69,14 +299,356 @@ class Channel:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         return await self.close()
 
+    async def handshake(self) -> None:
+        """
+        Client side of the handshake, offers supported options
+        and waits for the server to choose.
+        """
+        if not self.framing.handshake:
+            return
+
+        offer = Hello(
+            codecs=self.options.codecs,
+            compression=self.options.compression,
+            schemas=self._schemas(),
+            heartbeat=True,
+            chunks=True,
+            session=self.session or "",
+        )
+        await self._send_hello(offer)
+
+        frame = await self.framing.read_frame(self.reader)
+        if frame is None or frame.kind != FrameKind.hello:
+            raise ConnectionError("Handshake failed, unexpected reply %s" % frame)
+
+        reply = Hello.model_validate_json(frame.payload)
+        if not reply.codecs:
+            raise ConnectionError("No common codec with server: %s" % offer.codecs)
+
+        self.codec = get_codec(reply.codecs[0])
+        if reply.compression:
+            self.compressor = get_compressor(reply.compression[0])
+        self._peer_schemas = reply.schemas
+        self._peer_heartbeat = reply.heartbeat
+        self._peer_chunks = reply.chunks
+        self.session = reply.session
+        logging.info(
+            "Handshake done, codec=%s, compression=%s, session=%s",
+            self.codec.name,
+            reply.compression,
+            self.session,
+        )
+
+    async def accept(self) -> None:
+        """
+        Server side of the handshake, must be done before
+        any requests are sent to the client.
+        """
+        self.registry.channel_opened(self)
+        if not self.framing.handshake:
+            return
+
+        frame = await self.framing.read_frame(self.reader)
+        if frame is None or frame.kind != FrameKind.hello:
+            raise ConnectionError("Handshake failed, unexpected frame %s" % frame)
+
+        offer = Hello.model_validate_json(frame.payload)
+        codec = next(
+            (name for name in offer.codecs if name in self.options.codecs), None
+        )
+        compressor = next(
+            (name for name in offer.compression if name in self.options.compression),
+            None,
+        )
+        # legacy clients don't know about sessions
+        if offer.session is not None:
+            self._session, resumed = self.options.sessions.open(offer.session)
+            self.session = self._session.id
+            logging.info("Session %s, resumed=%s", self.session, resumed)
+
+        await self._send_hello(
+            Hello(
+                codecs=[codec] if codec else [],
+                compression=[compressor] if compressor else [],
+                schemas=self._schemas(),
+                heartbeat=True,
+                chunks=True,
+                session=self.session,
+            )
+        )
+
+        if codec is None:
+            raise ConnectionError("No common codec with client: %s" % offer.codecs)
+
+        self.codec = get_codec(codec)
+        if compressor:
+            self.compressor = get_compressor(compressor)
+        self._peer_schemas = offer.schemas
+        self._peer_heartbeat = offer.heartbeat
+        self._peer_chunks = offer.chunks
+        logging.info(
+            "Handshake done, codec=%s, compression=%s", self.codec.name, compressor
+        )
+
+    def _schemas(self) -> dict[int, str]:
+        return {
+            channel_id: fingerprint(handler.methods)
+            for channel_id, handler in self._handlers.items()
+            if handler is not None
+        }
+
+    def use_protocol(self, protocol: type[RPCProtocol], channel_id: int = 0) -> None:
+        """
+        Checks that peer serves the same version of the protocol on the
+        logical channel, calls are sent with compact method ids after that.
+        """
+        # legacy peers and clients without handlers don't tell anything
+        if not self._peer_schemas:
+            return
+
+        expected = fingerprint(protocol.methods)
+        actual = self._peer_schemas.get(channel_id)
+        if actual is None:
+            raise ConnectionError("No handler for channel %s" % channel_id)
+        if actual != expected:
+            raise ConnectionError(
+                "Peer serves different version of %s on channel %s, "
+                "schema %s instead of %s"
+                % (protocol.__name__, channel_id, actual, expected)
+            )
+
+        self._method_ids[channel_id] = {
+            name: method_id
+            for method_id, name in enumerate(method_names(protocol.methods))
+        }
+
+    def _method_name(self, channel_id: int, method_id: int) -> str:
+        if (names := self._method_names.get(channel_id)) is None:
+            handler = self._handlers.get(channel_id)
+            names = method_names(handler.methods) if handler is not None else []
+            self._method_names[channel_id] = names
+
+        if method_id >= len(names):
+            return "#%s" % method_id
+        return names[method_id]
+
+    async def _send_hello(self, hello: Hello) -> None:
+        frame = Frame(
+            kind=FrameKind.hello, id=0, payload=hello.model_dump_json().encode()
+        )
+        self.writer.writelines(self.framing.encode_frame(frame))
+        await self.writer.drain()
+
     async def serve_forever(self):
         await self._receive_messages_loop()
 
+    async def _write_messages_loop(self):
+        try:
+            while True:
+                await self._outbox_ready.wait()
+                self._outbox_ready.clear()
+
+                # everything queued since last write goes in one go
+                while written := self._take_frames():
+                    buffers, sizes = written
+                    started = TRACER.now()
+                    self.writer.writelines(buffers)
+                    await self.writer.drain()
+                    TRACER.span("rpc.write", started, size=sum(sizes.values()))
+
+                    for outbox, size in sizes.items():
+                        outbox.size -= size
+                        self.bytes_sent += size
+                        if outbox.size <= self.options.low_watermark:
+                            outbox.writable.set()
+        except ConnectionError:
+            logging.warning("Unable to write into channel %s", self)
+        finally:
+            self._is_dead = True
+            # wake up senders, they will find out channel is dead
+            for outbox in self._outboxes.values():
+                outbox.writable.set()
+
+    def _take_frames(self) -> Optional[tuple[list[bytes], dict[_Outbox, int]]]:
+        """
+        Takes queued frames of the highest priority first, logical channels
+        of the same priority take turns, so bulk transfer on one of them
+        doesn't hold back the others.
+        """
+        buffers: list[bytes] = []
+        sizes: dict[_Outbox, int] = collections.defaultdict(int)
+
+        outboxes = [outbox for outbox in self._outboxes.values() if outbox.frames]
+        while outboxes and sum(sizes.values()) < WRITE_BATCH_SIZE:
+            priority = min(outbox.priority for outbox in outboxes)
+            for outbox in outboxes:
+                if outbox.priority != priority:
+                    continue
+
+                frame = outbox.frames.popleft()
+                buffers.extend(frame)
+                sizes[outbox] += sum(len(buffer) for buffer in frame)
+            outboxes = [outbox for outbox in outboxes if outbox.frames]
+
+        return (buffers, sizes) if buffers else None
+
+    def _outbox(self, priority: Priority, channel_id: int) -> _Outbox:
+        if (outbox := self._outboxes.get((priority, channel_id))) is None:
+            outbox = _Outbox(priority)
+            self._outboxes[priority, channel_id] = outbox
+        return outbox
+
+    async def _send_frame(self, frame: Frame) -> None:
+        if (
+            self.compressor is not None
+            and len(frame.payload) >= self.options.compression_threshold
+        ):
+            frame = await self._compress(frame)
+
+        # every logical channel has its own watermarks,
+        # busy one doesn't stop senders of the others
+        await self._outbox(frame.priority, frame.channel_id).writable.wait()
+        self._queue_frame(frame)
+
+    def _queue_frame(self, frame: Frame) -> None:
+        """
+        Puts frame into outgoing queue ignoring watermarks,
+        meant for small frames which must not wait.
+        """
+        if self._is_dead:
+            raise ConnectionResetError("Dead channel")
+
+        TRACER.event("rpc.send", frame.id, len(frame.payload))
+        outbox = self._outbox(frame.priority, frame.channel_id)
+        for chunk in self._chunks(frame):
+            buffers = self.framing.encode_frame(chunk)
+            outbox.frames.append(buffers)
+            outbox.size += sum(len(buffer) for buffer in buffers)
+
+        if outbox.size >= self.options.high_watermark:
+            outbox.writable.clear()
+        self._outbox_ready.set()
+
+    def _chunks(self, frame: Frame) -> list[Frame]:
+        size = self.options.chunk_size
+        if not self._peer_chunks or len(frame.payload) <= size:
+            return [frame]
+
+        # slices of memoryview don't copy the payload
+        payload = memoryview(frame.payload)
+        chunks = [
+            Frame(
+                kind=frame.kind,
+                id=frame.id,
+                payload=payload[offset : offset + size],
+                flags=FrameFlags.more,
+                channel_id=frame.channel_id,
+            )
+            for offset in range(size, len(payload), size)
+        ]
+        chunks[-1].flags = 0
+
+        first = dataclasses.replace(
+            frame, payload=payload[:size], flags=frame.flags | FrameFlags.more
+        )
+        return [first, *chunks]
+
+    def _reassemble(self, frame: Frame) -> Optional[Frame]:
+        """Returns whole frame once its last chunk is received."""
+        key = (frame.kind, frame.channel_id, frame.id)
+
+        chunks = self._partial.get(key)
+        if chunks is None and not frame.flags & FrameFlags.more:
+            return frame
+        if chunks is None:
+            self._partial[key] = [frame]
+            return None
+
+        chunks.append(frame)
+        if frame.flags & FrameFlags.more:
+            return None
+
+        del self._partial[key]
+        return dataclasses.replace(
+            chunks[0],
+            payload=b"".join(chunk.payload for chunk in chunks),
+            flags=chunks[0].flags & ~FrameFlags.more,
+            size=sum(chunk.size for chunk in chunks),
+        )
+
+    async def _compress(self, frame: Frame) -> Frame:
+        # media blobs are compressed already, no point to spend CPU on them
+        if not is_compressible(frame.payload):
+            return frame
+
+        # zlib releases GIL, so large payloads don't block the loop
+        payload = await asyncio.to_thread(self.compressor.compress, frame.payload)
+        if len(payload) >= len(frame.payload):
+            return frame
+
+        return dataclasses.replace(
+            frame, payload=payload, flags=frame.flags | FrameFlags.compressed
+        )
+
+    async def _decompress(self, frame: Frame) -> Frame:
+        if self.compressor is None:
+            raise ConnectionError("Compressed frame %s not expected" % frame.id)
+
+        payload = await asyncio.to_thread(self.compressor.decompress, frame.payload)
+        return dataclasses.replace(
+            frame, payload=payload, flags=frame.flags & ~FrameFlags.compressed
+        )
+
     async def _receive_messages_loop(self):
-        tasks = []
+        self._writer_task = asyncio.create_task(self._write_messages_loop())
+        if self._peer_heartbeat and self.options.heartbeat_interval is not None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        try:
+            await self._read_messages()
+        finally:
+            self._writer_task.cancel()
+            if self._heartbeat_task is not None:
+                self._heartbeat_task.cancel()
 
-        def on_task_done(future: asyncio.Task):
+    async def _heartbeat_loop(self):
+        """
+        Pings peer to measure round trip time, peer which powered off
+        is noticed after heartbeat_timeout rather than when tcp gives up.
+        """
+        self._last_received = time.monotonic()
+        while True:
+            await asyncio.sleep(self.options.heartbeat_interval)
+
+            silence = time.monotonic() - self._last_received
+            if silence > self.options.heartbeat_timeout:
+                logging.warning("%s is not responding for %.1fs", self.peer, silence)
+                self._lost_reason = "Peer is not responding for %.1fs" % silence
+                # reader gets eof and fails everything waiting for the peer
+                self.writer.transport.abort()
+                return
+
+            # pings which are not answered in time never will be
+            now = time.monotonic()
+            self._pings = {
+                ping_id: sent
+                for ping_id, sent in self._pings.items()
+                if now - sent < self.options.heartbeat_timeout
+            }
+            self._pings[self._ping_id] = now
+            self._queue_frame(
+                Frame(kind=FrameKind.ping, id=self._ping_id, priority=Priority.control)
+            )
+            self._ping_id += 1
+
+    async def _read_messages(self):
+        def on_task_done(frame: Frame, future: asyncio.Task):
             logging.debug("Processing of task is done")
+            self._tasks.pop(frame.id, None)
+            self._credits.pop(frame.id, None)
+            # request cancelled before it started never left the queue
+            if self._running.pop(frame.id, None) is None:
+                self.counters.queued -= 1
+                self._method_load[frame.method] -= 1
 
             if future.cancelled():
                 return
@@ -84,132 +656,577 @@ class Channel:
             if e := future.exception():
                 traceback.print_exception(e)
 
+        logging.info("Starting loop for channel %s", self)
         while True:
-            logging.info("Starting loop for channel %s", self)
             try:
-                logging.debug("Waiting for new incoming messages")
-                raw_message = await self.reader.readline()
-                logging.info("Incoming message received")
+                frame = await self.framing.read_frame(self.reader)
             except ConnectionResetError:
                 logging.warning("Client disconnected")
                 break
+            except (ConnectionError, ValueError):
+                # stream can't be trusted after malformed frame
+                logging.exception("Unable to read frame of channel %s", self)
+                break
 
-            # windows machines return empty strings when peer is offline
-            # we don't really care about the reason why somebody
-            # disconnected here, so just break the loop
-            if raw_message == b"":
+            if frame is None:
                 break
 
-            logging.info("Message received in channel %s", self)
-            logging.debug("Adding pending task")
-            task = asyncio.create_task(self.data_received(raw_message))
-            task.add_done_callback(on_task_done)
-            tasks.append(task)
+            received = TRACER.now()
+            self._last_received = time.monotonic()
+            self.bytes_received += frame.size
+            if (frame := self._reassemble(frame)) is None:
+                continue
+
+            if frame.method_id is not None:
+                frame.method = self._method_name(frame.channel_id, frame.method_id)
+            if frame.flags & FrameFlags.compressed:
+                try:
+                    frame = await self._decompress(frame)
+                except Exception:
+                    logging.exception("Unable to decompress frame %s", frame.id)
+                    break
+
+            TRACER.span("rpc.receive", received, frame.id, frame.size)
+
+            # responses are cheap to process, only requests
+            # need separate tasks to run the handler
+            if frame.kind != FrameKind.request:
+                self._frame_received(frame)
+                continue
+
+            # request replayed by resumed client, it's done already
+            if self._session is not None and (
+                response := self._session.response(frame.channel_id, frame.id)
+            ):
+                self._queue_frame(response)
+                continue
+
+            if not self._admit_request(frame):
+                continue
+
+            task = asyncio.create_task(self._request_received(frame))
+            task.add_done_callback(functools.partial(on_task_done, frame))
+            self._tasks[frame.id] = task
 
         # termination of processing incoming requests
-        for task in tasks:
+        for task in list(self._tasks.values()):
             task.cancel()
 
         self._is_dead = True
-        for future in self._pending_requests.values():
-            future.set_exception(ConnectionResetError("Channel connection lost"))
+        self.on_disconnect_event.set()
+        if self._session is not None:
+            self.options.sessions.close(self._session)
+
+        # idempotent calls wait for the connection to be resumed
+        self._fail_requests(replayable=self.session is None)
+        if self._replayable:
+            asyncio.get_running_loop().call_later(
+                self.options.resume_timeout, self._fail_requests, True
+            )
+
+    def _fail_requests(self, replayable: bool) -> None:
+        for request_id, future in self._pending_requests.items():
+            if (replayable or request_id not in self._replayable) and not future.done():
+                future.set_exception(ConnectionResetError(self._lost_reason))
+        for request_id, stream in list(self._streams.items()):
+            if replayable or request_id not in self._replayable:
+                stream.feed(ConnectionResetError(self._lost_reason))
+
+    def resume(self, previous: "Channel") -> None:
+        """
+        Takes over idempotent calls and streams of the lost channel,
+        they are sent again and their callers get responses as usual.
+        Server which still has the session answers calls it has finished
+        from its buffer, streams are restarted from scratch.
+        """
+        # ids stay unique within the session
+        self._request_id = previous._request_id
+        previous._successor = self
+
+        for request_id, request in previous._replayable.items():
+            request = dataclasses.replace(
+                request,
+                method_id=self._method_ids.get(request.channel_id, {}).get(
+                    request.method
+                ),
+            )
+            stream = previous._streams.get(request_id)
+            if (future := previous._pending_requests.get(request_id)) is not None:
+                if future.done():
+                    continue
+                self._pending_requests[request_id] = future
+            elif stream is not None:
+                self._streams[request_id] = stream
+            else:
+                continue
 
-    async def send_request(self, payload: bytes) -> bytes:
+            logging.info("Replaying request id %s %s", request_id, request.method)
+            self._replayable[request_id] = request
+            self._queue_frame(request)
+            if stream is not None:
+                self._queue_frame(
+                    Frame(
+                        kind=FrameKind.credit,
+                        id=request_id,
+                        payload=CREDIT.pack(stream.resume(self)),
+                        channel_id=request.channel_id,
+                        priority=request.priority,
+                    )
+                )
+
+        previous._pending_requests.clear()
+        previous._streams.clear()
+        previous._replayable.clear()
+
+    async def send_request(
+        self,
+        method: str,
+        payload: bytes,
+        timeout: Optional[float] = None,
+        flags: int = 0,
+        channel_id: int = 0,
+        priority: Priority = Priority.normal,
+        idempotent: bool = False,
+    ) -> Frame:
         if self._is_dead:
             raise ConnectionResetError("Dead channel")
 
-        request = Message(request_id=self._request_id, payload=payload)
-        self._pending_requests[request.request_id] = future = asyncio.Future()
+        request = Frame(
+            kind=FrameKind.request,
+            id=self._request_id,
+            method=method,
+            payload=payload,
+            timeout=timeout,
+            flags=flags,
+            channel_id=channel_id,
+            method_id=self._method_ids.get(channel_id, {}).get(method),
+            priority=priority,
+        )
+        self._pending_requests[request.id] = future = asyncio.Future()
         self._request_id += 1
+        if idempotent and self.session:
+            self._replayable[request.id] = request
+
+        started = TRACER.now()
+        try:
+            await self._send_frame(request)
+            return await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # nobody waits for the response anymore,
+            # so server should not waste time on it
+            self._current._cancel_request(request.id, channel_id, priority)
+            raise
+        finally:
+            current = self._current
+            current._pending_requests.pop(request.id, None)
+            current._replayable.pop(request.id, None)
+            TRACER.span("rpc.call", started, request.id, len(payload))
 
-        self.writer.write(request.model_dump_json().encode() + b"\n")
+    @property
+    def _current(self) -> "Channel":
+        """Channel which has requests of this one now, see resume."""
+        channel = self
+        while channel._successor is not None:
+            channel = channel._successor
+        return channel
 
-        return await future
+    def _cancel_request(
+        self,
+        request_id: int,
+        channel_id: int = 0,
+        priority: Priority = Priority.control,
+    ) -> None:
+        # legacy peers don't know about control frames
+        if self._is_dead or not self.framing.handshake:
+            return
 
-    async def send_response(self, request_id: int, payload: bytes) -> None:
-        logging.info("Sending response for request id %s", request_id)
-        self.writer.write(
-            Message(response_id=request_id, payload=payload).model_dump_json().encode()
-            + b"\n"
+        # same lane as the request, so cancel can't overtake it
+        logging.info("Cancelling request id %s", request_id)
+        self._queue_frame(
+            Frame(
+                kind=FrameKind.cancel,
+                id=request_id,
+                channel_id=channel_id,
+                priority=priority,
+            )
         )
-        await self.writer.drain()
 
-    async def _is_response_unbound(self, message: Message):
-        return (
-            await self._is_response(message)
-            and message.response_id not in self._pending_requests
+    async def open_stream(
+        self,
+        method: str,
+        payload: bytes,
+        channel_id: int = 0,
+        priority: Priority = Priority.normal,
+        idempotent: bool = False,
+    ) -> RemoteStream:
+        if not self.framing.handshake:
+            raise ConnectionError(
+                "Streams are not supported by %s framing" % self.framing.name
+            )
+        if self._is_dead:
+            raise ConnectionResetError("Dead channel")
+
+        request = Frame(
+            kind=FrameKind.request,
+            id=self._request_id,
+            method=method,
+            payload=payload,
+            channel_id=channel_id,
+            method_id=self._method_ids.get(channel_id, {}).get(method),
+            priority=priority,
         )
+        self._streams[request.id] = stream = RemoteStream(
+            self,
+            request.id,
+            window=self.options.stream_window,
+            channel_id=channel_id,
+            priority=priority,
+        )
+        self._request_id += 1
+        if idempotent and self.session:
+            self._replayable[request.id] = request
+
+        try:
+            await self._send_frame(request)
+            await stream.open()
+        except ConnectionError:
+            self._streams.pop(request.id, None)
+            raise
 
-    async def _is_response(self, message: Message) -> bool:
-        return bool(message.response_id is not None)
+        return stream
 
-    async def data_received(self, raw_message: bytes) -> None:
-        message = Message.model_validate_json(raw_message)
+    def remove_stream(self, request_id: int) -> None:
+        self._streams.pop(request_id, None)
+        self._replayable.pop(request_id, None)
 
-        if await self._is_response_unbound(message):
-            logging.warning("Response id {} not expected".format(message.request_id))
-            return
+    def bind(
+        self, channel_id: int, handler: Optional[RPCHandler] = None
+    ) -> LogicalChannel:
+        """
+        Logical channel multiplexed over this connection, requests
+        peer sends to it are processed by the given handler.
+        """
+        if not self.framing.handshake:
+            raise ConnectionError(
+                "Logical channels are not supported by %s framing" % self.framing.name
+            )
+
+        self._handlers[channel_id] = handler
+        self._method_names.pop(channel_id, None)
+        return LogicalChannel(self, channel_id)
 
-        if await self._is_response(message):
-            await self._response_received(message)
+    async def send_control(
+        self,
+        kind: FrameKind,
+        request_id: int,
+        payload: bytes = b"",
+        channel_id: int = 0,
+        priority: Priority = Priority.control,
+    ) -> None:
+        await self._send_frame(
+            Frame(
+                kind=kind,
+                id=request_id,
+                payload=payload,
+                channel_id=channel_id,
+                priority=priority,
+            )
+        )
+
+    async def send_response(
+        self,
+        request_id: int,
+        payload: bytes,
+        kind: FrameKind = FrameKind.response,
+        flags: int = 0,
+        channel_id: int = 0,
+        priority: Priority = Priority.normal,
+    ) -> None:
+        logging.debug("Sending response for request id %s", request_id)
+        response = Frame(
+            kind=kind,
+            id=request_id,
+            payload=payload,
+            flags=flags,
+            channel_id=channel_id,
+            priority=priority,
+        )
+        if self._session is not None:
+            self._session.store(response)
+        await self._send_frame(response)
+
+    def _frame_received(self, frame: Frame) -> None:
+        if frame.kind == FrameKind.credit:
+            # stream may be over already, its credits are not needed
+            if frame.id not in self._tasks:
+                return
+            (count,) = CREDIT.unpack(frame.payload)
+            semaphore = self._credits.setdefault(frame.id, asyncio.Semaphore(0))
+            for _ in range(count):
+                semaphore.release()
+        elif frame.kind == FrameKind.cancel:
+            if task := self._tasks.get(frame.id):
+                logging.info("Request id %s cancelled by peer", frame.id)
+                task.cancel()
+        elif frame.kind == FrameKind.ping:
+            self._queue_frame(
+                Frame(kind=FrameKind.pong, id=frame.id, priority=Priority.control)
+            )
+        elif frame.kind == FrameKind.pong:
+            if (sent := self._pings.pop(frame.id, None)) is not None:
+                self.rtt.observe(time.monotonic() - sent)
+        elif frame.id in self._streams:
+            self._streams[frame.id].feed(frame)
+        elif frame.id in self._pending_requests:
+            self._response_received(frame)
         else:
-            await self._request_received(message)
+            logging.warning("Response id {} not expected".format(frame.id))
 
-    async def _report_exception(self, request_id: int, exception: Exception) -> None:
+    async def _report_exception(
+        self, request_id: int, exception: Exception, channel_id: int = 0
+    ) -> None:
         logging.warning("Exception occurred", exc_info=True)
         # traceback.print_exception(exception)
 
         await self.send_response(
             request_id,
-            MethodReturn(value=b"", type="exception").model_dump_json().encode(),
+            str(exception).encode(),
+            kind=FrameKind.exception,
+            channel_id=channel_id,
         )
 
-    async def _request_received(self, message: Message):
-        logging.info("Got request with id {}".format(message.request_id))
-
-        mathod_call_params = MethodCall.model_validate_json(message.payload)
-        # getting metadata of the methods to be able to unpack payload
-        if self.handler is None:
-            return
+    def _admit_request(self, frame: Frame) -> bool:
+        """
+        Decides whether request may wait for a free slot, rejected
+        ones are answered right away without creating any task.
+        """
+        method_limit = self.options.method_concurrency.get(frame.method)
+        busy = (
+            self.counters.queued + self.counters.running >= self.options.max_concurrency
+            or (
+                method_limit is not None
+                and self._method_load[frame.method] >= method_limit
+            )
+        )
+        if not busy or (
+            self.options.overflow == "queue"
+            and self.counters.queued < self.options.max_queued
+        ):
+            self.counters.queued += 1
+            self._method_load[frame.method] += 1
+            return True
 
-        method_meta = self.handler.methods[mathod_call_params.method]
-        arguments = method_meta.args_model.model_validate_json(
-            mathod_call_params.arguments
+        logging.warning("Request id %s rejected, too many requests", frame.id)
+        self.counters.rejected += 1
+        self._queue_frame(
+            Frame(
+                kind=FrameKind.exception,
+                id=frame.id,
+                payload=b"Too many requests",
+                channel_id=frame.channel_id,
+                priority=Priority.control,
+            )
         )
+        return False
 
-        # actually executing what we have in handler
+    async def _request_received(self, frame: Frame):
+        started = TRACER.now()
+        self._running[frame.id] = asyncio.current_task()
         try:
-            callable = getattr(self.handler, mathod_call_params.method)
-            response = await callable(**arguments.model_dump())
-        except Exception as e:
-            await self._report_exception(message.request_id, e)
+            # deadline of the request is visible to the handler,
+            # so calls it makes to other peers share the same deadline,
+            # handler itself is cancelled by the client when it gives up
+            with deadline(frame.timeout):
+                await self._run_request(frame)
+        finally:
+            self._method_load[frame.method] -= 1
+            TRACER.span("rpc.dispatch", started, frame.id, len(frame.payload))
+
+    async def _run_request(self, frame: Frame):
+        queued_at = time.perf_counter()
+        async with contextlib.AsyncExitStack() as slots:
+            try:
+                # method slot goes first, so we don't hold global
+                # slot while waiting for the method one
+                if semaphore := self._method_concurrency.get(frame.method):
+                    await slots.enter_async_context(semaphore)
+                await slots.enter_async_context(self._concurrency)
+            finally:
+                self.counters.queued -= 1
+
+            self.registry.method(frame.method or "batch").queue_wait.observe(
+                time.perf_counter() - queued_at
+            )
+            if remaining() == 0:
+                logging.warning("Request id %s expired while queued", frame.id)
+                return
+
+            self.counters.running += 1
+            try:
+                if frame.channel_id not in self._handlers:
+                    await self._report_exception(
+                        frame.id,
+                        LookupError("No handler for channel %s" % frame.channel_id),
+                        channel_id=frame.channel_id,
+                    )
+                # getting metadata of the methods to be able to unpack payload
+                elif self._handlers[frame.channel_id] is not None:
+                    await self._process_request(frame)
+            finally:
+                self.counters.running -= 1
+
+    def _dispatcher(
+        self, channel_id: int, method: str
+    ) -> tuple[MethodType, MethodCodec, Callable]:
+        if dispatcher := self._dispatchers.get((channel_id, method)):
+            return dispatcher
+
+        handler = self._handlers[channel_id]
+        if (method_meta := handler.methods.get(method)) is None:
+            raise LookupError("No method %s on channel %s" % (method, channel_id))
+        self._dispatchers[channel_id, method] = dispatcher = (
+            method_meta,
+            method_meta.compile(self.codec, trusted=self.options.trusted),
+            getattr(handler, method),
+        )
+        return dispatcher
+
+    async def _process_request(self, frame: Frame):
+        respond = functools.partial(
+            self.send_response, frame.id, channel_id=frame.channel_id
+        )
+
+        if frame.flags & FrameFlags.batch:
+            await respond(await self._process_batch(frame))
             return
 
         try:
-            response_raw = (
-                method_meta.return_model(value=response).model_dump_json().encode()
+            method_meta, method_codec, callable = self._dispatcher(
+                frame.channel_id, frame.method
             )
-        except pydantic.ValidationError as e:
-            await self._report_exception(message.request_id, e)
+            if method_meta.is_stream:
+                items = callable(**method_codec.decode_args(frame.payload))
+        except Exception as e:
+            self.registry.method(frame.method).errors += 1
+            await self._report_exception(frame.id, e, frame.channel_id)
             return
 
-        logging.info(
-            "Request id={} response={}".format(message.request_id, response_raw[:50])
+        respond = functools.partial(respond, priority=method_meta.priority)
+        if method_meta.is_stream:
+            metrics = self.registry.method(frame.method)
+            metrics.bytes_in += len(frame.payload)
+            await self._send_stream(frame, method_meta, method_codec, items, metrics)
+            return
+
+        status, payload = await self._call(
+            frame.method, frame.payload, frame.channel_id
         )
 
-        await self.send_response(
-            message.request_id,
-            MethodReturn(value=response_raw, type="return").model_dump_json().encode(),
+        if status == CallStatus.exception:
+            await respond(payload, kind=FrameKind.exception)
+        elif status == CallStatus.blob:
+            await respond(payload, flags=FrameFlags.blob)
+        else:
+            await respond(payload)
+
+    async def _process_batch(self, frame: Frame) -> bytes:
+        calls = decode_calls(frame.payload)
+        calls = [
+            self._call(method, payload, frame.channel_id) for method, payload in calls
+        ]
+
+        if frame.flags & FrameFlags.concurrent:
+            results = await asyncio.gather(*calls)
+        else:
+            results = [await call for call in calls]
+
+        return encode_results(results)
+
+    async def _call(
+        self, method: str, payload: bytes, channel_id: int = 0
+    ) -> tuple[CallStatus, bytes]:
+        """
+        Runs single method of the handler, errors are
+        reported to the caller rather than raised.
+        """
+        metrics = self.registry.method(method)
+        metrics.calls += 1
+        metrics.bytes_in += len(payload)
+
+        started = time.perf_counter()
+        status, result = await self._execute(method, payload, channel_id)
+        metrics.handler_time.observe(time.perf_counter() - started)
+
+        metrics.bytes_out += len(result)
+        if status == CallStatus.exception:
+            metrics.errors += 1
+        return status, result
+
+    async def _execute(
+        self, method: str, payload: bytes, channel_id: int
+    ) -> tuple[CallStatus, bytes]:
+        try:
+            method_meta, method_codec, callable = self._dispatcher(channel_id, method)
+            if method_meta.is_stream:
+                raise TypeError("Streaming method %s can't be batched" % method)
+
+            # actually executing what we have in handler
+            response = await callable(**method_codec.decode_args(payload))
+
+            if method_meta.is_blob and self.framing.raw_payloads:
+                if not isinstance(response, (bytes, bytearray, memoryview)):
+                    raise TypeError("Blob must be bytes, got %s" % type(response))
+                return CallStatus.blob, response
+
+            return CallStatus.ok, method_codec.encode_return(response)
+        except Exception as e:
+            logging.warning("Exception occurred", exc_info=True)
+            return CallStatus.exception, str(e).encode()
+
+    async def _send_stream(
+        self,
+        request: Frame,
+        method_meta: MethodType,
+        method_codec: MethodCodec,
+        items: AsyncIterator,
+        metrics: MethodMetrics,
+    ) -> None:
+        credits = self._credits.setdefault(request.id, asyncio.Semaphore(0))
+        send = functools.partial(
+            self.send_control,
+            request_id=request.id,
+            channel_id=request.channel_id,
+            priority=method_meta.priority,
         )
 
-    async def _response_received(self, message: Message):
-        rpc_response = MethodReturn.model_validate_json(message.payload)
+        metrics.calls += 1
+        started = time.perf_counter()
+        try:
+            async with contextlib.aclosing(items):
+                async for item in items:
+                    payload = method_codec.encode_return(item)
+                    metrics.bytes_out += len(payload)
 
-        if rpc_response.type == "exception":
-            self._pending_requests.pop(message.response_id).set_exception(
-                ConnectionError()
-            )
+                    # waiting for the client to consume previous items
+                    await credits.acquire()
+                    await send(FrameKind.stream_item, payload=payload)
+        except Exception as e:
+            metrics.errors += 1
+            await self._report_exception(request.id, e, request.channel_id)
+            return
+        finally:
+            metrics.handler_time.observe(time.perf_counter() - started)
+
+        await send(FrameKind.stream_end)
+
+    def _response_received(self, frame: Frame):
+        future = self._pending_requests.pop(frame.id)
+        self._replayable.pop(frame.id, None)
+        # caller of the replayed request may have given up already
+        if future.done():
+            return
+
+        if frame.kind == FrameKind.exception:
+            future.set_exception(ConnectionError(frame.payload.decode()))
         else:
-            self._pending_requests.pop(message.response_id).set_result(
-                rpc_response.value
-            )
+            future.set_result(frame)
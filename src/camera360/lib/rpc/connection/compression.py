@@ -0,0 +1,72 @@
+import typing
+import zlib
+
+# size of the payload sample used to check if compression is worth it
+_SAMPLE_SIZE = 4096
+# formats which are compressed already
+_COMPRESSED_SIGNATURES = (
+    b"\xff\xd8\xff",  # jpeg
+    b"\x89PNG",
+    b"\x1f\x8b",  # gzip
+    b"PK\x03\x04",  # zip
+    b"\x28\xb5\x2f\xfd",  # zstd
+    b"\x04\x22\x4d\x18",  # lz4
+)
+_MPEGTS_PACKET_SIZE = 188
+_MPEGTS_SYNC_BYTE = 0x47
+
+
+class Compressor(typing.Protocol):
+    name: str
+
+    def compress(self, data: bytes) -> bytes: ...
+
+    def decompress(self, data: bytes) -> bytes: ...
+
+
+class ZlibCompressor(Compressor):
+    name = "zlib"
+
+    def __init__(self, level: int = 1):
+        self._level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self._level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+COMPRESSORS: dict[str, Compressor] = {ZlibCompressor.name: ZlibCompressor()}
+
+
+def register_compressor(compressor: Compressor) -> None:
+    """
+    Makes compressor available for negotiation, meant
+    for faster algorithms from optional packages.
+    """
+    COMPRESSORS[compressor.name] = compressor
+
+
+def get_compressor(name: str) -> Compressor:
+    return COMPRESSORS[name]
+
+
+def is_compressible(data: bytes) -> bool:
+    """
+    Cheap guess whether payload would shrink, known media
+    formats are skipped and unknown data is checked on a sample.
+    """
+    header = bytes(data[:8])
+    if header.startswith(_COMPRESSED_SIGNATURES) or header[4:8] == b"ftyp":
+        return False
+
+    if (
+        len(data) > _MPEGTS_PACKET_SIZE
+        and data[0] == _MPEGTS_SYNC_BYTE
+        and data[_MPEGTS_PACKET_SIZE] == _MPEGTS_SYNC_BYTE
+    ):
+        return False
+
+    sample = data[:_SAMPLE_SIZE]
+    return len(zlib.compress(sample, 1)) < len(sample) * 0.9
@@ -0,0 +1,267 @@
+import asyncio
+import enum
+import struct
+import typing
+from dataclasses import dataclass, field
+from typing import Optional
+
+from camera360.lib.rpc.connection import Message, MethodCall, MethodReturn
+
+
+class FrameKind(enum.IntEnum):
+    request = 1
+    response = 2
+    exception = 3
+    hello = 4
+
+    # streaming methods, items are sent under the request id
+    # while client grants credits for sending more of them
+    stream_item = 5
+    stream_end = 6
+    credit = 7
+    cancel = 8
+
+    # heartbeats, pong echoes id of the ping, see ChannelOptions.heartbeat_interval
+    ping = 9
+    pong = 10
+
+
+class FrameFlags(enum.IntFlag):
+    # payload is raw bytes rather than serialized value
+    blob = 1
+    # header is followed by request timeout in milliseconds
+    timeout = 2
+    # payload is a list of calls, see connection.batch
+    batch = 4
+    # calls of the batch may run concurrently
+    concurrent = 8
+    # payload is compressed with the negotiated compressor
+    compressed = 16
+    # header is followed by logical channel id, see Channel.bind
+    channel_id = 32
+    # method is sent as id agreed during handshake rather than name
+    method_id = 64
+    # payload continues in the next frame of the same kind and id,
+    # large frames are split so others can be sent in between
+    more = 128
+
+
+class Priority(enum.IntEnum):
+    """
+    Outgoing frames of higher priority are written first,
+    so control calls don't wait behind bulk transfers.
+    """
+
+    control = 0
+    normal = 1
+    bulk = 2
+
+
+@dataclass
+class Frame:
+    kind: FrameKind
+    id: int
+
+    payload: bytes = b""
+    method: str = ""
+    flags: int = 0
+    # replaces method name on the wire when set
+    method_id: Optional[int] = None
+
+    # seconds the caller is going to wait for the response
+    timeout: Optional[float] = None
+    # logical channel multiplexed over the connection
+    channel_id: int = 0
+
+    # bytes frame took on the wire, known for received frames only
+    size: int = field(default=0, compare=False)
+    # lane of the outgoing queue, it's not sent to the peer
+    priority: Priority = field(default=Priority.normal, compare=False)
+
+
+class Framing(typing.Protocol):
+    name: str
+
+    # whether frames can carry raw bytes payloads, see FrameFlags.blob
+    raw_payloads: bool
+    # whether peers exchange hello frames when connection is established
+    handshake: bool
+
+    async def read_frame(self, reader: asyncio.StreamReader) -> Optional[Frame]:
+        """
+        Returns next frame from the stream or None when
+        peer closed the connection.
+        """
+
+    def encode_frame(self, frame: Frame) -> list[bytes]:
+        """
+        Returns list of buffers to be written into the stream,
+        payload is not copied to avoid copying large responses.
+        """
+
+
+# payload size, kind, flags, request/response id, method name size
+_HEADER = struct.Struct("!IBBIH")
+_TIMEOUT = struct.Struct("!I")
+_CHANNEL_ID = struct.Struct("!H")
+_METHOD_ID = struct.Struct("!H")
+
+# same as the line limit of json framing, peers split larger payloads into chunks
+MAX_FRAME_SIZE = 10 * 1024 * 1024
+
+
+class BinaryFraming(Framing):
+    """
+    Length-prefixed frames with compact binary header,
+    payload is sent as-is without any additional encoding.
+    """
+
+    name = "binary"
+    raw_payloads = True
+    handshake = True
+
+    async def read_frame(self, reader: asyncio.StreamReader) -> Optional[Frame]:
+        try:
+            header = await reader.readexactly(_HEADER.size)
+        except asyncio.IncompleteReadError:
+            return None
+
+        size, kind, flags, frame_id, method_size = _HEADER.unpack(header)
+        if size > MAX_FRAME_SIZE:
+            raise ConnectionError("Frame of %s bytes exceeds the limit" % size)
+        try:
+            kind = FrameKind(kind)
+        except ValueError:
+            raise ConnectionError("Unknown frame kind %s" % kind) from None
+
+        try:
+            timeout, extra_size = None, 0
+            if flags & FrameFlags.timeout:
+                (timeout_ms,) = _TIMEOUT.unpack(await reader.readexactly(_TIMEOUT.size))
+                timeout = timeout_ms / 1000
+                flags &= ~FrameFlags.timeout
+                extra_size = _TIMEOUT.size
+
+            channel_id = 0
+            if flags & FrameFlags.channel_id:
+                (channel_id,) = _CHANNEL_ID.unpack(
+                    await reader.readexactly(_CHANNEL_ID.size)
+                )
+                flags &= ~FrameFlags.channel_id
+                extra_size += _CHANNEL_ID.size
+
+            method = await reader.readexactly(method_size) if method_size else b""
+            payload = await reader.readexactly(size) if size else b""
+        except asyncio.IncompleteReadError:
+            return None
+
+        method_id = None
+        if flags & FrameFlags.method_id:
+            (method_id,) = _METHOD_ID.unpack(method)
+            method = b""
+            flags &= ~FrameFlags.method_id
+
+        return Frame(
+            kind=kind,
+            id=frame_id,
+            payload=payload,
+            method=method.decode(),
+            method_id=method_id,
+            flags=flags,
+            timeout=timeout,
+            channel_id=channel_id,
+            size=_HEADER.size + extra_size + method_size + size,
+        )
+
+    def encode_frame(self, frame: Frame) -> list[bytes]:
+        flags, extra = frame.flags, b""
+        if frame.method_id is not None:
+            flags |= FrameFlags.method_id
+            method = _METHOD_ID.pack(frame.method_id)
+        else:
+            method = frame.method.encode()
+
+        if frame.timeout is not None:
+            flags |= FrameFlags.timeout
+            extra = _TIMEOUT.pack(min(int(frame.timeout * 1000), 0xFFFFFFFF))
+        if frame.channel_id:
+            flags |= FrameFlags.channel_id
+            extra += _CHANNEL_ID.pack(frame.channel_id)
+
+        header = _HEADER.pack(
+            len(frame.payload), frame.kind, flags, frame.id, len(method)
+        )
+        return [header + extra + method, frame.payload]
+
+
+class JsonLineFraming(Framing):
+    """
+    Legacy newline-separated json messages, kept for
+    compatibility with peers which don't support binary frames.
+    """
+
+    name = "json"
+    raw_payloads = False
+    handshake = False
+
+    async def read_frame(self, reader: asyncio.StreamReader) -> Optional[Frame]:
+        raw_message = await reader.readline()
+
+        # windows machines return empty strings when peer is offline
+        # we don't really care about the reason why somebody
+        # disconnected here, so just treat it as closed connection
+        if raw_message == b"":
+            return None
+
+        message = Message.model_validate_json(raw_message)
+
+        if message.response_id is None:
+            method_call = MethodCall.model_validate_json(message.payload)
+            return Frame(
+                kind=FrameKind.request,
+                id=message.request_id,
+                method=method_call.method,
+                payload=method_call.arguments,
+                size=len(raw_message),
+            )
+
+        method_return = MethodReturn.model_validate_json(message.payload)
+        return Frame(
+            kind=(
+                FrameKind.exception
+                if method_return.type == "exception"
+                else FrameKind.response
+            ),
+            id=message.response_id,
+            payload=str(method_return.value).encode(),
+            size=len(raw_message),
+        )
+
+    def encode_frame(self, frame: Frame) -> list[bytes]:
+        if frame.kind not in (
+            FrameKind.request,
+            FrameKind.response,
+            FrameKind.exception,
+        ):
+            raise ValueError("Frame %s is not supported by json framing" % frame.kind)
+        if frame.channel_id:
+            raise ValueError("Logical channels are not supported by json framing")
+
+        if frame.kind == FrameKind.request:
+            message = Message(
+                request_id=frame.id,
+                payload=MethodCall(method=frame.method, arguments=frame.payload)
+                .model_dump_json()
+                .encode(),
+            )
+        else:
+            method_return = MethodReturn(
+                value=frame.payload,
+                type="exception" if frame.kind == FrameKind.exception else "return",
+            )
+            message = Message(
+                response_id=frame.id,
+                payload=method_return.model_dump_json().encode(),
+            )
+
+        return [message.model_dump_json().encode() + b"\n"]
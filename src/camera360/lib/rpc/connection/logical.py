@@ -0,0 +1,67 @@
+import typing
+from typing import Optional
+
+from camera360.lib.rpc.codecs import Codec
+from camera360.lib.rpc.connection.framing import Frame, Framing, Priority
+
+if typing.TYPE_CHECKING:
+    from camera360.lib.rpc.connection.channel import Channel
+    from camera360.lib.rpc.connection.stream import RemoteStream
+
+
+class LogicalChannel:
+    """
+    One of the channels multiplexed over a single connection,
+    offers the same calls as Channel, so RemotePython can use it.
+    Frames of every logical channel have their own outgoing queue
+    and watermarks, so e.g. bulk transfers don't hold back control calls.
+    """
+
+    def __init__(self, channel: "Channel", channel_id: int):
+        self.channel = channel
+        self.channel_id = channel_id
+
+    def __repr__(self):
+        return f"LogicalChannel[{self.channel_id}] of {self.channel}"
+
+    @property
+    def codec(self) -> Codec:
+        return self.channel.codec
+
+    @property
+    def framing(self) -> Framing:
+        return self.channel.framing
+
+    async def send_request(
+        self,
+        method: str,
+        payload: bytes,
+        timeout: Optional[float] = None,
+        flags: int = 0,
+        priority: Priority = Priority.normal,
+        idempotent: bool = False,
+    ) -> Frame:
+        return await self.channel.send_request(
+            method,
+            payload,
+            timeout=timeout,
+            flags=flags,
+            channel_id=self.channel_id,
+            priority=priority,
+            idempotent=idempotent,
+        )
+
+    async def open_stream(
+        self,
+        method: str,
+        payload: bytes,
+        priority: Priority = Priority.normal,
+        idempotent: bool = False,
+    ) -> "RemoteStream":
+        return await self.channel.open_stream(
+            method,
+            payload,
+            channel_id=self.channel_id,
+            priority=priority,
+            idempotent=idempotent,
+        )
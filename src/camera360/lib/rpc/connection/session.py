@@ -0,0 +1,91 @@
+import collections
+import time
+import uuid
+from typing import Optional
+
+from camera360.lib.rpc.connection.framing import Frame
+
+
+class Session:
+    """
+    Server side state of the client which outlives its connection,
+    responses are kept, so requests replayed by the client after
+    reconnecting are answered without running them again.
+    """
+
+    def __init__(self, session_id: str, max_size: int, max_response_size: int):
+        self.id = session_id
+        self.max_size = max_size
+        self.max_response_size = max_response_size
+
+        # recent responses by logical channel and request id
+        self.responses: collections.OrderedDict[tuple[int, int], Frame] = (
+            collections.OrderedDict()
+        )
+        self.size = 0
+
+        self.channels = 0
+        self.closed_at: Optional[float] = None
+
+    def store(self, frame: Frame) -> None:
+        key = (frame.channel_id, frame.id)
+        # replayed calls are idempotent, so large responses,
+        # like blobs, are made again rather than kept
+        if key in self.responses or len(frame.payload) > self.max_response_size:
+            return
+
+        self.responses[key] = frame
+        self.size += len(frame.payload)
+        # oldest responses are dropped first, clients
+        # are unlikely to replay them anyway
+        while self.size > self.max_size:
+            _, dropped = self.responses.popitem(last=False)
+            self.size -= len(dropped.payload)
+
+    def response(self, channel_id: int, request_id: int) -> Optional[Frame]:
+        return self.responses.get((channel_id, request_id))
+
+
+class SessionStore:
+    """
+    Sessions of the server, kept for ttl seconds after their last connection,
+    each one keeps up to max_size bytes of responses.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 60,
+        max_size: int = 4 * 1024 * 1024,
+        max_response_size: int = 256 * 1024,
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.max_response_size = max_response_size
+        self._sessions: dict[str, Session] = {}
+
+    def open(self, session_id: str) -> tuple[Session, bool]:
+        """
+        Returns existing session and True if it's still there,
+        otherwise new session with another id.
+        """
+        now = time.monotonic()
+        self._sessions = {
+            key: session
+            for key, session in self._sessions.items()
+            if session.closed_at is None or now - session.closed_at < self.ttl
+        }
+
+        session = self._sessions.get(session_id)
+        resumed = session is not None
+        if session is None:
+            session = Session(uuid.uuid4().hex, self.max_size, self.max_response_size)
+            self._sessions[session.id] = session
+
+        session.channels += 1
+        session.closed_at = None
+        return session, resumed
+
+    def close(self, session: Session) -> None:
+        session.channels -= 1
+        if session.channels == 0:
+            session.closed_at = time.monotonic()
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import struct
+import typing
+
+from camera360.lib.rpc.connection.framing import Frame, FrameKind, Priority
+
+if typing.TYPE_CHECKING:
+    from camera360.lib.rpc.connection.channel import Channel
+
+# payload of the credit frame, number of items peer may send
+CREDIT = struct.Struct("!I")
+
+
+class RemoteStream:
+    """
+    Client side of the streaming method call, iterates over
+    items sent by the server and grants it more credits
+    once half of the window is consumed.
+    """
+
+    def __init__(
+        self,
+        channel: "Channel",
+        request_id: int,
+        window: int,
+        channel_id: int = 0,
+        priority: Priority = Priority.normal,
+    ):
+        self._channel = channel
+        self._request_id = request_id
+        self._window = window
+        self._channel_id = channel_id
+        self._priority = priority
+
+        # server never sends more than window items,
+        # so queue doesn't need any limit
+        self._items: asyncio.Queue[Frame | Exception] = asyncio.Queue()
+        self._consumed = 0
+        self._finished = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Frame:
+        if self._finished:
+            raise StopAsyncIteration
+
+        item = await self._items.get()
+
+        if isinstance(item, Exception):
+            self._finish()
+            raise item
+
+        if item.kind == FrameKind.stream_end:
+            self._finish()
+            raise StopAsyncIteration
+
+        if item.kind == FrameKind.exception:
+            self._finish()
+            raise ConnectionError(item.payload.decode())
+
+        self._consumed += 1
+        if self._consumed >= max(self._window // 2, 1):
+            await self._send_control(FrameKind.credit, CREDIT.pack(self._consumed))
+            self._consumed = 0
+
+        return item
+
+    async def open(self) -> None:
+        await self._send_control(FrameKind.credit, CREDIT.pack(self._window))
+
+    async def aclose(self) -> None:
+        """
+        Stops the stream, server is asked to cancel
+        the generator if it is still running.
+        """
+        if self._finished:
+            return
+
+        self._finish()
+        try:
+            await self._send_control(FrameKind.cancel)
+        except ConnectionError:
+            logging.debug("Channel is dead, no need to cancel stream")
+
+    async def _send_control(self, kind: FrameKind, payload: bytes = b"") -> None:
+        # same lane as the request, so they don't overtake it,
+        # server ignores control frames of unknown requests
+        await self._channel.send_control(
+            kind,
+            self._request_id,
+            payload,
+            channel_id=self._channel_id,
+            priority=self._priority,
+        )
+
+    def resume(self, channel: "Channel") -> int:
+        """
+        Moves the stream to the new channel of the resumed session,
+        returns credits for the restarted stream.
+        """
+        self._channel = channel
+        self._consumed = 0
+        return max(self._window - self._items.qsize(), 1)
+
+    def feed(self, item: Frame | Exception) -> None:
+        self._items.put_nowait(item)
+
+    def _finish(self):
+        self._finished = True
+        self._channel.remove_stream(self._request_id)
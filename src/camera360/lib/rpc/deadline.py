@@ -0,0 +1,43 @@
+import contextlib
+import contextvars
+import time
+from typing import Optional
+
+# absolute time (time.monotonic) by which the current chain of rpc calls
+# must be finished, handlers get it from request so their own outgoing
+# calls don't wait for answers nobody is waiting for anymore
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "rpc_deadline", default=None
+)
+
+
+@contextlib.contextmanager
+def deadline(timeout: Optional[float]):
+    """
+    Limits time of all rpc calls made inside the block,
+    nested blocks can only make the deadline closer.
+    """
+    if timeout is None:
+        yield
+        return
+
+    expires = time.monotonic() + timeout
+    current = _deadline.get()
+    token = _deadline.set(expires if current is None else min(current, expires))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(timeout: Optional[float] = None) -> Optional[float]:
+    """
+    Time left for the call, the smallest of given timeout
+    and deadline of the current context.
+    """
+    current = _deadline.get()
+    if current is None:
+        return timeout
+
+    left = max(current - time.monotonic(), 0.0)
+    return left if timeout is None else min(left, timeout)
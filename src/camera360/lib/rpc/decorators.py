@@ -1,10 +1,35 @@
+import collections.abc
+import hashlib
 import inspect
+import json
 import logging
+import os
+import sys
 import types
-from dataclasses import dataclass
+import typing
+from dataclasses import dataclass, field
 from typing import TypeVar, Union, Generic
 
 import pydantic
+from typing_extensions import TypedDict
+
+from .blob import Blob, JsonBlob
+from .codecs import Codec, Decoder, Encoder
+from .connection.framing import Priority
+
+
+@dataclass
+class MethodCodec:
+    """
+    Ready-made functions to send and receive
+    values of the method with one particular codec.
+    """
+
+    encode_args: Encoder
+    # returns keyword arguments of the method
+    decode_args: typing.Callable[[bytes], dict[str, typing.Any]]
+    encode_return: Encoder
+    decode_return: Decoder
 
 
 @dataclass
@@ -12,6 +37,68 @@ class MethodType:
     args_model: type[pydantic.BaseModel]
     return_model: type[pydantic.BaseModel]
 
+    # return value is sent as raw bytes, see Blob
+    is_blob: bool = False
+    # method is an async generator, return_model describes single item
+    is_stream: bool = False
+    # default deadline of the call in seconds
+    timeout: typing.Optional[float] = None
+    # lane of its requests and responses, see Priority
+    priority: Priority = Priority.normal
+    # calling it again has no other effect, so calls
+    # are sent again after reconnecting, see Channel.resume
+    idempotent: bool = False
+
+    # type of the return_model value
+    return_type: typing.Any = field(default=None, compare=False, repr=False)
+    _compiled: dict[tuple[str, bool], MethodCodec] = field(
+        default_factory=dict, compare=False, repr=False
+    )
+
+    def compile(self, codec: Codec, trusted: bool = False) -> MethodCodec:
+        """
+        Builds (once per codec) functions used to encode and decode
+        method calls. Values returned by trusted handlers are sent
+        without validation, mistakes are only caught by receiver.
+        """
+        key = (codec.name, trusted)
+        if compiled := self._compiled.get(key):
+            return compiled
+
+        decode_args_model = codec.decoder(self.args_model.__pydantic_validator__)
+
+        def decode_args(data: bytes) -> dict[str, typing.Any]:
+            # fields of the model as they are, without model_dump copying
+            return decode_args_model(data).__dict__
+
+        # plain dict instead of the return_model, so
+        # we don't need to create model for every response
+        returns = pydantic.TypeAdapter(
+            TypedDict(self.return_model.__name__, {"value": self.return_type})
+        )
+        encode_value = codec.encoder(returns.serializer)
+        decode_value = codec.decoder(returns.validator)
+
+        if trusted:
+
+            def encode_return(value) -> bytes:
+                return encode_value({"value": value})
+        else:
+
+            def encode_return(value) -> bytes:
+                return encode_value(returns.validator.validate_python({"value": value}))
+
+        def decode_return(data: bytes):
+            return decode_value(data)["value"]
+
+        self._compiled[key] = compiled = MethodCodec(
+            encode_args=codec.encoder(self.args_model.__pydantic_serializer__),
+            decode_args=decode_args,
+            encode_return=encode_return,
+            decode_return=decode_return,
+        )
+        return compiled
+
 
 def _process_method(model_name: str, func: types.MethodType):
     logging.debug("Processing method %s", func)
@@ -35,6 +122,22 @@ def _process_method(model_name: str, func: types.MethodType):
     if return_type is None:
         return_type = types.NoneType
 
+    # streaming methods are declared as returning AsyncIterator[T],
+    # every item is sent separately, so we need a model for T only
+    is_stream = typing.get_origin(return_type) in (
+        collections.abc.AsyncIterator,
+        collections.abc.AsyncGenerator,
+        collections.abc.AsyncIterable,
+    )
+    if is_stream:
+        return_type = typing.get_args(return_type)[0]
+
+    # blobs are not serialized with binary framing, but still need
+    # a json representation for framings without raw payloads support
+    is_blob = return_type is Blob
+    if is_blob:
+        return_type = JsonBlob
+
     return_model = pydantic.create_model(
         model_name,
         **{
@@ -46,20 +149,146 @@ def _process_method(model_name: str, func: types.MethodType):
     model = MethodType(
         args_model=args_model,
         return_model=return_model,
+        is_blob=is_blob,
+        is_stream=is_stream,
+        timeout=getattr(func, "rpc_timeout", None),
+        priority=getattr(func, "rpc_priority", Priority.normal),
+        idempotent=getattr(func, "rpc_idempotent", False),
+        return_type=return_type,
     )
     return model
 
 
-def _init(prototype):
-    metadata = dict()
+class ProtocolMethods(collections.abc.Mapping[str, MethodType]):
+    """
+    Methods of the protocol by their names, pydantic models
+    of a method are built on first access to it, so importing
+    protocols and iterating their names stays cheap.
+    """
+
+    def __init__(self, name: str, functions: dict[str, types.FunctionType]):
+        self.name = name
+        self._functions = functions
+        self._methods: dict[str, MethodType] = {}
+
+    def __getitem__(self, name: str) -> MethodType:
+        if (method := self._methods.get(name)) is None:
+            method = _process_method(name, self._functions[name])
+            self._methods[name] = method
+        return method
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self._functions)
+
+    def __len__(self) -> int:
+        return len(self._functions)
+
+    def __contains__(self, name) -> bool:
+        return name in self._functions
 
+    def __repr__(self):
+        return f"ProtocolMethods[{self.name}]({', '.join(self._functions)})"
+
+
+# json file with fingerprints of previous runs, see fingerprint
+SCHEMA_CACHE_ENV = "CAMERA360_SCHEMA_CACHE"
+
+# fingerprints of protocols by id of their methods, see fingerprint
+_fingerprints: dict[int, tuple[typing.Mapping[str, MethodType], str]] = {}
+
+
+def _sources_digest() -> str:
+    """
+    Changes whenever any of the loaded camera360 modules
+    or pydantic is changed, so cached schemas are not stale.
+    """
+    digest = hashlib.sha256(pydantic.VERSION.encode())
+    for name, module in sorted(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if not name.startswith("camera360") or path is None:
+            continue
+
+        stat = os.stat(path)
+        digest.update(b"%s:%d:%d" % (path.encode(), stat.st_mtime_ns, stat.st_size))
+    return digest.hexdigest()[:16]
+
+
+def _cached_fingerprint(key: str, build: typing.Callable[[], str]) -> str:
+    path = os.environ.get(SCHEMA_CACHE_ENV)
+    if not path:
+        return build()
+
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    key = "%s@%s" % (key, _sources_digest())
+    if (value := cache.get(key)) is None:
+        cache[key] = value = build()
+        try:
+            with open(path, "w") as f:
+                json.dump(cache, f, indent=1)
+        except OSError:
+            logging.warning("Unable to save schema cache %s", path, exc_info=True)
+    return value
+
+
+def fingerprint(methods: typing.Mapping[str, MethodType]) -> str:
+    """
+    Hash of the protocol schema, peers with equal fingerprints
+    encode arguments and return values of every method the same way.
+    Protocols' fingerprints are kept between runs in the file
+    given by CAMERA360_SCHEMA_CACHE, if any.
+    """
+    if cached := _fingerprints.get(id(methods)):
+        return cached[1]
+
+    if isinstance(methods, ProtocolMethods):
+        value = _cached_fingerprint(methods.name, lambda: _fingerprint(methods))
+    else:
+        value = _fingerprint(methods)
+
+    _fingerprints[id(methods)] = methods, value
+    return value
+
+
+def _fingerprint(methods: typing.Mapping[str, MethodType]) -> str:
+    schema = {
+        name: [
+            method.args_model.model_json_schema(),
+            method.return_model.model_json_schema(),
+            method.is_blob,
+            method.is_stream,
+        ]
+        for name, method in methods.items()
+    }
+    digest = hashlib.sha256(json.dumps(schema, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+def method_names(methods: typing.Mapping[str, MethodType]) -> list[str]:
+    """
+    Names of the methods by their ids, peers with
+    equal fingerprints get the same ids for the same methods.
+    """
+    return sorted(methods)
+
+
+def _init(prototype) -> ProtocolMethods:
     is_rpc_method = lambda member: inspect.isfunction(member) and getattr(
         member, "is_proto", False
     )
 
-    for name, method in inspect.getmembers(prototype, predicate=is_rpc_method):
-        metadata[name] = _process_method(name, method)
-    return metadata
+    functions = dict(inspect.getmembers(prototype, predicate=is_rpc_method))
+    # mistakes in signatures are still reported on import
+    for function in functions.values():
+        _validate_method_args(inspect.getfullargspec(function))
+
+    return ProtocolMethods(
+        "%s.%s" % (prototype.__module__, prototype.__qualname__), functions
+    )
 
 
 def _validate_method_args(argspec: inspect.FullArgSpec):
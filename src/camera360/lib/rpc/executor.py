@@ -1,13 +1,17 @@
+import asyncio
+import contextlib
 import copy
 import functools
-import logging
 import types
 import typing
 from functools import partial
 
 
+from camera360.lib.rpc.blob import Blob
+from camera360.lib.rpc.connection.batch import CallStatus, decode_results, encode_calls
 from camera360.lib.rpc.connection.channel import Channel
-from camera360.lib.rpc.connection import MethodCall
+from camera360.lib.rpc.connection.framing import FrameFlags
+from camera360.lib.rpc.deadline import remaining
 from camera360.lib.rpc.decorators import MethodType
 from camera360.lib.rpc.protocol import RPCProtocol
 
@@ -19,15 +23,29 @@ class RemotePython(typing.Generic[T]):
         self._protocol: RPCProtocol = protocol
         self._channel: Channel = channel
 
-        for name, member in self._protocol.methods.items():
-            logging.debug("Processing method %s", member)
+    def __getattr__(self, name: str):
+        # protocol methods are overridden with remote call logic on first use,
+        # so remotes of big protocols are cheap to create
+        if name.startswith("_") or (member := self._protocol.methods.get(name)) is None:
+            raise AttributeError(name)
 
-            # copying methods from the protocol but overriding them with remote call logic
-            self.__dict__[name] = partial(self._call_remote_method, member, name)
+        if member.is_stream:
+            call = partial(self._call_remote_stream, member, name)
+        else:
+            call = partial(self._call_remote_method, member, name)
+        self.__dict__[name] = call
+        return call
 
     def __repr__(self):
         return f"RemotePython[{self._protocol.__name__}] at {hex(id(self))}"
 
+    def batch(self, concurrent: bool = False) -> "RemoteBatch":
+        """
+        Collects calls to be sent to the peer in a single frame,
+        server runs them one by one or concurrently.
+        """
+        return RemoteBatch(self, concurrent=concurrent)
+
     async def _call_remote_method(
         self,
         member: MethodType,
@@ -35,12 +53,144 @@ class RemotePython(typing.Generic[T]):
         **arguments,
     ):
         payload = member.args_model(**arguments)
+        method_codec = member.compile(self._channel.codec)
 
         response = await self._channel.send_request(
-            MethodCall(method=method_name, arguments=payload.model_dump_json().encode())
-            .model_dump_json()
-            .encode()
-            + b"\n"
+            method_name,
+            method_codec.encode_args(payload),
+            timeout=remaining(member.timeout),
+            priority=member.priority,
+            idempotent=member.idempotent,
+        )
+
+        if response.flags & FrameFlags.blob:
+            return Blob(response.payload)
+
+        return method_codec.decode_return(response.payload)
+
+    async def _call_remote_stream(
+        self,
+        member: MethodType,
+        method_name: str,
+        **arguments,
+    ):
+        payload = member.args_model(**arguments)
+        method_codec = member.compile(self._channel.codec)
+
+        stream = await self._channel.open_stream(
+            method_name,
+            method_codec.encode_args(payload),
+            priority=member.priority,
+            idempotent=member.idempotent,
         )
+        async with contextlib.aclosing(stream):
+            async for item in stream:
+                yield method_codec.decode_return(item.payload)
+
+
+class RemoteBatch:
+    """
+    Calls made on the batch are only recorded, send() delivers
+    all of them at once and returns their results in order::
+
+        batch = remote.batch()
+        batch.status()
+        batch.controls()
+        status, controls = await batch.send()
+    """
+
+    def __init__(self, remote: RemotePython, concurrent: bool = False):
+        self._remote = remote
+        self._concurrent = concurrent
+        self._calls: list[tuple[MethodType, str, dict]] = []
+
+    def __getattr__(self, name: str):
+        member = self._remote._protocol.methods.get(name)
+        if member is None:
+            raise AttributeError(name)
+        if member.is_stream:
+            raise TypeError("Streaming method %s can't be batched" % name)
+
+        return partial(self._add_call, member, name)
+
+    def __len__(self):
+        return len(self._calls)
+
+    def _add_call(self, member: MethodType, method_name: str, **arguments) -> None:
+        # invalid arguments are reported right away, like for regular calls
+        member.args_model(**arguments)
+        self._calls.append((member, method_name, arguments))
+
+    async def send(self, return_exceptions: bool = False) -> list:
+        calls, self._calls = self._calls, []
+        if not calls:
+            return []
+
+        channel = self._remote._channel
+
+        # legacy peers don't know about batches
+        if not channel.framing.handshake:
+            return await self._send_separately(calls, return_exceptions)
+
+        codecs = [member.compile(channel.codec) for member, _, _ in calls]
+        payload = encode_calls(
+            [
+                (method_name, method_codec.encode_args(member.args_model(**arguments)))
+                for (member, method_name, arguments), method_codec in zip(calls, codecs)
+            ]
+        )
+
+        timeouts = [member.timeout for member, _, _ in calls if member.timeout]
+        flags = FrameFlags.batch
+        if self._concurrent:
+            flags |= FrameFlags.concurrent
+
+        response = await channel.send_request(
+            "",
+            payload,
+            timeout=remaining(min(timeouts, default=None)),
+            flags=flags,
+            # batch goes as fast as the most urgent of its calls
+            priority=min(member.priority for member, _, _ in calls),
+            idempotent=all(member.idempotent for member, _, _ in calls),
+        )
+
+        results = []
+        for method_codec, (status, result) in zip(
+            codecs, decode_results(response.payload)
+        ):
+            if status == CallStatus.exception:
+                error = ConnectionError(result.decode())
+                if not return_exceptions:
+                    raise error
+                results.append(error)
+            elif status == CallStatus.blob:
+                results.append(Blob(result))
+            else:
+                results.append(method_codec.decode_return(result))
+        return results
+
+    async def _send_separately(
+        self, calls: list[tuple[MethodType, str, dict]], return_exceptions: bool
+    ) -> list:
+        """Calls as regular requests, run the way server would run the batch."""
+        requests = [
+            getattr(self._remote, method_name)(**arguments)
+            for _, method_name, arguments in calls
+        ]
+        if self._concurrent:
+            return await asyncio.gather(*requests, return_exceptions=return_exceptions)
+
+        # failed call doesn't stop the next ones, like on the server
+        results = []
+        for request in requests:
+            try:
+                results.append(await request)
+            except Exception as e:
+                results.append(e)
 
-        return member.return_model.model_validate_json(response).value
+        if not return_exceptions:
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+        return results
@@ -0,0 +1,303 @@
+import bisect
+import collections
+import copy
+import dataclasses
+import weakref
+from typing import Optional
+
+import pydantic
+
+# upper bounds of latency histogram buckets in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 10)
+
+
+@dataclasses.dataclass
+class Histogram:
+    # last one counts values above all buckets
+    counts: list[int] = dataclasses.field(
+        default_factory=lambda: [0] * (len(BUCKETS) + 1)
+    )
+    sum: float = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+
+
+@dataclasses.dataclass
+class RoundTrip:
+    """Rolling statistic of the last round trip times in seconds."""
+
+    samples: collections.deque[float] = dataclasses.field(
+        default_factory=lambda: collections.deque(maxlen=32)
+    )
+
+    def observe(self, value: float) -> None:
+        self.samples.append(value)
+
+    @property
+    def last(self) -> Optional[float]:
+        return self.samples[-1] if self.samples else None
+
+    @property
+    def mean(self) -> Optional[float]:
+        return sum(self.samples) / len(self.samples) if self.samples else None
+
+    @property
+    def max(self) -> Optional[float]:
+        return max(self.samples, default=None)
+
+
+@dataclasses.dataclass
+class MethodMetrics:
+    calls: int = 0
+    errors: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+
+    # time request waited for a free slot and time handler took
+    queue_wait: Histogram = dataclasses.field(default_factory=Histogram)
+    handler_time: Histogram = dataclasses.field(default_factory=Histogram)
+
+
+@dataclasses.dataclass
+class StageMetrics:
+    """Stage of the capture pipeline, see camera.pipeline.Pipeline."""
+
+    processed: int = 0
+    dropped: int = 0
+    errors: int = 0
+
+    # frames waiting in the stage buffer
+    depth: int = 0
+    max_depth: int = 0
+
+    # time frame waited in the buffer and time stage took to process it
+    wait: Histogram = dataclasses.field(default_factory=Histogram)
+    latency: Histogram = dataclasses.field(default_factory=Histogram)
+
+
+@dataclasses.dataclass
+class FeedMetrics:
+    """Frames written into encoder process, see camera.api.feed.EncoderFeed."""
+
+    frames: int = 0
+    bytes: int = 0
+    dropped: int = 0
+    # recent rate of writing into the pipe
+    bytes_per_second: float = 0.0
+
+    # frames waiting to be written
+    queued: int = 0
+    max_queued: int = 0
+    # seconds writer waited for encoder to read from the pipe
+    stall_time: float = 0.0
+
+
+@dataclasses.dataclass
+class PacingMetrics:
+    """Frame rate of the camera, see camera.pacing.Pacer."""
+
+    # None while frames are passed at the rate of the sensor
+    target_fps: Optional[float] = None
+    # by timestamps of the frames
+    sensor_fps: Optional[float] = None
+    output_fps: Optional[float] = None
+    # mean deviation of sensor frame intervals in seconds
+    jitter: Optional[float] = None
+
+    skipped: int = 0
+    duplicated: int = 0
+    # captured by sensor but never given to the pipeline,
+    # e.g. nobody read them in time or there was no free buffer
+    lost: int = 0
+
+
+@dataclasses.dataclass
+class ChannelMetrics:
+    peer: str
+    # own requests waiting for response of the peer
+    pending: int = 0
+    # peer requests admitted but not finished yet
+    queued: int = 0
+    running: int = 0
+    rejected: int = 0
+
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    reconnects: int = 0
+
+    # round trip time of heartbeats in seconds, None if peer doesn't answer them
+    rtt: Optional[float] = None
+    rtt_max: Optional[float] = None
+
+
+class Metrics(pydantic.BaseModel):
+    model_config = pydantic.ConfigDict(defer_build=True)
+
+    methods: dict[str, MethodMetrics] = pydantic.Field(default_factory=dict)
+    channels: list[ChannelMetrics] = pydantic.Field(default_factory=list)
+    stages: dict[str, StageMetrics] = pydantic.Field(default_factory=dict)
+    pacing: Optional[PacingMetrics] = None
+    feeds: dict[str, FeedMetrics] = pydantic.Field(default_factory=dict)
+
+    # metrics collected from other processes, e.g. cameras of supervisor
+    peers: dict[str, "Metrics"] = pydantic.Field(default_factory=dict)
+
+
+class MetricsRegistry:
+    """
+    Live counters of the process, updated by channels
+    and copied into Metrics when somebody asks for them.
+    """
+
+    def __init__(self):
+        self.methods: collections.defaultdict[str, MethodMetrics] = (
+            collections.defaultdict(MethodMetrics)
+        )
+        self.reconnects: collections.Counter[str] = collections.Counter()
+        self.stages: dict[str, StageMetrics] = {}
+        self.pacing: Optional[PacingMetrics] = None
+        self.feeds: dict[str, FeedMetrics] = {}
+
+        self._channels = weakref.WeakSet()
+        self._peers: set[str] = set()
+
+    def method(self, name: str) -> MethodMetrics:
+        return self.methods[name]
+
+    def stage(self, name: str) -> StageMetrics:
+        """Metrics of the stage, started again by every new pipeline."""
+        self.stages[name] = metrics = StageMetrics()
+        return metrics
+
+    def feed(self, name: str) -> FeedMetrics:
+        """Metrics of the encoder feed, started again by every new process."""
+        self.feeds[name] = metrics = FeedMetrics()
+        return metrics
+
+    def channel_opened(self, channel, peer: Optional[str] = None) -> None:
+        """
+        Registers channel, peer is given for outgoing connections
+        so repeated connections to it are counted as reconnects.
+        """
+        self._channels.add(channel)
+        if peer is None:
+            return
+
+        if peer in self._peers:
+            self.reconnects[peer] += 1
+        self._peers.add(peer)
+
+    def snapshot(self) -> Metrics:
+        channels = []
+        for channel in list(self._channels):
+            if channel.is_connected:
+                metrics = channel.metrics()
+                metrics.reconnects = self.reconnects[metrics.peer]
+                channels.append(metrics)
+
+        return Metrics(
+            methods=copy.deepcopy(dict(self.methods)),
+            channels=channels,
+            stages=copy.deepcopy(self.stages),
+            pacing=copy.copy(self.pacing),
+            feeds=copy.deepcopy(self.feeds),
+        )
+
+
+REGISTRY = MetricsRegistry()
+
+
+def default_registry() -> MetricsRegistry:
+    return REGISTRY
+
+
+def to_prometheus(metrics: Metrics) -> str:
+    """Renders metrics in Prometheus text exposition format."""
+    families: dict[str, tuple[str, list[str]]] = {}
+
+    def add(family: str, kind: str, labels: dict, value, suffix: str = ""):
+        rendered = ",".join('%s="%s"' % item for item in labels.items())
+        families.setdefault(family, (kind, []))[1].append(
+            "%s%s{%s} %s" % (family, suffix, rendered, value)
+        )
+
+    def add_histogram(family: str, labels: dict, histogram: Histogram):
+        total = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), histogram.counts):
+            total += count
+            add(family, "histogram", {**labels, "le": bound}, total, "_bucket")
+        add(family, "histogram", labels, histogram.sum, "_sum")
+        add(family, "histogram", labels, total, "_count")
+
+    def collect(metrics: Metrics, labels: dict):
+        for name, method in metrics.methods.items():
+            method_labels = {**labels, "method": name}
+            add("rpc_calls_total", "counter", method_labels, method.calls)
+            add("rpc_errors_total", "counter", method_labels, method.errors)
+            add("rpc_received_bytes_total", "counter", method_labels, method.bytes_in)
+            add("rpc_sent_bytes_total", "counter", method_labels, method.bytes_out)
+            add_histogram("rpc_queue_wait_seconds", method_labels, method.queue_wait)
+            add_histogram("rpc_handler_seconds", method_labels, method.handler_time)
+
+        for channel in metrics.channels:
+            channel_labels = {**labels, "peer": channel.peer}
+            for field in ("pending", "queued", "running"):
+                value = getattr(channel, field)
+                add("rpc_channel_%s" % field, "gauge", channel_labels, value)
+            for field in ("rejected", "bytes_sent", "bytes_received", "reconnects"):
+                value = getattr(channel, field)
+                add("rpc_channel_%s_total" % field, "counter", channel_labels, value)
+            for field in ("rtt", "rtt_max"):
+                if (value := getattr(channel, field)) is not None:
+                    add(
+                        "rpc_channel_%s_seconds" % field, "gauge", channel_labels, value
+                    )
+
+        for name, stage in metrics.stages.items():
+            stage_labels = {**labels, "stage": name}
+            for field in ("processed", "dropped", "errors"):
+                value = getattr(stage, field)
+                add("capture_stage_%s_total" % field, "counter", stage_labels, value)
+            for field in ("depth", "max_depth"):
+                value = getattr(stage, field)
+                add("capture_stage_%s" % field, "gauge", stage_labels, value)
+            add_histogram("capture_stage_wait_seconds", stage_labels, stage.wait)
+            add_histogram("capture_stage_latency_seconds", stage_labels, stage.latency)
+
+        if pacing := metrics.pacing:
+            for field in ("target_fps", "sensor_fps", "output_fps"):
+                if (value := getattr(pacing, field)) is not None:
+                    add("capture_%s" % field, "gauge", labels, value)
+            if pacing.jitter is not None:
+                add("capture_jitter_seconds", "gauge", labels, pacing.jitter)
+            for field in ("skipped", "duplicated", "lost"):
+                value = getattr(pacing, field)
+                add("capture_frames_%s_total" % field, "counter", labels, value)
+
+        for name, feed in metrics.feeds.items():
+            feed_labels = {**labels, "feed": name}
+            for field in ("frames", "bytes", "dropped"):
+                value = getattr(feed, field)
+                add("encoder_feed_%s_total" % field, "counter", feed_labels, value)
+            for field in ("bytes_per_second", "queued", "max_queued"):
+                value = getattr(feed, field)
+                add("encoder_feed_%s" % field, "gauge", feed_labels, value)
+            add(
+                "encoder_feed_stall_seconds_total",
+                "counter",
+                feed_labels,
+                feed.stall_time,
+            )
+
+        for source, peer_metrics in metrics.peers.items():
+            collect(peer_metrics, {**labels, "source": source})
+
+    collect(metrics, {})
+
+    lines = []
+    for family, (kind, samples) in families.items():
+        lines.append("# TYPE %s %s" % (family, kind))
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
@@ -1,5 +1,7 @@
 import typing
 
+from .blob import Blob  # noqa: F401
+from .connection.framing import Priority
 from .decorators import MethodType, _init
 
 
@@ -12,7 +14,7 @@ class RPCHandler:
 
 
 class RPCProtocol(typing.Protocol):
-    methods: dict[str, MethodType]
+    methods: typing.Mapping[str, MethodType]
 
     def __init_subclass__(cls, **kwargs):
         if cls.mro()[1] != __class__:
@@ -24,6 +26,28 @@ class RPCProtocol(typing.Protocol):
 T = typing.TypeVar("T")
 
 
-def method(func: T) -> T | MethodType:
-    setattr(func, "is_proto", True)
-    return func
+def method(
+    func: T = None,
+    *,
+    timeout: typing.Optional[float] = None,
+    priority: Priority = Priority.normal,
+    idempotent: bool = False,
+) -> T | MethodType:
+    """
+    Marks protocol method as available over rpc, timeout
+    is the default deadline of the call in seconds.
+    Requests and responses of control methods are sent
+    ahead of bulk ones sharing the same connection.
+    Calls of idempotent methods survive reconnects.
+    """
+
+    def decorator(func: T) -> T:
+        setattr(func, "is_proto", True)
+        setattr(func, "rpc_timeout", timeout)
+        setattr(func, "rpc_priority", priority)
+        setattr(func, "rpc_idempotent", idempotent)
+        return func
+
+    if func is None:
+        return decorator
+    return decorator(func)
@@ -0,0 +1,199 @@
+import asyncio
+import contextlib
+import logging
+import typing
+
+from ..connection.channel import Channel, ChannelOptions
+from ..executor import RemotePython
+from ..protocol import RPCHandler
+from .transports import Transport, get_transport
+
+
+def _transport(
+    host: typing.Optional[str], port: typing.Optional[int], url: typing.Optional[str]
+) -> Transport:
+    if url is None and host is None:
+        raise ValueError("Either host and port or url must be given")
+    return get_transport(url or "tcp://%s:%s" % (host, port))
+
+
+async def start_server(
+    handler: RPCHandler,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    options: typing.Optional[ChannelOptions] = None,
+    url: typing.Optional[str] = None,
+    channels: typing.Optional[dict[int, RPCHandler]] = None,
+):
+    """
+    Serves handler on tcp host and port, or on url
+    of any other transport, see transports.get_transport.
+    Handlers of additional logical channels are given by their ids.
+    """
+    # clients only need the camera protocol, it's much faster to import alone
+    from ...supervisor.protocol import SupervisorProtocol
+
+    # channels share sessions of their clients
+    options = options or ChannelOptions()
+
+    async def create_channel(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        peer = writer.transport.get_extra_info("peername")
+        logging.info("Creating channel %s", peer)
+
+        channel = Channel(reader, writer, handler, options=options)
+        # bound before the handshake, so client knows what they serve
+        for channel_id, channel_handler in (channels or {}).items():
+            channel.bind(channel_id, channel_handler)
+
+        try:
+            await channel.accept()
+        except ConnectionError:
+            logging.warning("Handshake with %s failed", peer, exc_info=True)
+            writer.close()
+            return
+
+        try:
+            channel.use_protocol(SupervisorProtocol)
+        except ConnectionError as e:
+            # client may serve nothing we call, it's up to handler
+            logging.warning("%s: %s", peer, e)
+
+        remote = RemotePython(
+            protocol=SupervisorProtocol, channel=channel
+        )
+        await handler.on_client_connected(remote)
+        await channel.serve_forever()
+        await handler.on_client_disconnected(remote)
+
+    server = await _transport(host, port, url).start_server(create_channel)
+
+    return server
+
+
+T = typing.TypeVar("T")
+
+
+@contextlib.asynccontextmanager
+async def connect(
+    host: typing.Optional[str] = None,
+    port: typing.Optional[int] = None,
+    protocol: type[T] = None,
+    handler=None,
+    options: typing.Optional[ChannelOptions] = None,
+    url: typing.Optional[str] = None,
+) -> typing.AsyncContextManager[T]:
+    conn = Connection(host, port, options=options, url=url)
+    executor = await conn.connect(protocol, handler)
+
+    async with conn.channel:
+        yield executor
+
+
+class Connection:
+    def __init__(
+        self,
+        host: typing.Optional[str] = None,
+        port: typing.Optional[int] = None,
+        options: typing.Optional[ChannelOptions] = None,
+        url: typing.Optional[str] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.options = options
+        self.transport = _transport(host, port, url)
+
+        self.channel = None
+        # remotes to be moved to the new channel on reconnect
+        self._remotes: list[tuple[RemotePython, type, int]] = []
+
+    async def connect(
+            self,
+            protocol: type[T],
+            handler: typing.Optional[RPCHandler]) -> T:
+        reader, writer = await self.transport.open_connection()
+        logging.info("Connection to %s established", self.transport.url)
+
+        self.channel = Channel(reader, writer, handler=handler, options=self.options)
+        executor: T = RemotePython(protocol=protocol, channel=self.channel)
+
+        await self.channel.start(on_lost_connection_cb=self.on_lost_connection)
+        try:
+            self.channel.use_protocol(protocol)
+        except ConnectionError:
+            await self.channel.close()
+            raise
+
+        self._remotes = [(executor, protocol, 0)]
+        return executor
+
+    async def reconnect(self) -> None:
+        """
+        Connects again after the connection was lost, remotes
+        returned earlier keep working. Server resumes the session,
+        so idempotent calls in flight get their responses.
+        """
+        if self.channel is None:
+            raise ValueError("No connection to server")
+
+        previous = self.channel
+        reader, writer = await self.transport.open_connection()
+        logging.info("Connection to %s established again", self.transport.url)
+
+        channel = Channel(
+            reader,
+            writer,
+            handler=previous._handlers[0],
+            options=self.options,
+            session=previous.session,
+        )
+        await channel.start(on_lost_connection_cb=self.on_lost_connection)
+        try:
+            for channel_id, handler in previous._handlers.items():
+                if channel_id:
+                    channel.bind(channel_id, handler)
+            for remote, protocol, channel_id in self._remotes:
+                channel.use_protocol(protocol, channel_id)
+                remote._channel = (
+                    channel.bind(channel_id, previous._handlers[channel_id])
+                    if channel_id
+                    else channel
+                )
+        except ConnectionError:
+            await channel.close()
+            raise
+
+        channel.resume(previous)
+        self.channel = channel
+
+    def open(
+        self,
+        protocol: type[T],
+        channel_id: int,
+        handler: typing.Optional[RPCHandler] = None,
+    ) -> T:
+        """
+        Another protocol over the same connection, bound to
+        logical channel the server has a handler for.
+        """
+        if self.channel is None:
+            raise ValueError("No connection to server")
+
+        channel = self.channel.bind(channel_id, handler)
+        self.channel.use_protocol(protocol, channel_id)
+        remote = RemotePython(protocol=protocol, channel=channel)
+        self._remotes.append((remote, protocol, channel_id))
+        return remote
+
+    async def wait_for_disconnect(self):
+        if self.channel is None:
+            raise ValueError("No connection to server")
+
+        await self.channel.on_disconnect_event.wait()
+
+    async def disconnect(self):
+        await self.channel.close()
+
+    async def on_lost_connection(self):
+        ...
@@ -0,0 +1,246 @@
+import asyncio
+import itertools
+import typing
+import urllib.parse
+from typing import Optional
+
+ClientConnected = typing.Callable[
+    [asyncio.StreamReader, asyncio.StreamWriter], typing.Awaitable[None]
+]
+
+# big enough for multi-megabyte preview responses
+STREAM_LIMIT = 10 * 1024 * 1024
+
+
+class Transport(typing.Protocol):
+    url: str
+
+    async def start_server(
+        self, client_connected: ClientConnected
+    ) -> asyncio.AbstractServer:
+        """Starts accepting connections, each one is passed to the callback."""
+
+    async def open_connection(
+        self,
+    ) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """Connects to the server, ConnectionRefusedError if it's not there."""
+
+
+class TcpTransport(Transport):
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.url = "tcp://%s:%s" % (host, port)
+
+    async def start_server(
+        self, client_connected: ClientConnected
+    ) -> asyncio.AbstractServer:
+        return await asyncio.start_server(
+            client_connected, host=self.host, port=self.port, limit=STREAM_LIMIT
+        )
+
+    async def open_connection(
+        self,
+    ) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        return await asyncio.open_connection(
+            host=self.host, port=self.port, limit=STREAM_LIMIT
+        )
+
+
+class UnixTransport(Transport):
+    """
+    Unix domain socket, cheaper than tcp when
+    both daemons run on the same board.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.url = "unix://%s" % path
+
+    async def start_server(
+        self, client_connected: ClientConnected
+    ) -> asyncio.AbstractServer:
+        # stale socket file of the previous run is removed by asyncio
+        return await asyncio.start_unix_server(
+            client_connected, path=self.path, limit=STREAM_LIMIT
+        )
+
+    async def open_connection(
+        self,
+    ) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        return await asyncio.open_unix_connection(path=self.path, limit=STREAM_LIMIT)
+
+
+class _MemoryTransport(asyncio.Transport):
+    """
+    Writes go straight into reader of the other side, which
+    pauses writing when it has too much unread data.
+    """
+
+    def __init__(self, protocol: asyncio.StreamReaderProtocol, peername: str):
+        super().__init__()
+        self._protocol = protocol
+        self._peername = peername
+        self._peer: Optional["_MemoryTransport"] = None
+        self._peer_reader: Optional[asyncio.StreamReader] = None
+        self._closing = False
+
+    def get_extra_info(self, name, default=None):
+        if name == "peername":
+            return self._peername
+        return default
+
+    def write(self, data) -> None:
+        if not self._closing:
+            self._peer_reader.feed_data(data)
+
+    def can_write_eof(self) -> bool:
+        return False
+
+    def get_write_buffer_size(self) -> int:
+        return 0
+
+    def is_closing(self) -> bool:
+        return self._closing
+
+    def close(self) -> None:
+        if self._closing:
+            return
+
+        for transport in (self, self._peer):
+            transport._closing = True
+            transport._protocol.connection_lost(None)
+
+    def abort(self) -> None:
+        self.close()
+
+    # called by reader of the peer when its buffer is full
+    def pause_reading(self) -> None:
+        self._protocol.pause_writing()
+
+    def resume_reading(self) -> None:
+        self._protocol.resume_writing()
+
+
+def _memory_pipe(
+    name: str,
+) -> tuple[
+    tuple[asyncio.StreamReader, asyncio.StreamWriter],
+    tuple[asyncio.StreamReader, asyncio.StreamWriter],
+]:
+    loop = asyncio.get_running_loop()
+
+    sides = []
+    for _ in range(2):
+        reader = asyncio.StreamReader(limit=STREAM_LIMIT, loop=loop)
+        protocol = asyncio.StreamReaderProtocol(reader, loop=loop)
+        transport = _MemoryTransport(protocol, peername=name)
+        sides.append((reader, protocol, transport))
+
+    (
+        (client_reader, client_protocol, client),
+        (server_reader, server_protocol, server),
+    ) = sides
+    client._peer, client._peer_reader = server, server_reader
+    server._peer, server._peer_reader = client, client_reader
+    # readers pause transport which feeds them
+    client_reader.set_transport(server)
+    server_reader.set_transport(client)
+
+    return (
+        (
+            client_reader,
+            asyncio.StreamWriter(client, client_protocol, client_reader, loop),
+        ),
+        (
+            server_reader,
+            asyncio.StreamWriter(server, server_protocol, server_reader, loop),
+        ),
+    )
+
+
+class _MemoryServer(asyncio.AbstractServer):
+    def __init__(self, name: str, client_connected: ClientConnected):
+        self.name = name
+        self.client_connected = client_connected
+        self._closed = asyncio.Event()
+        self._tasks: set[asyncio.Task] = set()
+
+    def close(self) -> None:
+        if _MEMORY_SERVERS.get(self.name) is self:
+            del _MEMORY_SERVERS[self.name]
+        self._closed.set()
+
+    def get_loop(self):
+        return asyncio.get_running_loop()
+
+    def is_serving(self) -> bool:
+        return not self._closed.is_set()
+
+    async def start_serving(self) -> None: ...
+
+    async def serve_forever(self) -> None:
+        await self._closed.wait()
+
+    async def wait_closed(self) -> None:
+        await self._closed.wait()
+
+    def accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.create_task(self.client_connected(reader, writer))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+_MEMORY_SERVERS: dict[str, _MemoryServer] = {}
+
+
+class MemoryTransport(Transport):
+    """
+    Connects peers of the same process without any sockets,
+    e.g. many camera handlers in one process for scale tests.
+    """
+
+    _connections = itertools.count()
+
+    def __init__(self, name: str):
+        self.name = name
+        self.url = "inproc://%s" % name
+
+    async def start_server(
+        self, client_connected: ClientConnected
+    ) -> asyncio.AbstractServer:
+        if self.name in _MEMORY_SERVERS:
+            raise OSError("Address %s is already in use" % self.url)
+
+        _MEMORY_SERVERS[self.name] = server = _MemoryServer(self.name, client_connected)
+        return server
+
+    async def open_connection(
+        self,
+    ) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        server = _MEMORY_SERVERS.get(self.name)
+        if server is None:
+            raise ConnectionRefusedError("Nobody listens on %s" % self.url)
+
+        client, server_side = _memory_pipe(
+            "%s#%s" % (self.url, next(self._connections))
+        )
+        server.accept(*server_side)
+        return client
+
+
+def get_transport(url: str) -> Transport:
+    """
+    Transport for urls like tcp://127.0.0.1:8000,
+    unix:///run/camera.sock or inproc://camera0.
+    """
+    parsed = urllib.parse.urlsplit(url)
+
+    if parsed.scheme == "tcp":
+        return TcpTransport(parsed.hostname, parsed.port)
+    if parsed.scheme == "unix":
+        return UnixTransport(parsed.netloc + parsed.path)
+    if parsed.scheme == "inproc":
+        return MemoryTransport(parsed.netloc + parsed.path)
+
+    raise ValueError("Unsupported transport %s" % url)
@@ -0,0 +1,118 @@
+import asyncio
+import collections
+import json
+import logging
+import os
+import signal
+import tempfile
+import threading
+import time
+from typing import Optional
+
+# spans and events kept by default, roughly a minute of capturing
+TRACE_SIZE = 64 * 1024
+
+
+class Tracer:
+    """
+    Flight recorder of the hot paths, keeps the last records in memory
+    and only formats them when dumped, so it's cheap enough to be always on::
+
+        started = TRACER.now()
+        ...
+        TRACER.span("rpc.dispatch", started, id=frame.id, size=frame.size)
+
+    Part of the name before the dot is its category, every category
+    gets its own row in the trace viewer.
+    """
+
+    def __init__(self, size: int = TRACE_SIZE):
+        # (name, started, duration, id, size) with nanoseconds,
+        # duration of instant events is None
+        self._records: collections.deque[tuple] = collections.deque(maxlen=size)
+        self.enabled = True
+        self.now = time.perf_counter_ns
+
+    def __len__(self):
+        return len(self._records)
+
+    def span(self, name: str, started: int, id: int = 0, size: int = 0) -> None:
+        if self.enabled:
+            self._records.append((name, started, self.now() - started, id, size))
+
+    def event(self, name: str, id: int = 0, size: int = 0) -> None:
+        if self.enabled:
+            self._records.append((name, self.now(), None, id, size))
+
+    def clear(self) -> None:
+        self._records.clear()
+
+    def chrome_trace(self) -> dict:
+        """Records in the Chrome trace event format, see chrome://tracing or Perfetto."""
+        pid = os.getpid()
+        lanes: dict[str, int] = {}
+        events = []
+
+        # deque may be appended by other threads while copying
+        for name, started, duration, id, size in list(self._records):
+            category = name.partition(".")[0]
+            tid = lanes.setdefault(category, len(lanes) + 1)
+            event = {
+                "name": name,
+                "cat": category,
+                "ts": started / 1000,
+                "pid": pid,
+                "tid": tid,
+                "args": {"id": id, "size": size},
+            }
+            if duration is None:
+                event.update(ph="i", s="t")
+            else:
+                event.update(ph="X", dur=duration / 1000)
+            events.append(event)
+
+        events += [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": tid,
+                "args": {"name": category},
+            }
+            for category, tid in lanes.items()
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dumps(self) -> bytes:
+        return json.dumps(self.chrome_trace()).encode()
+
+    def dump(self, path: Optional[str] = None) -> str:
+        """Writes the trace into the file, returns its path."""
+        if path is None:
+            path = os.path.join(
+                tempfile.gettempdir(),
+                "camera360-%s-%s.trace.json"
+                % (os.getpid(), time.strftime("%Y%m%d-%H%M%S")),
+            )
+        with open(path, "wb") as f:
+            f.write(self.dumps())
+        return path
+
+
+TRACER = Tracer()
+
+
+def dump_on_signal(tracer: Tracer = TRACER) -> None:
+    """Dumps the trace into temp directory whenever process gets SIGUSR1."""
+    # there are no such signals on windows
+    if not hasattr(signal, "SIGUSR1"):
+        return
+
+    def dump():
+        # formatting large trace takes a while, event loop keeps running
+        thread = threading.Thread(
+            target=lambda: logging.warning("Trace saved to %s", tracer.dump())
+        )
+        thread.start()
+
+    asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, dump)
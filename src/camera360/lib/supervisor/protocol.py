@@ -1,20 +1,30 @@
 import enum
-from typing import List, Optional, Any
+from typing import AsyncIterator, List, Optional, Any
 
 import pydantic
 from pydantic import BaseModel
 
 from ..camera.controls import AnyControl
-from ..rpc.protocol import RPCProtocol, method
+from ..camera.protocol import BULK_CHANNEL  # noqa: F401
+from ..rpc.metrics import Metrics
+from ..rpc.protocol import Blob, Priority, RPCProtocol, method
 
 
 class FrameData(BaseModel):
+    model_config = pydantic.ConfigDict(defer_build=True)
+
     index: int
 
 
 class Client(BaseModel):
+    model_config = pydantic.ConfigDict(defer_build=True)
+
     name: str
 
+    # health of the link, rtt is a mean round trip time in seconds
+    connected: bool = True
+    rtt: Optional[float] = None
+
 
 class SystemStatus(enum.Enum):
     idle = "idle"
@@ -22,6 +32,8 @@ class SystemStatus(enum.Enum):
 
 
 class Status(BaseModel):
+    model_config = pydantic.ConfigDict(defer_build=True)
+
     status: SystemStatus = SystemStatus.idle
     pending_status: Optional[SystemStatus] = None
 
@@ -32,27 +44,34 @@ class SupervisorProtocol(RPCProtocol):
     @method
     async def on_frame_received(self, *, frame: FrameData) -> None: ...
 
-    @method
+    @method(idempotent=True)
     async def get_clients(self) -> List[Client]: ...
 
-    @method
+    @method(timeout=15, priority=Priority.control)
     async def start(self) -> None: ...
 
-    @method
+    @method(timeout=15, priority=Priority.control)
     async def stop(self) -> None: ...
 
-    @method
+    @method(priority=Priority.control, idempotent=True)
     async def controls(self) -> List[AnyControl]: ...
 
-    @method
+    @method(priority=Priority.control, idempotent=True)
     async def set_controls(self, *, values: dict[str, Any]) -> None:
         ...
 
-    @method
+    @method(priority=Priority.control, idempotent=True)
     async def status(self) -> Status: ...
 
-    @method
-    async def events(self) -> None: ...
+    @method(idempotent=True)
+    async def events(self) -> AsyncIterator[Status]: ...
 
-    @method
-    async def preview(self, *, filename: str) -> bytes: ...
+    @method(timeout=10, priority=Priority.bulk, idempotent=True)
+    async def preview(self, *, filename: str) -> Blob: ...
+
+    @method(timeout=10, idempotent=True)
+    async def metrics(self) -> Metrics: ...
+
+    # recent spans of the hot paths in Chrome trace format, see tracing.Tracer
+    @method(timeout=10, priority=Priority.bulk, idempotent=True)
+    async def trace(self) -> Blob: ...
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from camera360.lib.camera.buffers import BufferPool
+from camera360.lib.camera.device import RawFrame
+from camera360.lib.camera.pipeline import Overflow, Pipeline, Stage
+from camera360.lib.rpc.metrics import MetricsRegistry
+
+
+def test_buffer_is_recycled_after_last_release():
+    pool = BufferPool(size=16, count=2)
+    first, second = pool.get(), pool.get()
+    assert pool.get() is None
+
+    first.retain()
+    first.release()
+    assert pool.available == 0
+    first.release()
+    assert pool.available == 1
+
+    # same memory is handed out again
+    assert pool.get().data is first.data
+    second.release()
+    with pytest.raises(RuntimeError):
+        second.retain()
+
+
+def test_pool_grows_up_to_max_count():
+    pool = BufferPool(size=16, count=1, max_count=3)
+    buffers = [pool.get() for _ in range(3)]
+    assert pool.get() is None
+    assert pool.count == 3
+
+    for buffer in buffers:
+        buffer.release()
+    assert pool.available == 3
+
+
+@pytest.mark.asyncio
+async def test_pipeline_releases_frames_of_all_stages():
+    pool = BufferPool(size=1024, count=8)
+    sequence = 0
+    seen: list[memoryview] = []
+
+    async def capture() -> RawFrame:
+        nonlocal sequence
+        while (buffer := pool.get()) is None:
+            await asyncio.sleep(0.001)
+        sequence += 1
+        buffer.data[:4] = sequence.to_bytes(4, "big")
+        return RawFrame(sequence, buffer.view, timestamp=sequence / 100, owner=buffer)
+
+    async def record(frame: RawFrame) -> None:
+        # sinks see the pooled memory itself
+        assert frame.buffer.obj is frame.owner.data
+        assert int.from_bytes(frame.buffer[:4], "big") == frame.sequence
+        seen.append(frame.buffer)
+        await asyncio.sleep(0.002)
+
+    async def slow(frame: RawFrame) -> None:
+        await asyncio.sleep(0.02)
+
+    pipeline = Pipeline(
+        capture,
+        [
+            Stage("record", record, size=4, overflow=Overflow.block),
+            Stage("preview", slow, size=1, overflow=Overflow.drop_oldest),
+        ],
+        registry=MetricsRegistry(),
+    )
+    pipeline.start()
+    await asyncio.sleep(0.2)
+    await pipeline.stop(timeout=0.01)
+
+    assert len(seen) > 20
+    assert pipeline.stages[1].metrics.dropped > 0
+    assert pool.available == 8
+
+
+@pytest.mark.parametrize("max_count, lost", [(4, True), (64, False)])
+@pytest.mark.asyncio
+async def test_frames_sensor_drops_are_counted(max_count, lost):
+    pool = BufferPool(size=1024, count=4, max_count=max_count)
+    sequence = 0
+    recorded: list[int] = []
+
+    async def capture() -> RawFrame:
+        # sensor keeps its pace, frames without free buffer are gone
+        nonlocal sequence
+        while True:
+            await asyncio.sleep(0.002)
+            sequence += 1
+            if buffer := pool.get():
+                return RawFrame(sequence, buffer.view, sequence / 500, owner=buffer)
+
+    async def record(frame: RawFrame) -> None:
+        recorded.append(frame.sequence)
+
+    async def slow(frame: RawFrame) -> None:
+        await asyncio.sleep(0.05)
+
+    pipeline = Pipeline(
+        capture,
+        [
+            Stage("record", record, size=32, overflow=Overflow.block),
+            Stage("notify", slow, size=2, overflow=Overflow.drop_oldest),
+            Stage("preview", slow, size=2, overflow=Overflow.drop_newest),
+        ],
+        registry=MetricsRegistry(),
+    )
+    pipeline.start()
+    await asyncio.sleep(0.3)
+    await pipeline.stop(timeout=0.01)
+
+    gaps = sum(b - a - 1 for a, b in zip(recorded, recorded[1:]))
+    assert pipeline.pacer.metrics.lost == gaps
+    assert (gaps > 0) == lost
+    assert pool.available == pool.count
@@ -0,0 +1,68 @@
+import asyncio
+import json
+import sys
+import time
+
+import pytest
+
+from camera360.apps.camera.settings import settings
+
+# records frame rate of the caps and how much was written into the pipe
+GST_LAUNCH = """#!%s
+import json, os, re, sys
+framerate = re.search(r"framerate=(\\d+)/(\\d+)", " ".join(sys.argv)).groups()
+size = 0
+while chunk := sys.stdin.buffer.read(65536):
+    size += len(chunk)
+path = os.path.join(os.environ["GST_OUTPUT"], "%%s.json" %% os.getpid())
+with open(path, "w") as f:
+    json.dump({"framerate": int(framerate[0]) / int(framerate[1]), "size": size}, f)
+"""
+
+
+@pytest.fixture
+def camera(tmp_path, monkeypatch):
+    (tmp_path / "bin").mkdir()
+    gst_launch = tmp_path / "bin" / "gst-launch-1.0"
+    gst_launch.write_text(GST_LAUNCH % sys.executable)
+    gst_launch.chmod(0o755)
+
+    monkeypatch.setenv("PATH", "%s:%s" % (gst_launch.parent, "/usr/bin:/bin"))
+    monkeypatch.setenv("GST_OUTPUT", str(tmp_path))
+    monkeypatch.setattr(settings, "device", "fake")
+    monkeypatch.setattr(settings, "storage_path", str(tmp_path / "storage"))
+    monkeypatch.setattr(settings, "combined_encoder", True)
+
+    from camera360.apps.camera.main import Handler
+
+    return Handler()
+
+
+def recordings(tmp_path) -> list[dict]:
+    return sorted(
+        (json.loads(path.read_text()) for path in tmp_path.glob("*.json")),
+        key=lambda recording: recording["framerate"],
+    )
+
+
+@pytest.mark.asyncio
+async def test_recording_lasts_as_long_as_capture(camera, tmp_path):
+    frame_size = len(camera._camera_api._image)
+
+    started = time.monotonic()
+    await camera.start(device_path="fake", width=378, height=378)
+    await asyncio.sleep(1)
+    # the rest goes into another recording of the new rate
+    await camera.set_controls(values={"Framerate": 4})
+    changed = time.monotonic()
+    await asyncio.sleep(1)
+    await camera.stop()
+    stopped = time.monotonic()
+
+    slow, fast = recordings(tmp_path)
+    assert (slow["framerate"], fast["framerate"]) == (4, settings.framerate)
+    for recording, elapsed in [(fast, changed - started), (slow, stopped - changed)]:
+        # give or take a frame
+        interval = 1 / recording["framerate"]
+        duration = recording["size"] / frame_size * interval
+        assert duration == pytest.approx(elapsed, abs=interval + 0.1)
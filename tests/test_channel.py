@@ -0,0 +1,217 @@
+import asyncio
+import os
+import struct
+
+import pytest
+
+from camera360.lib.rpc.connection.channel import Channel, ChannelOptions
+from camera360.lib.rpc.connection.compression import get_compressor, is_compressible
+from camera360.lib.rpc.connection.framing import (
+    BinaryFraming,
+    Frame,
+    FrameKind,
+    JsonLineFraming,
+    Priority,
+)
+from camera360.lib.rpc.connection.session import Session
+from camera360.lib.rpc.connection.stream import RemoteStream
+
+
+class SlowWriter:
+    """
+    Stream writer which doesn't flush anything
+    until test allows it to do that.
+    """
+
+    def __init__(self):
+        self.writes: list[bytes] = []
+        self.flushed = asyncio.Event()
+
+    def writelines(self, buffers):
+        self.writes.append(b"".join(buffers))
+
+    async def drain(self):
+        await self.flushed.wait()
+
+    def close(self): ...
+
+
+@pytest.mark.asyncio
+async def test_writer_coalesces_frames_and_applies_backpressure():
+    writer = SlowWriter()
+    channel = Channel(
+        reader=asyncio.StreamReader(),
+        writer=writer,
+        handler=None,
+        options=ChannelOptions(high_watermark=250, low_watermark=50),
+    )
+    serving = asyncio.create_task(channel.serve_forever())
+
+    # first frame goes to the socket right away and blocks on drain
+    await channel.send_response(1, b"x" * 60)
+    await asyncio.sleep(0.01)
+    assert len(writer.writes) == 1
+
+    # next ones are queued while socket is busy
+    for request_id in range(2, 5):
+        await channel.send_response(request_id, b"x" * 60)
+    assert channel.queue_depth == 3
+
+    # buffer is above high watermark, so senders have to wait now
+    blocked = asyncio.create_task(channel.send_response(5, b"x" * 60))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+
+    writer.flushed.set()
+    await blocked
+    await asyncio.sleep(0.01)
+
+    # queued frames were written with a single call
+    assert len(writer.writes) == 3
+    assert writer.writes[1].count(b"x" * 60) == 3
+    assert channel.queue_depth == 0
+    assert channel.queue_size == 0
+
+    serving.cancel()
+
+
+@pytest.mark.asyncio
+async def test_large_payloads_are_compressed():
+    writer = SlowWriter()
+    writer.flushed.set()
+    channel = Channel(
+        reader=asyncio.StreamReader(),
+        writer=writer,
+        handler=None,
+        options=ChannelOptions(compression_threshold=1024),
+    )
+    channel.compressor = get_compressor("zlib")
+    serving = asyncio.create_task(channel.serve_forever())
+
+    # small and already compressed payloads are sent as-is
+    mpegts = (b"\x47" + os.urandom(187)) * 64
+    for payload in (b"x" * 100, mpegts, os.urandom(4096)):
+        await channel.send_response(1, payload)
+        await asyncio.sleep(0.01)
+        assert payload in writer.writes[-1]
+
+    await channel.send_response(2, b"x" * 100_000)
+    await asyncio.sleep(0.01)
+    assert len(writer.writes[-1]) < 1000
+
+    serving.cancel()
+
+
+def test_compressible_payloads_detection():
+    assert is_compressible(b'{"value": [1, 2, 3]}' * 100)
+    assert not is_compressible(b"\xff\xd8\xff\xe0" + os.urandom(100))
+    assert not is_compressible(os.urandom(10000))
+
+
+@pytest.mark.asyncio
+async def test_logical_channels_are_queued_separately():
+    writer = SlowWriter()
+    channel = Channel(
+        reader=asyncio.StreamReader(),
+        writer=writer,
+        handler=None,
+        options=ChannelOptions(high_watermark=250, low_watermark=50),
+    )
+    serving = asyncio.create_task(channel.serve_forever())
+
+    await channel.send_response(1, b"x" * 60)
+    await asyncio.sleep(0.01)
+
+    # bulk channel is above its high watermark
+    for request_id in range(2, 6):
+        await channel.send_response(request_id, b"b" * 60, channel_id=1)
+    blocked = asyncio.create_task(channel.send_response(6, b"b" * 60, channel_id=1))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+
+    # while control channel still accepts frames
+    await asyncio.wait_for(channel.send_response(7, b"c" * 60), 0.1)
+
+    writer.flushed.set()
+    await blocked
+    await asyncio.sleep(0.01)
+
+    # and they don't wait behind everything queued for bulk one
+    assert writer.writes[1].index(b"c" * 60) < writer.writes[1].index(b"b" * 60)
+
+    serving.cancel()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "framing, data",
+    [
+        # response of 4 GB and one of unknown kind
+        (
+            BinaryFraming(),
+            struct.pack("!IBBIH", 0xFFFFFFFF, FrameKind.response, 0, 1, 0),
+        ),
+        (BinaryFraming(), struct.pack("!IBBIH", 0, 200, 0, 1, 0)),
+        (JsonLineFraming(), b"not json\n"),
+    ],
+)
+async def test_malformed_frame_fails_pending_calls(framing, data):
+    writer = SlowWriter()
+    writer.flushed.set()
+    reader = asyncio.StreamReader()
+    channel = Channel(
+        reader=reader,
+        writer=writer,
+        handler=None,
+        options=ChannelOptions(framing=framing),
+    )
+    serving = asyncio.create_task(channel.serve_forever())
+    call = asyncio.create_task(channel.send_request("status", b"{}"))
+    await asyncio.sleep(0.01)
+
+    reader.feed_data(data)
+    with pytest.raises(ConnectionResetError):
+        await asyncio.wait_for(call, 1)
+    assert not channel.is_connected
+
+    serving.cancel()
+
+
+def test_session_keeps_limited_responses():
+    session = Session("test", max_size=1000, max_response_size=400)
+
+    for request_id in range(4):
+        session.store(Frame(kind=FrameKind.response, id=request_id, payload=b"x" * 300))
+    session.store(Frame(kind=FrameKind.response, id=4, payload=b"x" * 500))
+
+    # oldest ones are dropped and too large one is not kept at all
+    assert list(session.responses) == [(0, 1), (0, 2), (0, 3)]
+    assert session.size == 900
+    assert session.response(0, 4) is None
+
+
+class ControlRecorder:
+    def __init__(self):
+        self.frames: list[tuple[FrameKind, Priority]] = []
+
+    async def send_control(self, kind, request_id, payload=b"", **kwargs):
+        self.frames.append((kind, kwargs["priority"]))
+
+    def remove_stream(self, request_id): ...
+
+
+@pytest.mark.asyncio
+async def test_stream_control_frames_follow_request():
+    channel = ControlRecorder()
+    stream = RemoteStream(channel, 1, window=2, priority=Priority.bulk)
+    await stream.open()
+    stream.feed(Frame(kind=FrameKind.stream_item, id=1))
+    await anext(stream)
+    await stream.aclose()
+
+    # none of them overtakes the request queued in bulk lane
+    assert channel.frames == [
+        (FrameKind.credit, Priority.bulk),
+        (FrameKind.credit, Priority.bulk),
+        (FrameKind.cancel, Priority.bulk),
+    ]
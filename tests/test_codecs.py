@@ -0,0 +1,26 @@
+import datetime
+
+import pytest
+
+from camera360.lib.camera.controls import Integer
+from camera360.lib.camera.protocol import CaptureStartData
+from camera360.lib.rpc.codecs import CODECS, available_codecs
+from camera360.lib.supervisor.protocol import Status, SupervisorProtocol, SystemStatus
+
+
+@pytest.mark.parametrize("codec", CODECS.values(), ids=list(CODECS))
+def test_codec_roundtrip(codec):
+    controls = SupervisorProtocol.methods["controls"].return_model
+
+    for model in [
+        CaptureStartData(
+            capture_time=datetime.datetime.now(), index=1, meta=dict(test="test")
+        ),
+        Status(status=SystemStatus.capture),
+        controls(value=[Integer(name="Exposure", value=11)]),
+    ]:
+        assert codec.decode(type(model), codec.encode(model)) == model
+
+
+def test_json_is_preferred():
+    assert available_codecs()[0] == "json"
@@ -0,0 +1,72 @@
+import logging
+import timeit
+
+import pytest
+
+from camera360.lib.camera.controls import Integer
+from camera360.lib.rpc.codecs import CODECS
+from camera360.lib.supervisor.protocol import FrameData, SupervisorProtocol
+
+CALLS = 2000
+
+
+def legacy_call(method, codec, arguments, value):
+    """
+    Encoding path used before methods were compiled:
+    args and return models built and validated on every call.
+    """
+    payload = codec.encode(method.args_model(**arguments))
+    codec.decode(method.args_model, payload).model_dump()
+
+    response = codec.encode(method.return_model(value=value))
+    return codec.decode(method.return_model, response).value
+
+
+def compiled_call(method, codec, arguments, value, trusted):
+    method_codec = method.compile(codec, trusted=trusted)
+
+    payload = method_codec.encode_args(method.args_model(**arguments))
+    method_codec.decode_args(payload)
+
+    return method_codec.decode_return(method_codec.encode_return(value))
+
+
+@pytest.mark.parametrize("codec", CODECS.values(), ids=list(CODECS))
+@pytest.mark.parametrize(
+    "name,arguments,value",
+    [
+        ("on_frame_received", dict(frame=FrameData(index=1)), None),
+        (
+            "controls",
+            dict(),
+            [Integer(name="Exposure", value=11), Integer(name="Framerate", value=2)],
+        ),
+    ],
+)
+def test_dispatch_overhead(codec, name, arguments, value):
+    method = SupervisorProtocol.methods[name]
+
+    # all paths must give the same result
+    assert legacy_call(method, codec, arguments, value) == value
+    assert compiled_call(method, codec, arguments, value, trusted=False) == value
+    assert compiled_call(method, codec, arguments, value, trusted=True) == value
+
+    # timings are only logged, busy machines would make the test flaky,
+    # speed itself is checked by benchmarks/dispatch_overhead.py
+    timings = {
+        "legacy": lambda: legacy_call(method, codec, arguments, value),
+        "compiled": lambda: compiled_call(
+            method, codec, arguments, value, trusted=False
+        ),
+        "trusted": lambda: compiled_call(method, codec, arguments, value, True),
+    }
+    per_call = {
+        label: min(timeit.repeat(call, number=CALLS, repeat=3)) / CALLS * 1e6
+        for label, call in timings.items()
+    }
+    logging.info(
+        "%s/%s per call overhead: %s",
+        codec.name,
+        name,
+        ", ".join("%s=%.1fus" % item for item in per_call.items()),
+    )
@@ -0,0 +1,83 @@
+import asyncio
+import shlex
+import sys
+import time
+
+import pytest
+
+from camera360.apps.camera.api.feed import EncoderFeed
+from camera360.lib.camera.buffers import BufferPool
+from camera360.lib.camera.device import RawFrame
+from camera360.lib.camera.pipeline import Overflow
+from camera360.lib.rpc.metrics import MetricsRegistry
+
+FRAME = b"x" * 1024 * 1024
+
+
+def reader(path, delay: float) -> str:
+    """Encoder stand-in which reads a frame every delay seconds."""
+    code = (
+        "import sys, time\n"
+        "with open(%r, 'wb') as f:\n"
+        "    while chunk := sys.stdin.buffer.read(%d):\n"
+        "        f.write(chunk)\n"
+        "        time.sleep(%s)\n"
+    ) % (str(path), len(FRAME), delay)
+    return "-c %s" % shlex.quote(code)
+
+
+def feed(tmp_path, overflow: Overflow, delay: float) -> EncoderFeed:
+    return EncoderFeed(
+        overflow.value,
+        reader(tmp_path / "output", delay),
+        overflow=overflow,
+        registry=MetricsRegistry(),
+        program=sys.executable,
+    )
+
+
+@pytest.mark.asyncio
+async def test_recording_feed_waits_for_encoder(tmp_path):
+    recording = feed(tmp_path, Overflow.block, delay=0.02)
+    await recording.start()
+
+    started = time.monotonic()
+    for index in range(10):
+        await recording.write(RawFrame(index, FRAME, timestamp=index))
+    # writer is only a couple of frames ahead of the encoder
+    assert time.monotonic() - started > 0.1
+    await recording.stop()
+
+    assert (tmp_path / "output").stat().st_size == 10 * len(FRAME)
+    metrics = recording.metrics
+    assert (metrics.frames, metrics.dropped) == (10, 0)
+    assert metrics.bytes == 10 * len(FRAME)
+    assert metrics.stall_time > 0
+    assert 0 < metrics.bytes_per_second < 100 * len(FRAME)
+    assert metrics.max_queued <= 2
+
+
+@pytest.mark.asyncio
+async def test_preview_feed_drops_old_frames(tmp_path):
+    preview = feed(tmp_path, Overflow.drop_oldest, delay=0.2)
+    await preview.start()
+    pool = BufferPool(len(FRAME), 10)
+
+    started = time.monotonic()
+    for index in range(10):
+        buffer = pool.get()
+        frame = RawFrame(index, buffer.view, timestamp=index, owner=buffer)
+        await preview.write(frame)
+        # capture is done with the frame, feed keeps its own reference
+        frame.release()
+        await asyncio.sleep(0)
+    assert time.monotonic() - started < 0.2
+    await preview.stop()
+
+    # written and dropped frames are back in the pool
+    assert pool.available == 10
+
+    metrics = preview.metrics
+    assert metrics.dropped > 0
+    assert metrics.frames + metrics.dropped == 10
+    assert (tmp_path / "output").stat().st_size == metrics.bytes
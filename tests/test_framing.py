@@ -0,0 +1,98 @@
+import asyncio
+import struct
+
+import pytest
+
+from camera360.lib.rpc.connection.framing import (
+    BinaryFraming,
+    Frame,
+    FrameKind,
+    JsonLineFraming,
+    MAX_FRAME_SIZE,
+)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("framing", [BinaryFraming(), JsonLineFraming()])
+async def test_frames_roundtrip(framing):
+    frames = [
+        Frame(kind=FrameKind.request, id=1, method="start", payload=b'{"a":1}'),
+        Frame(kind=FrameKind.response, id=1, payload=b'{"value":[1,2]}'),
+        Frame(kind=FrameKind.exception, id=2),
+    ]
+
+    reader = asyncio.StreamReader()
+    for frame in frames:
+        reader.feed_data(b"".join(framing.encode_frame(frame)))
+    reader.feed_eof()
+
+    for frame in frames:
+        assert await framing.read_frame(reader) == frame
+
+    # end of stream is reported as missing frame
+    assert await framing.read_frame(reader) is None
+
+
+def test_binary_frame_is_compact():
+    payload = b'{"frame":{"index":1}}'
+    frame = Frame(
+        kind=FrameKind.request, id=1, method="on_frame_received", payload=payload
+    )
+
+    binary = b"".join(BinaryFraming().encode_frame(frame))
+    legacy = b"".join(JsonLineFraming().encode_frame(frame))
+
+    assert binary.endswith(payload)
+    assert len(binary) < len(legacy) / 2
+
+
+@pytest.mark.asyncio
+async def test_binary_frame_timeout():
+    framing = BinaryFraming()
+    frame = Frame(kind=FrameKind.request, id=1, method="start", timeout=1.5)
+
+    reader = asyncio.StreamReader()
+    reader.feed_data(b"".join(framing.encode_frame(frame)))
+
+    assert await framing.read_frame(reader) == frame
+
+
+@pytest.mark.asyncio
+async def test_binary_frame_channel_id():
+    framing = BinaryFraming()
+    frames = [
+        Frame(kind=FrameKind.request, id=1, method="start", channel_id=3),
+        Frame(kind=FrameKind.request, id=2, timeout=0.5, channel_id=65535),
+    ]
+
+    reader = asyncio.StreamReader()
+    for frame in frames:
+        reader.feed_data(b"".join(framing.encode_frame(frame)))
+
+    for frame in frames:
+        assert await framing.read_frame(reader) == frame
+
+
+@pytest.mark.asyncio
+async def test_binary_frame_method_id():
+    framing = BinaryFraming()
+    frame = Frame(kind=FrameKind.request, id=1, method="on_frame_received", method_id=7)
+
+    reader = asyncio.StreamReader()
+    reader.feed_data(b"".join(framing.encode_frame(frame)))
+
+    # name is resolved by channel, which knows the ids
+    received = await framing.read_frame(reader)
+    assert (received.method, received.method_id) == ("", 7)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "size, kind", [(MAX_FRAME_SIZE + 1, FrameKind.request), (0, 200)]
+)
+async def test_binary_frame_is_rejected(size, kind):
+    reader = asyncio.StreamReader()
+    reader.feed_data(struct.pack("!IBBIH", size, kind, 0, 1, 0))
+
+    with pytest.raises(ConnectionError):
+        await BinaryFraming().read_frame(reader)
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from camera360.lib.camera.device import RawFrame
+from camera360.lib.camera.pacing import Pacer
+
+
+def frames(fps: float, count: int, start: float = 100, jitter: float = 0):
+    random.seed(1)
+    for index in range(count):
+        timestamp = start + index / fps + random.uniform(-jitter, jitter)
+        yield RawFrame(sequence=index + 1, buffer=b"", timestamp=timestamp)
+
+
+def test_frames_pass_as_they_are_without_target():
+    pacer = Pacer()
+    assert [pacer.pace(frame) for frame in frames(30, 100)] == [1] * 100
+    assert pacer.metrics.sensor_fps == pytest.approx(30)
+    assert pacer.metrics.output_fps == pytest.approx(30)
+
+
+def test_fast_sensor_frames_are_skipped():
+    pacer = Pacer(fps=10)
+    counts = [pacer.pace(frame) for frame in frames(30, 300, jitter=0.005)]
+
+    assert counts[:6] == [1, 0, 0, 1, 0, 0]
+    assert sum(counts) == 100
+    assert pacer.metrics.skipped == 200
+    assert pacer.metrics.output_fps == pytest.approx(10, rel=0.05)
+    assert pacer.metrics.sensor_fps == pytest.approx(30, rel=0.05)
+    assert 0 < pacer.metrics.jitter < 0.005
+
+
+def test_slow_sensor_frames_are_duplicated():
+    pacer = Pacer(fps=10)
+    counts = [pacer.pace(frame) for frame in frames(5, 50)]
+
+    # first frame opens the output, every next one fills two slots
+    assert counts == [1] + [2] * 49
+    assert pacer.metrics.duplicated == 49
+    assert pacer.metrics.output_fps == pytest.approx(10)
+
+
+def test_jitter_of_the_same_rate_is_tolerated():
+    pacer = Pacer(fps=30)
+    counts = [pacer.pace(frame) for frame in frames(30, 300, jitter=0.005)]
+    assert counts == [1] * 300
+
+
+def test_rate_changes_at_runtime():
+    pacer = Pacer(fps=30)
+    stream = frames(30, 200)
+    assert sum(pacer.pace(frame) for _, frame in zip(range(100), stream)) == 100
+
+    pacer.fps = 15
+    assert sum(pacer.pace(frame) for frame in stream) == 50
+
+    with pytest.raises(ValueError):
+        pacer.fps = 0
+
+
+def test_long_gaps_are_not_filled():
+    pacer = Pacer(fps=10)
+    assert pacer.pace(RawFrame(sequence=1, buffer=b"", timestamp=1)) == 1
+    assert pacer.pace(RawFrame(sequence=2, buffer=b"", timestamp=60)) == 1
@@ -0,0 +1,85 @@
+import asyncio
+import itertools
+import time
+
+import pytest
+
+from camera360.lib.camera.device import RawFrame
+from camera360.lib.camera.pipeline import Overflow, Pipeline, Stage
+from camera360.lib.rpc.metrics import MetricsRegistry
+
+
+class FakeCamera:
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.sequence = itertools.count(1)
+
+    async def get_frame(self) -> RawFrame:
+        await asyncio.sleep(self.interval)
+        return RawFrame(
+            sequence=next(self.sequence), buffer=b"frame", timestamp=time.monotonic()
+        )
+
+
+class Collector:
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.frames: list[int] = []
+
+    async def __call__(self, frame: RawFrame) -> None:
+        await asyncio.sleep(self.delay)
+        self.frames.append(frame.sequence)
+
+
+@pytest.mark.asyncio
+async def test_slow_stages_dont_hold_back_recording():
+    registry = MetricsRegistry()
+    record, preview, notify = Collector(), Collector(delay=0.05), Collector(delay=1)
+    pipeline = Pipeline(
+        FakeCamera().get_frame,
+        [
+            Stage("record", record, size=8, overflow=Overflow.block),
+            Stage("preview", preview, size=1, overflow=Overflow.drop_oldest),
+            Stage("notify", notify, size=1, overflow=Overflow.drop_newest),
+        ],
+        registry=registry,
+    )
+    pipeline.start()
+    await asyncio.sleep(0.3)
+    await pipeline.stop(timeout=0.1)
+
+    # every captured frame is recorded, in order
+    assert len(record.frames) > 20
+    assert record.frames == list(range(1, len(record.frames) + 1))
+
+    # preview keeps up with the latest frames, notify is stuck with the first ones
+    assert 2 < len(preview.frames) < len(record.frames)
+    assert preview.frames[-1] > len(record.frames) // 2
+    assert notify.frames == []
+
+    stages = registry.snapshot().stages
+    assert stages["record"].dropped == 0
+    assert stages["record"].processed == len(record.frames)
+    assert stages["preview"].dropped > 0
+    assert stages["notify"].dropped > 0
+    assert stages["notify"].max_depth == 1
+
+
+@pytest.mark.asyncio
+async def test_blocking_stage_applies_backpressure_to_capture():
+    camera = FakeCamera(interval=0)
+    record = Collector(delay=0.01)
+    pipeline = Pipeline(
+        camera.get_frame,
+        [Stage("record", record, size=2, overflow=Overflow.block)],
+        registry=MetricsRegistry(),
+    )
+    pipeline.start()
+    await asyncio.sleep(0.1)
+    await pipeline.stop()
+
+    # capture waited for the stage, only the frame it held when stopped is lost
+    captured = next(camera.sequence) - 1
+    assert captured - 1 <= len(record.frames) <= captured
+    assert len(record.frames) < 20
+    assert pipeline.stages[0].metrics.errors == 0
@@ -1,7 +1,13 @@
 from typing import List
 from unittest import mock
 
-from camera360.lib.rpc.decorators import MethodType
+from camera360.lib.rpc.decorators import (
+    SCHEMA_CACHE_ENV,
+    MethodType,
+    _fingerprints,
+    _process_method,
+    fingerprint,
+)
 from camera360.lib.rpc.protocol import RPCProtocol, method
 
 
@@ -32,3 +38,40 @@ def test_protocol_subclass():
     assert DemoProtocol.methods["finish"].return_model(value=123).model_dump() == dict(
         value=123
     )
+
+
+def test_protocol_models_are_lazy():
+    class DemoProtocol(RPCProtocol):
+        @method
+        def init(self, arg1: str) -> None: ...
+
+        @method
+        def finish(self) -> int: ...
+
+    with mock.patch(
+        "camera360.lib.rpc.decorators._process_method", wraps=_process_method
+    ) as process:
+        assert sorted(DemoProtocol.methods) == ["finish", "init"]
+        assert process.call_count == 0
+
+        DemoProtocol.methods["init"]
+        DemoProtocol.methods["init"]
+        process.assert_called_once()
+
+
+def test_fingerprint_cache(tmp_path, monkeypatch):
+    class DemoProtocol(RPCProtocol):
+        @method
+        def init(self, arg1: str) -> None: ...
+
+    monkeypatch.setenv(SCHEMA_CACHE_ENV, str(tmp_path / "schemas.json"))
+    value = fingerprint(DemoProtocol.methods)
+    assert value in (tmp_path / "schemas.json").read_text()
+
+    # next run takes it from the file without building models
+    _fingerprints.clear()
+    with mock.patch(
+        "camera360.lib.rpc.decorators._process_method", wraps=_process_method
+    ) as process:
+        assert fingerprint(DemoProtocol.methods) == value
+        assert process.call_count == 0
@@ -1,17 +1,32 @@
 import asyncio
 import contextlib
 import logging
-from typing import List
+import time
+from typing import AsyncIterator, List, Optional
 
 import pydantic
 import pytest
 
-from camera360.lib.rpc.protocol import RPCProtocol, method, RPCHandler
-from camera360.lib.rpc.server import start_server, connect
+from camera360.lib.rpc.connection import Hello
+from camera360.lib.rpc.connection.channel import ChannelOptions
+from camera360.lib.rpc.connection.stream import CREDIT
+from camera360.lib.rpc.connection.framing import (
+    BinaryFraming,
+    Frame,
+    FrameKind,
+    JsonLineFraming,
+)
+from camera360.lib.rpc.deadline import deadline, remaining
+from camera360.lib.rpc.metrics import MetricsRegistry, to_prometheus
+from camera360.lib.rpc.protocol import Blob, Priority, RPCProtocol, method, RPCHandler
+from camera360.lib.rpc.server import Connection, start_server, connect
+from camera360.lib.rpc.server.transports import MemoryTransport
+from camera360.lib.rpc.tracing import TRACER
 
 
 class DemoProtocol(RPCProtocol):
     demo_response = [1, 3, 5]
+    demo_blob = bytes(range(256)) * 4096
 
     @method
     async def start(self, *, arg1: str, arg2: List[str]) -> list[int]:
@@ -27,16 +42,77 @@ class DemoProtocol(RPCProtocol):
     async def malformed_return(self) -> int:
         return "invalid string type here"
 
+    @method
+    async def download(self) -> Blob:
+        return Blob(self.demo_blob)
+
+    @method
+    async def count(self, *, limit: int) -> AsyncIterator[int]:
+        for index in range(limit):
+            yield index
+
+    @method
+    async def ticks(self) -> AsyncIterator[int]:
+        self.ticks_produced = 0
+        try:
+            while True:
+                yield self.ticks_produced
+                self.ticks_produced += 1
+        finally:
+            self.ticks_closed = True
+
+    @method
+    async def sleep(self, *, delay: float) -> float:
+        started = time.monotonic()
+        await asyncio.sleep(delay)
+        self.sleeps.append((started, time.monotonic()))
+        return delay
+
+    @method
+    async def hang(self) -> None:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            self.hang_cancelled = True
+            raise
+
+    @method(timeout=0.1)
+    async def hang_with_timeout(self) -> None:
+        await self.hang()
+
+    @method
+    async def time_left(self) -> Optional[float]:
+        return remaining()
+
     @method
     async def long_waiting_method(self) -> int:
         await asyncio.sleep(5)
         return 1
 
+    @method(priority=Priority.control)
+    async def urgent(self) -> str:
+        return "done"
+
+    deliveries = 0
+
+    @method(idempotent=True)
+    async def deliver(self, *, delay: float) -> int:
+        await asyncio.sleep(delay)
+        self.deliveries += 1
+        return self.deliveries
+
+    @method(idempotent=True)
+    async def numbers(self) -> AsyncIterator[int]:
+        for index in range(1000):
+            yield index
+            await asyncio.sleep(0.01)
+
 
 class DemoHandler(RPCHandler, DemoProtocol):
     def __init__(self):
         super().__init__()
         self.clients = []
+        self.sleeps = []
 
     async def on_client_connected(self, client):
         logging.info("Client connected")
@@ -48,8 +124,12 @@ class DemoHandler(RPCHandler, DemoProtocol):
 
 
 @contextlib.asynccontextmanager
-async def background_server(server_handler: RPCHandler) -> tuple[str, int]:
-    server = await start_server(server_handler, host="127.0.0.1", port=5000)
+async def background_server(
+    server_handler: RPCHandler, options: ChannelOptions = None
+) -> tuple[str, int]:
+    server = await start_server(
+        server_handler, host="127.0.0.1", port=5000, options=options
+    )
 
     host, port = server.sockets[0].getsockname()
 
@@ -72,21 +152,47 @@ async def background_server(server_handler: RPCHandler) -> tuple[str, int]:
 
 
 @pytest.mark.asyncio
-async def test_connect_and_communicate():
+@pytest.mark.parametrize(
+    "framing,codecs",
+    [
+        (BinaryFraming, ["msgpack"]),
+        (BinaryFraming, ["json"]),
+        (JsonLineFraming, ["json"]),
+    ],
+)
+async def test_connect_and_communicate(framing, codecs):
     """
     Generic case when we try to connect to the server
     and communicate with it getting either errors or
     successful responses.
     """
+    options = ChannelOptions(framing=framing(), codecs=codecs)
+
     server_handler = DemoHandler()
     async with (
-        background_server(server_handler=server_handler) as (host, port),
-        connect(host, port, protocol=DemoProtocol) as connection,
+        background_server(server_handler=server_handler, options=options) as (
+            host,
+            port,
+        ),
+        connect(host, port, protocol=DemoProtocol, options=options) as connection,
     ):
         # generic call and response should be as expected
         start_result = await connection.start(arg1="argument1", arg2=["argument2"])
         assert start_result == DemoHandler.demo_response
 
+        # binary payloads are delivered untouched regardless of framing
+        assert await connection.download() == DemoHandler.demo_blob
+
+        # several calls can be sent at once
+        batch = connection.batch()
+        batch.start(arg1="argument1", arg2=["argument2"])
+        batch.download()
+        batch.raise_exception(arg="test")
+        start_result, blob, error = await batch.send(return_exceptions=True)
+        assert start_result == DemoHandler.demo_response
+        assert blob == DemoHandler.demo_blob
+        assert isinstance(error, ConnectionError)
+
         # we don't distinguish errors on server side right now,
         # but we should be able to understand that something is gone wrong
         with pytest.raises(ConnectionError):
@@ -103,6 +209,25 @@ async def test_connect_and_communicate():
             await connection.malformed_return()
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize("framing", [BinaryFraming, JsonLineFraming])
+async def test_invalid_requests_are_answered(framing):
+    options = ChannelOptions(framing=framing(), codecs=["json"])
+
+    async with (
+        background_server(DemoHandler(), options=options) as (host, port),
+        connect(host, port, protocol=DemoProtocol, options=options) as connection,
+    ):
+        channel = connection._channel
+        with pytest.raises(ConnectionError, match="No method missing"):
+            await channel.send_request("missing", b"{}", timeout=1)
+
+        if framing is BinaryFraming:
+            stream = await channel.open_stream("count", b'{"limit": "many"}')
+            with pytest.raises(ConnectionError, match="limit"):
+                await asyncio.wait_for(anext(stream), 1)
+
+
 @pytest.mark.asyncio
 async def test_connection_client_disconnects():
     """
@@ -128,3 +253,534 @@ async def test_connection_client_disconnects():
         await asyncio.sleep(0.1)
         logging.info("Checking")
         assert len(server_handler.clients) == 0
+
+
+@pytest.mark.asyncio
+async def test_codec_negotiation():
+    server_handler = DemoHandler()
+    server_options = ChannelOptions(codecs=["json"])
+
+    async with background_server(server_handler, options=server_options) as (
+        host,
+        port,
+    ):
+        # server picks the first codec it knows from client preferences
+        conn = Connection(host, port, ChannelOptions(codecs=["msgpack", "json"]))
+        remote = await conn.connect(protocol=DemoProtocol, handler=None)
+        assert conn.channel.codec.name == "json"
+        assert await remote.start(arg1="argument1", arg2=["argument2"]) == [1, 3, 5]
+        await conn.disconnect()
+
+        # no common codec means no connection at all
+        conn = Connection(host, port, ChannelOptions(codecs=["msgpack"]))
+        with pytest.raises(ConnectionError):
+            await conn.connect(protocol=DemoProtocol, handler=None)
+
+
+class OtherDemoProtocol(RPCProtocol):
+    @method
+    async def start(self, *, arg1: str) -> list[int]: ...
+
+
+@pytest.mark.asyncio
+async def test_protocol_schemas():
+    server_handler = DemoHandler()
+
+    async with background_server(server_handler) as (host, port):
+        conn = Connection(host, port)
+        remote = await conn.connect(protocol=DemoProtocol, handler=None)
+        assert conn.channel._method_ids[0]["start"] is not None
+        assert await remote.start(arg1="argument1", arg2=["argument2"]) == [1, 3, 5]
+        await conn.disconnect()
+
+        # client of another protocol version fails early, not on the first call
+        conn = Connection(host, port)
+        with pytest.raises(ConnectionError, match="different version"):
+            await conn.connect(protocol=OtherDemoProtocol, handler=None)
+        assert not conn.channel.is_connected
+
+
+@pytest.mark.asyncio
+async def test_compression_negotiation():
+    server_handler = DemoHandler()
+
+    async with background_server(server_handler) as (host, port):
+        conn = Connection(host, port, ChannelOptions(compression_threshold=1024))
+        remote = await conn.connect(protocol=DemoProtocol, handler=None)
+        assert conn.channel.compressor.name == "zlib"
+        assert await remote.download() == DemoProtocol.demo_blob
+        await conn.disconnect()
+
+        # peers which don't support compression still can talk
+        conn = Connection(host, port, ChannelOptions(compression=[]))
+        remote = await conn.connect(protocol=DemoProtocol, handler=None)
+        assert conn.channel.compressor is None
+        assert await remote.download() == DemoProtocol.demo_blob
+        await conn.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_streaming_methods():
+    server_handler = DemoHandler()
+    async with (
+        background_server(server_handler=server_handler) as (host, port),
+        connect(host, port, protocol=DemoProtocol) as connection,
+    ):
+        # more items than credit window, so client has to grant more
+        items = [item async for item in connection.count(limit=50)]
+        assert items == list(range(50))
+
+        # credits which come after the end of the stream are dropped
+        await connection._channel.send_control(
+            FrameKind.credit, connection._channel._request_id - 1, CREDIT.pack(1)
+        )
+        await asyncio.sleep(0.05)
+        assert not server_handler.clients[0]._channel._credits
+
+        async with contextlib.aclosing(connection.ticks()) as ticks:
+            assert await anext(ticks) == 0
+            await asyncio.sleep(0.1)
+
+            # server must not run ahead of the consumer
+            window = ChannelOptions().stream_window
+            assert server_handler.ticks_produced <= window + 1
+
+        # closing the stream on our side stops generator on server side
+        await asyncio.sleep(0.1)
+        assert server_handler.ticks_closed
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("overflow", ["queue", "reject"])
+async def test_concurrency_limits(overflow):
+    server_handler = DemoHandler()
+    options = ChannelOptions(
+        max_concurrency=4, method_concurrency={"sleep": 1}, overflow=overflow
+    )
+
+    async with (
+        background_server(server_handler, options=options) as (host, port),
+        connect(host, port, protocol=DemoProtocol) as connection,
+    ):
+        calls = asyncio.gather(
+            *[connection.sleep(delay=0.1) for _ in range(3)],
+            return_exceptions=True,
+        )
+        await asyncio.sleep(0.05)
+
+        counters = server_handler.clients[0]._channel.counters
+        assert counters.running == 1
+
+        results = await calls
+        if overflow == "queue":
+            assert counters.queued == 0
+            assert results == [0.1, 0.1, 0.1]
+        else:
+            assert counters.rejected == 2
+            assert results[0] == 0.1
+            assert all(isinstance(result, ConnectionError) for result in results[1:])
+
+        # other methods are not affected by the method limit
+        assert await connection.start(arg1="argument1", arg2=["argument2"])
+        assert counters.running == 0
+
+
+@pytest.mark.asyncio
+async def test_deadlines_and_cancellation():
+    server_handler = DemoHandler()
+    async with (
+        background_server(server_handler) as (host, port),
+        connect(host, port, protocol=DemoProtocol) as connection,
+    ):
+        # no deadline unless somebody asked for it
+        assert await connection.time_left() is None
+
+        # deadline of the caller is visible to the handler
+        with deadline(5):
+            assert 0 < await connection.time_left() <= 5
+
+        # expired call is cancelled on the server as well
+        with pytest.raises(asyncio.TimeoutError), deadline(0.1):
+            await connection.hang()
+        await asyncio.sleep(0.05)
+        assert server_handler.hang_cancelled
+
+        # method may have its own default deadline
+        server_handler.hang_cancelled = False
+        with pytest.raises(asyncio.TimeoutError):
+            await connection.hang_with_timeout()
+        await asyncio.sleep(0.05)
+        assert server_handler.hang_cancelled
+
+        # same happens when caller cancels the call
+        server_handler.hang_cancelled = False
+        task = asyncio.create_task(connection.hang())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.sleep(0.05)
+        assert server_handler.hang_cancelled
+
+        # channel is still usable after all of that
+        assert await connection.start(arg1="argument1", arg2=["argument2"])
+
+
+@pytest.mark.asyncio
+async def test_cancel_read_with_its_request():
+    server_handler = DemoHandler()
+    async with (
+        background_server(server_handler) as (host, port),
+        connect(host, port, protocol=DemoProtocol) as connection,
+    ):
+        # request is queued and cancelled before writer sends anything,
+        # so server reads both of them at once
+        task = asyncio.create_task(connection.hang())
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.sleep(0.05)
+
+        channel = server_handler.clients[0]._channel
+        assert not channel._tasks
+        assert channel.counters.queued == channel.counters.running == 0
+        assert channel._method_load["hang"] == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("framing", [BinaryFraming, JsonLineFraming])
+async def test_batch_calls(framing):
+    options = ChannelOptions(framing=framing(), codecs=["json"])
+
+    server_handler = DemoHandler()
+    async with (
+        background_server(server_handler, options=options) as (host, port),
+        connect(host, port, protocol=DemoProtocol, options=options) as connection,
+    ):
+        for concurrent in [False, True]:
+            batch = connection.batch(concurrent=concurrent)
+            for _ in range(3):
+                batch.sleep(delay=0.1)
+
+            server_handler.sleeps = []
+            assert await batch.send() == [0.1, 0.1, 0.1]
+
+            starts = sorted(started for started, _ in server_handler.sleeps)
+            ends = sorted(finished for _, finished in server_handler.sleeps)
+            if concurrent:
+                # all of them were running at the same time
+                assert starts[-1] < ends[0]
+            else:
+                assert all(ends[i] <= starts[i + 1] for i in range(2))
+
+        # failed call doesn't stop the next ones
+        batch = connection.batch()
+        batch.raise_exception(arg="test")
+        batch.sleep(delay=0)
+        error, delay = await batch.send(return_exceptions=True)
+        assert isinstance(error, ConnectionError)
+        assert delay == 0
+
+        # failure of a single call fails the whole batch unless asked otherwise
+        batch = connection.batch()
+        batch.raise_exception(arg="test")
+        with pytest.raises(ConnectionError, match="Something bad happened"):
+            await batch.send()
+
+        # invalid calls are not even added to the batch
+        with pytest.raises(pydantic.ValidationError):
+            batch.start(wrong_argument=123)
+        with pytest.raises(TypeError):
+            batch.count(limit=1)
+        assert len(batch) == 0
+
+
+@pytest.mark.asyncio
+async def test_metrics():
+    registry = MetricsRegistry()
+    server_handler = DemoHandler()
+
+    async with background_server(
+        server_handler, options=ChannelOptions(metrics=registry)
+    ) as (host, port):
+        async with connect(host, port, protocol=DemoProtocol) as remote:
+            for _ in range(3):
+                await remote.start(arg1="argument1", arg2=["argument2"])
+            with pytest.raises(ConnectionError):
+                await remote.raise_exception(arg="")
+            assert [item async for item in remote.count(limit=3)] == [0, 1, 2]
+
+            metrics = registry.snapshot()
+
+    start = metrics.methods["start"]
+    assert (start.calls, start.errors) == (3, 0)
+    assert start.bytes_in > 0 and start.bytes_out > 0
+    assert sum(start.handler_time.counts) == sum(start.queue_wait.counts) == 3
+
+    assert metrics.methods["raise_exception"].errors == 1
+    assert metrics.methods["count"].calls == 1
+
+    [channel] = metrics.channels
+    assert channel.bytes_received > 0 and channel.bytes_sent > 0
+
+    text = to_prometheus(metrics)
+    assert 'rpc_calls_total{method="start"} 3' in text
+    assert 'rpc_handler_seconds_bucket{method="start",le="+Inf"} 3' in text
+    assert text.count("# TYPE rpc_handler_seconds histogram") == 1
+
+
+@pytest.mark.asyncio
+async def test_logical_channels():
+    server_handler, bulk_handler = DemoHandler(), DemoHandler()
+
+    server = await start_server(
+        server_handler, url="inproc://logical", channels={1: bulk_handler}
+    )
+    conn = Connection(url="inproc://logical")
+    try:
+        remote = await conn.connect(protocol=DemoProtocol, handler=None)
+        bulk = conn.open(DemoProtocol, channel_id=1)
+
+        # both protocols share one connection but not their handlers
+        download = asyncio.create_task(bulk.download())
+        assert await remote.start(arg1="argument1", arg2=["argument2"]) == [1, 3, 5]
+        assert await download == DemoProtocol.demo_blob
+
+        async with contextlib.aclosing(bulk.ticks()) as ticks:
+            await anext(ticks)
+        assert hasattr(bulk_handler, "ticks_produced")
+        assert not hasattr(server_handler, "ticks_produced")
+
+        # server tells its handlers in the handshake
+        with pytest.raises(ConnectionError, match="No handler for channel 2"):
+            conn.open(DemoProtocol, channel_id=2)
+    finally:
+        await conn.disconnect()
+        server.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("scheme", ["tcp", "unix", "inproc"])
+async def test_transports(scheme, tmp_path):
+    url = {
+        "tcp": "tcp://127.0.0.1:5001",
+        "unix": "unix://%s" % (tmp_path / "rpc.sock"),
+        "inproc": "inproc://demo",
+    }[scheme]
+
+    server_handler = DemoHandler()
+    server = await start_server(server_handler, url=url)
+    try:
+        async with connect(url=url, protocol=DemoProtocol) as remote:
+            assert await remote.start(arg1="argument1", arg2=["argument2"]) == [1, 3, 5]
+            assert await remote.download() == DemoProtocol.demo_blob
+            assert [item async for item in remote.count(limit=3)] == [0, 1, 2]
+            assert len(server_handler.clients) == 1
+
+        await asyncio.sleep(0.1)
+        assert len(server_handler.clients) == 0
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    # nobody listens anymore
+    with pytest.raises(ConnectionRefusedError):
+        await Connection(url=url).connect(protocol=DemoProtocol, handler=None)
+
+
+@pytest.mark.asyncio
+async def test_heartbeats():
+    options = ChannelOptions(heartbeat_interval=0.02, heartbeat_timeout=1)
+    server = await start_server(DemoHandler(), url="inproc://heartbeats")
+    try:
+        conn = Connection(url="inproc://heartbeats", options=options)
+        await conn.connect(protocol=DemoProtocol, handler=None)
+        await asyncio.sleep(0.2)
+
+        assert conn.channel.is_connected
+        metrics = conn.channel.metrics()
+        assert 0 < metrics.rtt <= metrics.rtt_max < 1
+        await conn.disconnect()
+    finally:
+        server.close()
+
+
+@pytest.mark.asyncio
+async def test_dead_peer_is_detected():
+    framing = BinaryFraming()
+
+    async def silent_peer(reader, writer):
+        # completes the handshake and never responds again
+        await framing.read_frame(reader)
+        writer.writelines(
+            framing.encode_frame(
+                Frame(
+                    kind=FrameKind.hello,
+                    id=0,
+                    payload=Hello(codecs=["json"], heartbeat=True)
+                    .model_dump_json()
+                    .encode(),
+                )
+            )
+        )
+        while await framing.read_frame(reader):
+            pass
+
+    server = await MemoryTransport("silent").start_server(silent_peer)
+    try:
+        options = ChannelOptions(heartbeat_interval=0.05, heartbeat_timeout=0.2)
+        conn = Connection(url="inproc://silent", options=options)
+        remote = await conn.connect(protocol=DemoProtocol, handler=None)
+
+        started = time.monotonic()
+        with pytest.raises(ConnectionResetError, match="not responding"):
+            await remote.hang()
+        assert time.monotonic() - started < 1
+        assert conn.channel.on_disconnect_event.is_set()
+    finally:
+        server.close()
+
+
+@pytest.mark.asyncio
+async def test_control_calls_overtake_bulk_transfers():
+    # compression would delay bulk responses on its own
+    options = ChannelOptions(chunk_size=16 * 1024, compression=[])
+    server = await start_server(
+        DemoHandler(), url="inproc://priorities", options=options
+    )
+    conn = Connection(url="inproc://priorities", options=options)
+    try:
+        remote = await conn.connect(protocol=DemoProtocol, handler=None)
+
+        finished = []
+
+        async def call(name, coroutine):
+            result = await coroutine
+            finished.append(name)
+            return result
+
+        downloads = [
+            asyncio.create_task(call("download", remote.download())) for _ in range(8)
+        ]
+        await asyncio.sleep(0)
+        assert await call("urgent", remote.urgent()) == "done"
+
+        # chunks of every response are put together again
+        assert await asyncio.gather(*downloads) == [DemoProtocol.demo_blob] * 8
+        assert finished[0] == "urgent"
+    finally:
+        await conn.disconnect()
+        server.close()
+
+
+@pytest.mark.asyncio
+async def test_session_is_resumed():
+    handler = DemoHandler()
+    server = await start_server(handler, url="inproc://sessions")
+    conn = Connection(url="inproc://sessions")
+    try:
+        remote = await conn.connect(protocol=DemoProtocol, handler=None)
+        session = conn.channel.session
+        assert session
+
+        call = asyncio.create_task(remote.deliver(delay=0.2))
+        stream = remote.numbers()
+        assert await anext(stream) == 0
+
+        await asyncio.sleep(0.05)
+        conn.channel.writer.transport.abort()
+        await conn.channel.on_disconnect_event.wait()
+        assert not call.done()
+
+        await conn.reconnect()
+        assert conn.channel.session == session
+        # call was cancelled by the server along with the connection
+        assert await call == 1
+        # stream is restarted from scratch
+        assert await anext(stream) in (0, 1)
+        await stream.aclose()
+    finally:
+        await conn.disconnect()
+        server.close()
+
+
+@pytest.mark.asyncio
+async def test_replayed_calls_are_cancelled_on_resumed_session():
+    handler = DemoHandler()
+    server = await start_server(handler, url="inproc://cancels")
+    conn = Connection(url="inproc://cancels")
+    try:
+        remote = await conn.connect(protocol=DemoProtocol, handler=None)
+        call = asyncio.create_task(remote.deliver(delay=5))
+        await asyncio.sleep(0.05)
+
+        conn.channel.writer.transport.abort()
+        await conn.channel.on_disconnect_event.wait()
+        await conn.reconnect()
+        await asyncio.sleep(0.05)
+        server_channel = handler.clients[-1]._channel
+        assert server_channel._running
+
+        call.cancel()
+        await asyncio.sleep(0.05)
+        assert not server_channel._running
+        assert not conn.channel._pending_requests
+    finally:
+        await conn.disconnect()
+        server.close()
+
+
+@pytest.mark.asyncio
+async def test_resumed_session_replays_buffered_responses():
+    handler = DemoHandler()
+    server = await start_server(handler, url="inproc://replays")
+    conn = Connection(url="inproc://replays")
+    try:
+        remote = await conn.connect(protocol=DemoProtocol, handler=None)
+        assert await remote.deliver(delay=0) == 1
+
+        conn.channel.writer.transport.abort()
+        await conn.channel.on_disconnect_event.wait()
+        await conn.reconnect()
+
+        # same request again, as if its response was lost
+        conn.channel._request_id -= 1
+        assert await remote.deliver(delay=0) == 1
+        assert handler.deliveries == 1
+        assert await remote.deliver(delay=0) == 2
+    finally:
+        await conn.disconnect()
+        server.close()
+
+
+@pytest.mark.asyncio
+async def test_calls_fail_when_session_is_not_resumed():
+    options = ChannelOptions(resume_timeout=0.1)
+    server = await start_server(DemoHandler(), url="inproc://expired")
+    conn = Connection(url="inproc://expired", options=options)
+    try:
+        remote = await conn.connect(protocol=DemoProtocol, handler=None)
+        call = asyncio.create_task(remote.deliver(delay=1))
+        plain = asyncio.create_task(remote.sleep(delay=1))
+        await asyncio.sleep(0.05)
+
+        conn.channel.writer.transport.abort()
+        with pytest.raises(ConnectionResetError):
+            await plain
+        assert not call.done()
+        with pytest.raises(ConnectionResetError):
+            await call
+    finally:
+        server.close()
+
+
+@pytest.mark.asyncio
+async def test_calls_are_traced():
+    server = await start_server(DemoHandler(), url="inproc://tracing")
+    try:
+        async with connect(url="inproc://tracing", protocol=DemoProtocol) as remote:
+            TRACER.clear()
+            await remote.start(arg1="argument1", arg2=["argument2"])
+
+        names = {event["name"] for event in TRACER.chrome_trace()["traceEvents"]}
+        assert {"rpc.call", "rpc.receive", "rpc.dispatch", "rpc.send"} <= names
+        assert "rpc.write" in names
+    finally:
+        server.close()
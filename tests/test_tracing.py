@@ -0,0 +1,34 @@
+import json
+
+from camera360.lib.rpc.tracing import Tracer
+
+
+def test_tracer_keeps_last_records():
+    tracer = Tracer(size=3)
+    for index in range(5):
+        tracer.span("rpc.dispatch", tracer.now(), id=index, size=10)
+    assert len(tracer) == 3
+
+    tracer.enabled = False
+    tracer.event("rpc.send")
+    assert len(tracer) == 3
+
+
+def test_chrome_trace(tmp_path):
+    tracer = Tracer()
+    started = tracer.now()
+    tracer.span("capture.encode", started, id=7, size=1024)
+    tracer.event("rpc.send", id=1)
+
+    path = tracer.dump(str(tmp_path / "trace.json"))
+    with open(path) as f:
+        events = json.load(f)["traceEvents"]
+
+    span, event, *lanes = events
+    assert span["ph"] == "X" and span["dur"] >= 0
+    assert span["ts"] == started / 1000
+    assert span["args"] == {"id": 7, "size": 1024}
+    assert event["ph"] == "i" and event["cat"] == "rpc"
+    # every category is shown as its own row
+    assert span["tid"] != event["tid"]
+    assert {lane["args"]["name"] for lane in lanes} == {"capture", "rpc"}